@@ -0,0 +1,6 @@
+# -*- coding:utf-8 -*-
+""" Benchmarks, run them from repository root ex.
+
+    python -m benchmarks.transport --help
+
+"""
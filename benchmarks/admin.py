@@ -0,0 +1,81 @@
+# -*- coding:utf-8 -*-
+""" Connections and latency per poll - 4lw vs AdminServer backend
+
+Polls `hosts` local fake servers `polls` times (all hosts concurrently in each round, as the
+web monitor's poller does) with srvr, stat and mntr, through:
+    - 4lw - one TCP connection per command (Host.execute)
+    - admin - AdminServer's JSON over pooled keep-alive HTTP/1.1 connections
+
+Reports connections opened per poll and p50/p99/max latency of a host's poll.
+
+Example:
+
+    python -m benchmarks.admin --hosts 5 --polls 500
+
+"""
+import argparse
+import asyncio
+import time
+from zookeeper_monitor import zk
+from zookeeper_monitor.zk import admin
+from tests.fixtures.server import FakeAdminServer, FakeZookeeper
+from .web import make_stat, percentile
+
+
+async def bench(name, args):
+    if name == '4lw':
+        servers = [FakeZookeeper({'stat': make_stat(args.clients)}) for _ in range(args.hosts)]
+    else:
+        servers = [FakeAdminServer() for _ in range(args.hosts)]
+    ports = [await server.start() for server in servers]
+    cluster = zk.Cluster('bench')
+    for port in ports:
+        cluster.add_host(addr='127.0.0.1', port=port)
+    if name == 'admin':
+        # AdminServer listens on its own port, one backend per fake server
+        backends = [admin.AdminBackend(port=port) for port in ports]
+        for host, backend in zip(cluster.get_hosts(), backends):
+            host.set_backend(backend)
+    for host in cluster.get_hosts():
+        host.set_timeout(10)
+
+    latencies = []
+
+    async def poll(host):
+        start = time.perf_counter()
+        record = await host.poll_async()
+        assert record['ok'], record['commands']
+        latencies.append(time.perf_counter() - start)
+
+    try:
+        for _ in range(args.polls):
+            await asyncio.gather(*[poll(host) for host in cluster.get_hosts()])
+        if name == '4lw':
+            connections = sum(len(server.commands) for server in servers)
+        else:
+            connections = sum(server.connections for server in servers)
+    finally:
+        if name == 'admin':
+            for backend in backends:
+                backend.close()
+        for server in servers:
+            server.stop()
+    return connections / float(args.polls * args.hosts), sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='4lw vs AdminServer backend benchmark')
+    parser.add_argument('--hosts', type=int, default=3, help='Number of fake servers')
+    parser.add_argument('--polls', type=int, default=200, help='Poll rounds')
+    parser.add_argument('--clients', type=int, default=2, help='Clients in 4lw stat')
+    args = parser.parse_args()
+
+    print('{:<8} {:>10} {:>9} {:>9} {:>9}'.format('backend', 'conn/poll', 'p50 ms', 'p99 ms', 'max ms'))
+    for name in ('4lw', 'admin'):
+        connections, latencies = asyncio.run(bench(name, args))
+        print('{:<8} {:>10.2f} {:>9.2f} {:>9.2f} {:>9.2f}'.format(
+            name, connections, percentile(latencies, 50) * 1e3, percentile(latencies, 99) * 1e3, latencies[-1] * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# -*- coding:utf-8 -*-
+""" Cost of alert rules evaluation
+
+Evaluates `rules` random rules over mntr-like metrics of `hosts` hosts for a few poll rounds
+and compares it with testing every rule against every host (naive, measured on a sample).
+
+Example:
+
+    python -m benchmarks.alerts -r 10000 --hosts 1000
+
+"""
+import argparse
+import random
+import time
+from zookeeper_monitor.alerts import AlertEngine
+
+METRICS = (
+    'zk_avg_latency', 'zk_max_latency', 'zk_min_latency', 'zk_packets_received', 'zk_packets_sent',
+    'zk_num_alive_connections', 'zk_outstanding_requests', 'zk_znode_count', 'zk_watch_count',
+    'zk_ephemerals_count', 'zk_approximate_data_size', 'zk_open_file_descriptor_count',
+    'follower_zxid_lag', 'latency_avg', 'latency_max',
+)
+OPS = ('>', '>=', '<', '<=')
+
+
+def make_rules(number, rnd):
+    """ Random rules, mostly firing rarely like real ones """
+    rules = []
+    for num in range(number):
+        op = rnd.choice(OPS)
+        threshold = rnd.randint(900, 1000) if op.startswith('>') else rnd.randint(0, 100)
+        rules.append({
+            'name': 'rule-{}'.format(num),
+            'expr': '{} {} {} for {}s'.format(rnd.choice(METRICS), op, threshold, rnd.choice((0, 30, 120))),
+        })
+    rules.append('health != OK')
+    return rules
+
+
+def make_metrics(rnd):
+    metrics = dict((metric, float(rnd.randint(50, 950))) for metric in METRICS)
+    metrics['health'] = 'OK' if rnd.random() > 0.01 else 'TIMEOUT'
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Alert rules evaluation benchmark')
+    parser.add_argument('-r', '--rules', type=int, default=10000, help='Number of rules')
+    parser.add_argument('--hosts', type=int, default=1000, help='Number of hosts')
+    parser.add_argument('--rounds', type=int, default=5, help='Poll rounds')
+    args = parser.parse_args()
+
+    rnd = random.Random(42)
+    start = time.perf_counter()
+    engine = AlertEngine(make_rules(args.rules, rnd))
+    print('compile  {:>10.1f} ms for {} rules'.format((time.perf_counter() - start) * 1e3, len(engine.rules)))
+
+    hosts = ['10.0.{}.{}:2181'.format(num // 250, num % 250) for num in range(args.hosts)]
+    metrics = [make_metrics(rnd) for _ in hosts]
+    elapsed = 0
+    fired = 0
+    for num in range(args.rounds):
+        start = time.perf_counter()
+        for host, host_metrics in zip(hosts, metrics):
+            fired += len(engine.evaluate('c', host, host_metrics, now=num * 60.0))
+        elapsed += time.perf_counter() - start
+    round_time = elapsed / args.rounds
+    print('indexed  {:>10.1f} ms/round {:>10.1f} us/host, {} alerts fired'.format(
+        round_time * 1e3, round_time / args.hosts * 1e6, fired))
+
+    sample = metrics[:max(1, args.hosts // 50)]
+    start = time.perf_counter()
+    for host_metrics in sample:
+        for rule in engine.rules:
+            rule.trigger.test(host_metrics)
+    per_host = (time.perf_counter() - start) / len(sample)
+    print('naive    {:>10.1f} ms/round {:>10.1f} us/host (estimated from {} hosts)'.format(
+        per_host * args.hosts * 1e3, per_host * 1e6, len(sample)))
+
+
+if __name__ == '__main__':
+    main()
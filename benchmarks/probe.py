@@ -0,0 +1,118 @@
+# -*- coding:utf-8 -*-
+""" Mass ruok probes - bulk prober vs a coroutine per host
+
+Starts a fake fleet of `hosts` endpoints (listening sockets of a child process answering
+ruok with imok, driven by a plain selector, so its CPU isn't counted) and probes all of them
+`rounds` times with:
+    - host - Host.ruok_async of every host at once (limiter's slot, wait_for, loop.sock_*)
+    - bulk - Cluster.probe_async (one selector, one timer wheel, health updated in bulk)
+
+Reports probes per second and CPU time (of the probing process) per probe.
+
+Example:
+
+    python -m benchmarks.probe --hosts 5000 --rounds 3
+
+"""
+import argparse
+import asyncio
+import multiprocessing
+import selectors
+import socket
+import time
+from zookeeper_monitor import zk
+
+
+def serve(count, pipe):
+    """ Fake fleet - `count` listening sockets answering ruok, ports are sent to pipe """
+    try:
+        import resource
+        _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+    selector = selectors.DefaultSelector()
+    ports = []
+    for _ in range(count):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(128)
+        sock.setblocking(False)
+        selector.register(sock, selectors.EVENT_READ, None)
+        ports.append(sock.getsockname()[1])
+    pipe.send(ports)
+    while True:
+        for key, _ in selector.select():
+            if key.data is None:
+                try:
+                    client, _ = key.fileobj.accept()
+                except BlockingIOError:
+                    continue
+                client.setblocking(False)
+                selector.register(client, selectors.EVENT_READ, [b''])
+                continue
+            client, buf = key.fileobj, key.data
+            try:
+                data = client.recv(16)
+            except BlockingIOError:
+                continue
+            except OSError:
+                data = b''
+            buf[0] += data
+            if data and b'\n' not in buf[0]:
+                continue
+            if buf[0].strip() == b'ruok':
+                try:
+                    client.send(b'imok')
+                except OSError:
+                    pass
+            selector.unregister(client)
+            client.close()
+
+
+async def bench(name, ports, rounds, max_open):
+    cluster = zk.Cluster('bench')
+    for port in ports:
+        cluster.add_host(addr='127.0.0.1', port=port)
+    hosts = cluster.get_hosts()
+    for host in hosts:
+        host.set_timeout(30)
+
+    ok = 0
+    start, cpu = time.perf_counter(), time.process_time()
+    for _ in range(rounds):
+        if name == 'host':
+            results = await asyncio.gather(*[host.ruok_async() for host in hosts])
+            ok += sum(1 for result in results if result == 'imok')
+        else:
+            health = await cluster.probe_async(max_open=max_open)
+            ok += sum(1 for value in health.values() if value == zk.Host.HOST_HEALTHY)
+    return time.perf_counter() - start, time.process_time() - cpu, ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mass ruok probe benchmark')
+    parser.add_argument('--hosts', type=int, default=5000, help='Number of fake endpoints')
+    parser.add_argument('--rounds', type=int, default=3, help='Probes of every endpoint')
+    parser.add_argument('--max-open', type=int, default=512, help='Bulk prober\'s max open sockets')
+    args = parser.parse_args()
+
+    parent, child = multiprocessing.Pipe()
+    fleet = multiprocessing.Process(target=serve, args=(args.hosts, child))
+    fleet.daemon = True
+    fleet.start()
+    try:
+        ports = parent.recv()
+        number = args.hosts * args.rounds
+        print('{:<6} {:>10} {:>12} {:>10}'.format('mode', 'probes/s', 'cpu us/probe', 'ok'))
+        for name in ('host', 'bulk'):
+            elapsed, cpu, ok = asyncio.run(bench(name, ports, args.rounds, args.max_open))
+            print('{:<6} {:>10.0f} {:>12.1f} {:>10}'.format(name, number / elapsed, cpu / number * 1e6,
+                                                            '{}/{}'.format(ok, number)))
+    finally:
+        fleet.terminate()
+        fleet.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# -*- coding:utf-8 -*-
+""" Per-command overhead of 4lw transports against local fake zookeeper
+
+Compares:
+    - tornado - IOStream based path (the pre-asyncio implementation of Host.execute)
+    - gen - Host.ruok() gen.coroutine shim on tornado's IOLoop
+    - asyncio - Host.ruok_async() on default asyncio loop
+    - uvloop - Host.ruok_async() on uvloop (skipped if not installed)
+
+Example:
+
+    python -m benchmarks.transport -n 5000 -c 10
+
+"""
+import argparse
+import asyncio
+import socket
+import time
+from tornado import gen
+from tornado.ioloop import IOLoop
+from tornado.iostream import IOStream
+from zookeeper_monitor import zk
+from tests.fixtures.server import FakeZookeeper
+
+
+@gen.coroutine
+def tornado_execute(host, cmd):
+    """ Host.execute as it was implemented on top of IOStream """
+    stream = IOStream(socket.socket(socket.AF_INET))
+    yield stream.connect((host.addr, int(host.port)))
+    yield stream.write('{}\n'.format(cmd).encode('utf-8'))
+    data = yield stream.read_until_close()
+    raise gen.Return(data)
+
+
+async def run_commands(command, number, concurrency):
+    """ Runs `number` commands with at most `concurrency` in flight
+
+    Returns:
+        Elapsed time in seconds
+    """
+    queue = iter(range(number))
+
+    async def worker():
+        for _ in queue:
+            ret = await command()
+            assert ret, 'Command failed'
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return time.perf_counter() - start
+
+
+async def bench(name, number, concurrency):
+    server = FakeZookeeper()
+    port = await server.start()
+    host = zk.Host('127.0.0.1', port)
+    host.set_timeout(10)
+    command = {
+        'tornado': lambda: gen.convert_yielded(tornado_execute(host, 'ruok')),
+        'gen': lambda: gen.convert_yielded(host.ruok()),
+    }.get(name, host.ruok_async)
+    try:
+        await run_commands(command, min(number, 100), concurrency)  # warm up
+        return await run_commands(command, number, concurrency)
+    finally:
+        server.stop()
+
+
+def report(name, elapsed, number):
+    print('{:<8} {:>10.1f} us/cmd {:>10.0f} cmd/s'.format(name, elapsed / number * 1e6, number / elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='4lw transport benchmark')
+    parser.add_argument('-n', '--number', type=int, default=2000, help='Commands per transport')
+    parser.add_argument('-c', '--concurrency', type=int, default=1, help='Commands in flight')
+    args = parser.parse_args()
+
+    for name in ('tornado', 'gen'):
+        elapsed = IOLoop.current().run_sync(lambda: bench(name, args.number, args.concurrency))
+        report(name, elapsed, args.number)
+
+    report('asyncio', asyncio.run(bench('asyncio', args.number, args.concurrency)), args.number)
+
+    try:
+        import uvloop
+    except ImportError:
+        print('uvloop   not installed, skipped')
+    else:
+        loop = uvloop.new_event_loop()
+        try:
+            report('uvloop', loop.run_until_complete(bench('uvloop', args.number, args.concurrency)), args.number)
+        finally:
+            loop.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+# -*- coding:utf-8 -*-
+""" HTTP load test of web monitor's endpoints
+
+Runs WebMonitor on a local port, wired to `hosts` fake zookeepers with `clients` clients each
+(background polling disabled), and loads every endpoint for `duration` seconds with `concurrency`
+requests in flight. Reports requests per second, p50/p95/p99 latency and IOLoop lag - delay of
+a timer firing every `lag-interval` ms (load generator shares the loop, so lag includes its cost).
+
+Results can be stored as a baseline (`--save`), later runs are compared with the baseline of
+the same scenario (hosts, clients, concurrency) and fail (exit code 1) if RPS drops or p99
+latency rises more than `threshold`. Baselines default to benchmarks/web.json (committed, with
+the default and the documented scenario), they are machine-specific - re-save them on a new machine.
+
+Example:
+
+    python -m benchmarks.web --hosts 5 --clients 1000 -c 10 -d 5
+    python -m benchmarks.web --hosts 5 --clients 1000 -c 10 -d 5 --save
+    python -m benchmarks.web --baseline ''  # no comparison
+
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from tornado import gen, httpclient
+from tornado.httpserver import HTTPServer
+from tornado.ioloop import IOLoop
+from tornado.testing import bind_unused_port
+from zookeeper_monitor.web import WebMonitor
+from tests.fixtures.server import FakeZookeeper, STAT
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web.json')
+
+ENDPOINTS = {
+    'cluster': '/cluster',
+    'cluster.json': '/cluster.json',
+    'host.json': '/cluster/host/127.0.0.1-{port}.json',
+}
+
+
+def make_stat(clients):
+    """ stat response with `clients` clients """
+    head, _, tail = STAT.partition('Clients:\n')
+    _, _, tail = tail.partition('\n\n')
+    lines = [' /10.{}.{}.{}:{}[1](queued={},recved={},sent={})\n'.format(
+        num >> 16 & 255, num >> 8 & 255, num & 255, 40000 + num % 20000, num % 7, num * 3, num * 3)
+        for num in range(clients)]
+    return '{}Clients:\n{}\n{}'.format(head, ''.join(lines), tail).encode('utf-8')
+
+
+def percentile(values, point):
+    """ Nearest-rank percentile of sorted values """
+    if not values:
+        return None
+    return values[max(int(math.ceil(point / 100.0 * len(values))), 1) - 1]
+
+
+class LagMonitor(object):
+    """ Measures IOLoop lag - how late a timer fires """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.lags = []
+        self._running = False
+
+    def start(self):
+        self._running = True
+        IOLoop.current().spawn_callback(self._run)
+
+    def stop(self):
+        self._running = False
+
+    async def _run(self):
+        while self._running:
+            start = time.perf_counter()
+            await gen.sleep(self.interval)
+            self.lags.append(max(time.perf_counter() - start - self.interval, 0))
+
+
+async def load(url, duration, concurrency):
+    """ Sends requests to url for `duration` seconds
+
+    Returns:
+        Tuple of sorted latencies (seconds), number of errors and elapsed time
+    """
+    client = httpclient.AsyncHTTPClient(force_instance=True, max_clients=concurrency)
+    latencies = []
+    errors = []
+    start = time.perf_counter()
+    deadline = start + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            request_start = time.perf_counter()
+            try:
+                await client.fetch(url, request_timeout=60)
+            except (httpclient.HTTPError, IOError):
+                errors.append(1)
+            else:
+                latencies.append(time.perf_counter() - request_start)
+
+    await gen.multi([worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    client.close()
+    return sorted(latencies), len(errors), elapsed
+
+
+async def bench(args):
+    servers = [FakeZookeeper({'stat': make_stat(args.clients)}) for _ in range(args.hosts)]
+    ports = [await server.start() for server in servers]
+    webmonitor = WebMonitor()
+    webmonitor.set_cluster({'name': 'bench', 'hosts': [{'addr': '127.0.0.1', 'port': port} for port in ports]})
+    sock, port = bind_unused_port()
+    http_server = HTTPServer(webmonitor)
+    http_server.add_sockets([sock])
+    results = {}
+    try:
+        for name in args.endpoints:
+            url = 'http://127.0.0.1:{}{}'.format(port, ENDPOINTS[name].format(port=ports[0]))
+            await load(url, min(args.duration, 1), args.concurrency)  # warm up
+            lag = LagMonitor(args.lag_interval / 1000.0)
+            lag.start()
+            latencies, errors, elapsed = await load(url, args.duration, args.concurrency)
+            lag.stop()
+            lags = sorted(lag.lags)
+            results[name] = {
+                'rps': len(latencies) / elapsed,
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'lag_p99': percentile(lags, 99),
+                'lag_max': lags[-1] if lags else None,
+                'errors': errors,
+            }
+    finally:
+        http_server.stop()
+        for server in servers:
+            server.stop()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """ Finds regressions against baseline
+
+    Returns:
+        List of messages, empty if there are no regressions
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result['rps'] < base['rps'] * (1 - threshold):
+            regressions.append('{}: rps {:.0f} < baseline {:.0f}'.format(name, result['rps'], base['rps']))
+        if result['p99'] is not None and base['p99'] and result['p99'] > base['p99'] * (1 + threshold):
+            regressions.append('{}: p99 {:.2f} ms > baseline {:.2f} ms'.format(
+                name, result['p99'] * 1e3, base['p99'] * 1e3))
+    return regressions
+
+
+def ms(value):
+    return '-' if value is None else '{:.2f}'.format(value * 1e3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Web monitor HTTP load test')
+    parser.add_argument('--hosts', type=int, default=3, help='Number of fake zookeepers')
+    parser.add_argument('--clients', type=int, default=100, help='Clients per zookeeper (stat)')
+    parser.add_argument('-c', '--concurrency', type=int, default=10, help='Requests in flight')
+    parser.add_argument('-d', '--duration', type=float, default=5, help='Seconds per endpoint')
+    parser.add_argument('-e', '--endpoints', default=','.join(sorted(ENDPOINTS)),
+                        help='Comma separated endpoints: {}'.format(', '.join(sorted(ENDPOINTS))))
+    parser.add_argument('--lag-interval', type=float, default=10, help='IOLoop lag timer in ms')
+    parser.add_argument('--baseline', default=BASELINE,
+                        help='JSON file with baselines, compared when it exists. Default benchmarks/web.json, '
+                             'empty - disabled')
+    parser.add_argument('--save', action='store_true', help='Store results as baseline instead of comparing')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed regression, default 0.2 (20%%)')
+    args = parser.parse_args()
+    args.endpoints = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+    unknown = [name for name in args.endpoints if name not in ENDPOINTS]
+    if unknown:
+        parser.error('Unknown endpoints: {}'.format(', '.join(unknown)))
+
+    results = IOLoop.current().run_sync(lambda: bench(args))
+    print('{:<14} {:>8} {:>9} {:>9} {:>9} {:>9} {:>9} {:>6}'.format(
+        'endpoint', 'rps', 'p50 ms', 'p95 ms', 'p99 ms', 'lag99 ms', 'lagmax ms', 'errors'))
+    for name, result in results.items():
+        print('{:<14} {:>8.0f} {:>9} {:>9} {:>9} {:>9} {:>9} {:>6}'.format(
+            name, result['rps'], ms(result['p50']), ms(result['p95']), ms(result['p99']),
+            ms(result['lag_p99']), ms(result['lag_max']), result['errors']))
+
+    if not args.baseline:
+        return 0
+    scenario = 'hosts={},clients={},concurrency={}'.format(args.hosts, args.clients, args.concurrency)
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as source:
+            baselines = json.load(source)
+    if args.save:
+        baselines.setdefault(scenario, {}).update(results)
+        with open(args.baseline, 'w') as sink:
+            json.dump(baselines, sink, indent=2, sort_keys=True)
+        print('Baseline {} saved to {}'.format(scenario, args.baseline))
+        return 0
+    if scenario not in baselines:
+        print('No baseline for {} in {}'.format(scenario, args.baseline))
+        return 0
+    regressions = compare(results, baselines[scenario], args.threshold)
+    for regression in regressions:
+        print('REGRESSION {}'.format(regression))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -15,21 +15,21 @@ setup(
     author_email='krzysztof@warunek.net',
     description='Zookeeper\'s four letters command wrapper and web monitor.',
     include_package_data = True,
-    keywords='zookeeper, tcp, tornado',
+    keywords='zookeeper, tcp, tornado, asyncio',
     url='https://github.com/kwarunek/zookeeper_monitor',
     long_description=open('README.rst').read(),
     install_requires=open('requirements.txt', 'r').read(),
-    tests_require=['mock', 'nose', 'coverage'],
+    tests_require=['nose', 'coverage'],
+    python_requires='>=3.7',
     license="MIT",
     classifiers=[
         'License :: OSI Approved :: MIT License',
-        'Programming Language :: Python :: 2.7',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.0',
-        'Programming Language :: Python :: 3.1',
-        'Programming Language :: Python :: 3.2',
-        'Programming Language :: Python :: 3.3',
-        'Programming Language :: Python :: 3.4',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
         'Operating System :: POSIX',
         'Development Status :: 4 - Beta'
     ]
@@ -6,19 +6,19 @@ parse_info_data = {
     'ok': [
         {
             'in': result_of_execute_srvr_ok.split('\n'),
-            'out': {'zookeeper': '123', 'zxid': '33', 'some': '55:AA', 'trailing': 'space'},
+            'out': {'zookeeper': '123', 'zxid': 0x33, 'zxid_epoch': 0, 'zxid_counter': 0x33, 'some': '55:AA', 'trailing': 'space'},
             'health': 'HOST_HEALTHY',
             'mode': 'FOLLOWER'
         },
         {
             'in': result_of_execute_srvr_ok.upper().split('\n'),
-            'out': {'zookeeper': '123', 'zxid': '33', 'some': '55:AA', 'trailing': 'SPACE'},
+            'out': {'zookeeper': '123', 'zxid': 0x33, 'zxid_epoch': 0, 'zxid_counter': 0x33, 'some': '55:AA', 'trailing': 'SPACE'},
             'health': 'HOST_HEALTHY',
             'mode': 'FOLLOWER'
         },
         {
             'in': result_of_execute_srvr_ok.lower().split('\n'),
-            'out': {'zookeeper': '123', 'zxid': '33',  'some': '55:aa', 'trailing': 'space'},
+            'out': {'zookeeper': '123', 'zxid': 0x33, 'zxid_epoch': 0, 'zxid_counter': 0x33, 'some': '55:aa', 'trailing': 'space'},
             'health': 'HOST_HEALTHY',
             'mode': 'FOLLOWER'
         },
@@ -131,3 +131,57 @@ simple= {
     'in': 'ABCDEF',
     'out': 'ABCDEF'
 }
+
+
+conf = {
+    'in': 'clientPort=2181\n'
+          'dataDir=/var/lib/zookeeper/version-2\n'
+          'maxClientCnxns=60\n'
+          'serverId=1\n'
+          'server.1=10.0.0.1:2888:3888:participant;0.0.0.0:2181\n'
+          'server.3=10.0.0.3:2888:3888:observer;10.1.0.3:2281\n'
+          'server.2=zk2.local:2888:3888\n'
+          'server.4=[fe80::1]:2888:3888:participant;[fe80::1]:2182\n'
+          'server.5=broken\n'
+          'version=100000000\n',
+    'out': {
+        'clientPort': '2181',
+        'dataDir': '/var/lib/zookeeper/version-2',
+        'maxClientCnxns': '60',
+        'serverId': '1',
+        'server.1': '10.0.0.1:2888:3888:participant;0.0.0.0:2181',
+        'server.3': '10.0.0.3:2888:3888:observer;10.1.0.3:2281',
+        'server.2': 'zk2.local:2888:3888',
+        'server.4': '[fe80::1]:2888:3888:participant;[fe80::1]:2182',
+        'server.5': 'broken',
+        'version': '100000000'
+    },
+    'servers': [
+        {'id': 1, 'addr': '10.0.0.1', 'port': 2181, 'role': 'participant'},
+        {'id': 2, 'addr': 'zk2.local', 'port': 2181, 'role': 'participant'},
+        {'id': 3, 'addr': '10.1.0.3', 'port': 2281, 'role': 'observer'},
+        {'id': 4, 'addr': 'fe80::1', 'port': 2182, 'role': 'participant'},
+    ]
+}
+
+cons = {
+    'in': ' /10.0.0.1:53512[1](queued=0,recved=9,sent=9,sid=0x100d,lop=PING,est=1600000000000,to=30000,'
+          'lcxid=0x3,lzxid=0x21,lresp=1600000005000,llat=0,minlat=0,avglat=0.5,maxlat=2)\n'
+          ' /0:0:0:0:0:0:0:1:53514[1](queued=2,recved=120,sent=118,sid=0x100e,lop=GETD,est=1600000000001,to=40000,'
+          'lcxid=0x7a,lzxid=0xffffffffffffffff,lresp=1600000005001,llat=7,minlat=0,avglat=3,maxlat=41)\n'
+          ' /10.0.0.2:53600[0](queued=0,recved=1,sent=0)\n'
+          ' /10.0.0.3:53601[1](queued=x,recved=1,sent=0)\n'
+          '\n',
+    'rows': [
+        {'host': '10.0.0.1', 'port': 53512, 'n': 1, 'queued': 0, 'recved': 9, 'sent': 9, 'sid': '0x100d',
+         'lop': 'PING', 'est': 1600000000000, 'to': 30000, 'lcxid': '0x3', 'lzxid': '0x21',
+         'lresp': 1600000005000, 'llat': 0, 'minlat': 0, 'avglat': 0.5, 'maxlat': 2},
+        {'host': '0:0:0:0:0:0:0:1', 'port': 53514, 'n': 1, 'queued': 2, 'recved': 120, 'sent': 118, 'sid': '0x100e',
+         'lop': 'GETD', 'est': 1600000000001, 'to': 40000, 'lcxid': '0x7a', 'lzxid': '0xffffffffffffffff',
+         'lresp': 1600000005001, 'llat': 7, 'minlat': 0, 'avglat': 3.0, 'maxlat': 41},
+        {'host': '10.0.0.2', 'port': 53600, 'n': 0, 'queued': 0, 'recved': 1, 'sent': 0, 'sid': None,
+         'lop': None, 'est': None, 'to': None, 'lcxid': None, 'lzxid': None,
+         'lresp': None, 'llat': None, 'minlat': None, 'avglat': None, 'maxlat': None},
+    ],
+    'errors': ['/10.0.0.3:53601[1](queued=x,recved=1,sent=0)'],
+}
@@ -0,0 +1,230 @@
+# -*- coding:utf-8 -*-
+""" Fake zookeeper answering four letters commands (and AdminServer's HTTP commands) on a local port """
+import asyncio
+import json
+import os
+import ssl as _ssl
+
+TLS_CERT = os.path.join(os.path.dirname(__file__), 'tls', 'cert.pem')
+TLS_KEY = os.path.join(os.path.dirname(__file__), 'tls', 'key.pem')
+
+
+SRVR = (
+    'Zookeeper version: 3.4.6-1569965, built on 02/20/2014 09:09 GMT\n'
+    'Latency min/avg/max: 0/1/12\n'
+    'Received: 1027\n'
+    'Sent: 1026\n'
+    'Connections: 2\n'
+    'Outstanding: 0\n'
+    'Zxid: 0x100000003\n'
+    'Mode: follower\n'
+    'Node count: 4\n'
+)
+
+STAT = (
+    'Zookeeper version: 3.4.6-1569965, built on 02/20/2014 09:09 GMT\n'
+    'Clients:\n'
+    ' /127.0.0.1:60841[1](queued=0,recved=45,sent=45)\n'
+    ' /127.0.0.1:57782[1](queued=2,recved=905,sent=903)\n'
+    '\n'
+    'Latency min/avg/max: 0/1/12\n'
+    'Received: 1027\n'
+    'Sent: 1026\n'
+    'Connections: 2\n'
+    'Outstanding: 0\n'
+    'Zxid: 0x100000003\n'
+    'Mode: follower\n'
+    'Node count: 4\n'
+)
+
+MNTR = (
+    'zk_version\t3.4.6-1569965, built on 02/20/2014 09:09 GMT\n'
+    'zk_avg_latency\t1\n'
+    'zk_max_latency\t12\n'
+    'zk_min_latency\t0\n'
+    'zk_packets_received\t1027\n'
+    'zk_packets_sent\t1026\n'
+    'zk_num_alive_connections\t2\n'
+    'zk_outstanding_requests\t0\n'
+    'zk_server_state\tfollower\n'
+    'zk_znode_count\t4\n'
+    'zk_watch_count\t0\n'
+    'zk_ephemerals_count\t0\n'
+    'zk_approximate_data_size\t27\n'
+    'zk_open_file_descriptor_count\t25\n'
+    'zk_max_file_descriptor_count\t4096\n'
+)
+
+RESPONSES = {
+    'srvr': SRVR.encode('utf-8'),
+    'stat': STAT.encode('utf-8'),
+    'mntr': MNTR.encode('utf-8'),
+    'ruok': b'imok',
+}
+
+
+def tls_context():
+    """ Server's SSLContext with self-signed certificate of localhost and 127.0.0.1 (TLS_CERT) """
+    context = _ssl.SSLContext(_ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(TLS_CERT, TLS_KEY)
+    return context
+
+
+class FakeZookeeper(object):
+    """ Answers 4lw commands with canned responses
+
+    Responses can be bytes or callables returning bytes, `delay` postpones every answer,
+    it can be also a dict command -> delay. Started with server's SSLContext it serves TLS
+    (see tls_context for self-signed localhost's certificate).
+    """
+
+    def __init__(self, responses=None, delay=0):
+        self.responses = dict(RESPONSES)
+        self.responses.update(responses or {})
+        self.delay = delay
+        self.commands = []
+        self.port = None
+        self._server = None
+
+    async def start(self, addr='127.0.0.1', port=0, ssl=None):
+        self._server = await asyncio.start_server(self._handle, addr, port, ssl=ssl)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    def stop(self):
+        if self._server:
+            self._server.close()
+            self._server = None
+
+    async def _handle(self, reader, writer):
+        try:
+            cmd = (await reader.readline()).strip().decode('utf-8')
+            self.commands.append(cmd)
+            delay = self.delay.get(cmd, 0) if isinstance(self.delay, dict) else self.delay
+            if delay:
+                await asyncio.sleep(delay)
+            response = self.responses.get(cmd, b'')
+            if callable(response):
+                response = response()
+            writer.write(response)
+            await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+
+VERSION = '3.5.8-f439ca583e70862c3068a1f2a7d4d068eec33315, built on 05/04/2020 15:07 GMT'
+
+SERVER_STATS = {
+    'packets_sent': 1026,
+    'packets_received': 1027,
+    'fsync_threshold_exceed_count': 0,
+    'provider_null': False,
+    'server_state': 'follower',
+    'outstanding_requests': 0,
+    'min_latency': 0,
+    'avg_latency': 1,
+    'max_latency': 12,
+    'data_dir_size': 671089000,
+    'log_dir_size': 671089000,
+    'last_processed_zxid': 0x100000003,
+    'num_alive_client_connections': 2,
+}
+
+CONNECTIONS = [
+    {'remote_socket_address': '127.0.0.1:60841', 'interest_ops': 1, 'outstanding_requests': 0,
+     'packets_received': 45, 'packets_sent': 45},
+    {'remote_socket_address': '127.0.0.1:57782', 'interest_ops': 1, 'outstanding_requests': 2,
+     'packets_received': 905, 'packets_sent': 903},
+]
+
+ADMIN = {
+    'server_stats': {'version': VERSION, 'read_only': False, 'server_stats': SERVER_STATS, 'node_count': 4,
+                     'command': 'server_stats', 'error': None},
+    'stats': {'version': VERSION, 'read_only': False, 'server_stats': SERVER_STATS, 'node_count': 4,
+              'connections': CONNECTIONS, 'secure_connections': [], 'command': 'stats', 'error': None},
+    'monitor': {'version': VERSION, 'avg_latency': 1, 'max_latency': 12, 'min_latency': 0,
+                'packets_received': 1027, 'packets_sent': 1026, 'num_alive_connections': 2,
+                'outstanding_requests': 0, 'server_state': 'follower', 'znode_count': 4, 'watch_count': 0,
+                'ephemerals_count': 0, 'approximate_data_size': 27, 'open_file_descriptor_count': 25,
+                'max_file_descriptor_count': 4096, 'command': 'monitor', 'error': None},
+    'connections': {
+        'connections': [dict(CONNECTIONS[0], session_id='100000a6c4b0001', last_operation='PING',
+                             established=1400000000000, session_timeout=30000, last_cxid='0x3',
+                             last_zxid='0x100000003', last_response_time=1400000001000, last_latency=0,
+                             min_latency=0, avg_latency=0.5, max_latency=2)],
+        'secure_connections': [], 'command': 'connections', 'error': None},
+    'ruok': {'command': 'ruok', 'error': None},
+}
+
+
+class FakeAdminServer(object):
+    """ Answers AdminServer's `/commands/<name>` with canned JSON over keep-alive HTTP/1.1
+
+    Responses are dicts (or callables returning them), `chunked` sends them with chunked
+    transfer encoding, `keep_alive` False closes connection after every response.
+    Opened connections are counted in `connections`.
+    """
+
+    def __init__(self, responses=None, chunked=False, keep_alive=True):
+        self.responses = dict(ADMIN)
+        self.responses.update(responses or {})
+        self.chunked = chunked
+        self.keep_alive = keep_alive
+        self.commands = []
+        self.connections = 0
+        self.port = None
+        self._server = None
+        self._writers = []
+
+    async def start(self, addr='127.0.0.1', port=0):
+        self._server = await asyncio.start_server(self._handle, addr, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    def stop(self):
+        if self._server:
+            self._server.close()
+            self._server = None
+        self.drop()
+
+    def drop(self):
+        """ Closes open (idle) connections """
+        for writer in self._writers:
+            writer.close()
+        self._writers = []
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._writers.append(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                while (await reader.readline()).strip():
+                    pass
+                name = line.split()[1].decode('utf-8').rpartition('/')[2]
+                self.commands.append(name)
+                response = self.responses.get(name)
+                if callable(response):
+                    response = response()
+                status = '200 OK' if response is not None else '404 Not Found'
+                body = json.dumps(response or {'command': name, 'error': 'Unknown command'}).encode('utf-8')
+                headers = 'HTTP/1.1 {}\r\nContent-Type: application/json\r\n'.format(status)
+                if not self.keep_alive:
+                    headers += 'Connection: close\r\n'
+                if self.chunked:
+                    half = len(body) // 2
+                    body = b''.join(b'%x\r\n%s\r\n' % (len(part), part) for part in (body[:half], body[half:]))
+                    writer.write('{}Transfer-Encoding: chunked\r\n\r\n'.format(headers).encode('ascii') + body + b'0\r\n\r\n')
+                else:
+                    writer.write('{}Content-Length: {}\r\n\r\n'.format(headers, len(body)).encode('ascii') + body)
+                await writer.drain()
+                if not self.keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,161 @@
+# -*- coding:utf-8 -*-
+import asyncio
+from unittest import TestCase
+from zookeeper_monitor import zk
+from zookeeper_monitor.zk import admin
+from .fixtures.server import FakeAdminServer, FakeZookeeper, ADMIN
+
+
+class PoolTest(TestCase):
+
+    def _run(self, coro):
+        return asyncio.run(coro)
+
+    def _serve(self, run, **kwargs):
+        async def serve():
+            server = FakeAdminServer(**kwargs)
+            port = await server.start()
+            pool = admin.HTTPPool()
+            try:
+                return await run(server, pool, port)
+            finally:
+                pool.close()
+                server.stop()
+
+        return self._run(serve())
+
+    def test_keep_alive(self):
+        async def run(server, pool, port):
+            responses = [await pool.get('127.0.0.1', port, '/commands/ruok') for _ in range(3)]
+            return responses, server.connections, pool.get_stats()
+
+        responses, connections, stats = self._serve(run)
+        self.assertEqual([status for status, _ in responses], [200] * 3)
+        self.assertEqual(connections, 1)
+        self.assertEqual(stats, {'connects': 1, 'requests': 3, 'idle': 1})
+
+    def test_concurrent_and_chunked(self):
+        async def run(server, pool, port):
+            first = await asyncio.gather(*[pool.get('127.0.0.1', port, '/commands/stats') for _ in range(3)])
+            second = await asyncio.gather(*[pool.get('127.0.0.1', port, '/commands/stats') for _ in range(3)])
+            return first + second, server.connections
+
+        responses, connections = self._serve(run, chunked=True)
+        self.assertEqual(connections, 3)
+        self.assertTrue(all(body.startswith(b'{"version"') and body.endswith(b'}') for _, body in responses))
+
+    def test_reconnect_and_close(self):
+        async def run(server, pool, port):
+            await pool.get('127.0.0.1', port, '/commands/ruok')
+            server.drop()
+            status, _ = await pool.get('127.0.0.1', port, '/commands/ruok')
+            return status, server.connections
+
+        self.assertEqual(self._serve(run), (200, 2))
+
+        async def run(server, pool, port):
+            for _ in range(2):
+                await pool.get('127.0.0.1', port, '/commands/ruok')
+            return server.connections, pool.get_stats()['idle']
+
+        self.assertEqual(self._serve(run, keep_alive=False), (2, 0))
+
+    def test_max_bytes(self):
+        async def run(server, pool, port):
+            return await pool.get('127.0.0.1', port, '/commands/stats', max_bytes=10)
+
+        self.assertRaises(zk.HostResponseTooLarge, self._serve, run)
+        self.assertRaises(zk.HostResponseTooLarge, self._serve, run, chunked=True)
+
+
+class AdminBackendTest(TestCase):
+
+    def _run(self, coro):
+        return asyncio.run(coro)
+
+    def _poll(self, backend, run, responses=None):
+        async def serve():
+            server = FakeAdminServer(responses)
+            zookeeper = FakeZookeeper()
+            port = await zookeeper.start()
+            cluster = zk.Cluster('c')
+            host = zk.Host('127.0.0.1', port)
+            cluster.add_host(host)
+            if backend is not None:
+                cluster.set_backend(dict(backend, port=await server.start()))
+            try:
+                return await run(host), server, zookeeper
+            finally:
+                cluster.set_backend(None)
+                server.stop()
+                zookeeper.stop()
+
+        return self._run(serve())
+
+    def test_same_results_as_4lw(self):
+        async def run(host):
+            return [await host.srvr_async(), await host.stat_async(), await host.mntr_async(), await host.ruok_async()]
+
+        results, server, zookeeper = self._poll({'type': 'admin'}, run)
+        expected, _, _ = self._poll(None, run)
+        self.assertEqual(server.commands, ['server_stats', 'stats', 'monitor', 'ruok'])
+        self.assertEqual(zookeeper.commands, [])
+        self.assertEqual(server.connections, 1)
+        for result, four in zip(results[:2], expected[:2]):
+            self.assertEqual(dict(result, zookeeper=None, head=None), dict(four, zookeeper=None, head=None))
+        self.assertEqual(results[0]['zxid_epoch'], 1)
+        self.assertEqual(results[1]['clients'][1], {
+            'host': '127.0.0.1', 'port': '57782', 'n': '1', 'queued': '2', 'recved': '905', 'sent': '903'})
+        self.assertEqual(dict(results[2], zk_version=None), dict(expected[2], zk_version=None))
+        self.assertEqual(results[3], 'imok')
+
+    def test_poll(self):
+        async def run(host):
+            return await host.poll_async(), host
+
+        (record, host), server, zookeeper = self._poll({'type': 'admin', 'max_idle': 2}, run)
+        self.assertTrue(record['ok'])
+        self.assertEqual(record['info']['mode'], zk.Host.FOLLOWER)
+        self.assertEqual(len(record['stat']['clients']), 2)
+        self.assertEqual(record['mntr']['zk_znode_count'], 4)
+        self.assertEqual(host.health, zk.Host.HOST_HEALTHY)
+        self.assertGreater(host.timings['mntr']['bytes'], 0)
+        self.assertEqual(server.connections, 3)
+
+    def test_cons_and_fallback(self):
+        async def run(host):
+            return await host.cons_async(), await host.wchs_async()
+
+        (table, wchs), server, zookeeper = self._poll({'type': 'admin'}, run)
+        self.assertEqual(len(table), 1)
+        row = table.row(0)
+        self.assertEqual((row['host'], row['port'], row['sid'], row['avglat']), ('127.0.0.1', 60841, '0x100000a6c4b0001', 0.5))
+        self.assertEqual(server.commands, ['connections'])
+        self.assertEqual(zookeeper.commands, ['wchs'])
+
+    def test_error(self):
+        async def run(host):
+            return await host.srvr_async(), host.health
+
+        error = dict(ADMIN['server_stats'], error='Not serving')
+        self.assertEqual(self._poll({'type': 'admin'}, run, {'server_stats': error})[0], (False, zk.Host.HOST_ERROR))
+        leader = dict(ADMIN['server_stats'], server_stats=dict(ADMIN['server_stats']['server_stats'], server_state='leader'))
+        result, health = self._poll({'type': 'admin'}, run, {'server_stats': leader})[0]
+        self.assertEqual((result['mode'], health), (zk.Host.LEADER, zk.Host.HOST_HEALTHY))
+
+    def test_build_backend(self):
+        self.assertIsNone(admin.build_backend(None))
+        self.assertIsNone(admin.build_backend({'type': '4lw'}))
+        backend = admin.build_backend({'type': 'admin', 'port': '9090', 'path': '/cmd/'})
+        self.assertEqual((backend.port, backend.path), (9090, '/cmd'))
+        self.assertRaises(ValueError, admin.build_backend, {'type': 'jmx'})
+
+        cluster = zk.Cluster('c')
+        cluster.add_host(addr='zk1')
+        cluster.set_backend({'type': 'admin'})
+        host = cluster.get_host('zk1:2181')
+        self.assertIsInstance(host._backend, admin.AdminBackend)
+        cluster.add_host(addr='zk2')
+        self.assertIs(cluster.get_host('zk2:2181')._backend, host._backend)
+        cluster.set_backend(None)
+        self.assertIsNone(host._backend)
@@ -0,0 +1,158 @@
+# -*- coding:utf-8 -*-
+import json
+import os
+import tempfile
+from unittest import TestCase
+from tornado import gen, web
+from tornado.testing import AsyncHTTPTestCase, gen_test
+from zookeeper_monitor import alerts
+from zookeeper_monitor.alerts import AlertEngine, Rule, RuleIndex, RuleSyntaxError
+from zookeeper_monitor.zk import Host
+
+
+class RuleTest(TestCase):
+
+    def test_compile(self):
+        rule = Rule('zk_avg_latency > 50 for 2m')
+        self.assertEqual(rule.trigger, ('zk_avg_latency', '>', 50.0, 120.0))
+        self.assertEqual(rule.name, 'zk_avg_latency > 50 for 2m')
+        self.assertEqual(Rule('health != OK').trigger, ('health', '!=', 'OK', 0))
+        self.assertEqual(Rule('lag<=1.5 for 30s', name='lag').trigger.duration, 30)
+
+    def test_compile_errors(self):
+        for expr in ('', 'zk_avg_latency', 'zk_avg_latency >> 5', 'mode > LEADER', 'x > 1 for 2d'):
+            with self.assertRaises(RuleSyntaxError):
+                Rule(expr)
+        with self.assertRaises(RuleSyntaxError):
+            AlertEngine.compile(['x > 1', {'expr': 'x > 2', 'name': 'x > 1'}])
+
+    def test_index(self):
+        rules = [Rule('x {} {}'.format(op, value)) for op in ('>', '>=', '<', '<=', '==', '!=') for value in range(5)]
+        index = RuleIndex(rules)
+        for value in (-1.0, 0.0, 2.0, 2.5, 4.0, 9.0):
+            metrics = {'x': value}
+            expected = sorted(rule.name for rule in rules if rule.trigger.test(metrics))
+            self.assertEqual(sorted(rule.name for rule in index.match(metrics)), expected)
+        self.assertEqual(index.match({'y': 1.0}), [])
+        self.assertEqual(index.match({'x': 'string'}), [rule for rule in rules if rule.trigger.op == '!='])
+
+
+class AlertEngineTest(TestCase):
+
+    def setUp(self):
+        self.notified = []
+        self.engine = AlertEngine([
+            {'name': 'latency', 'expr': 'zk_avg_latency > 50 for 2m', 'clear': 'zk_avg_latency < 40 for 1m'},
+            'health != OK',
+        ], [self.notified.append])
+
+    def _states(self, notifications):
+        return [(alert['rule'], alert['state']) for alert in notifications]
+
+    def test_for_duration(self):
+        self.assertEqual(self.engine.evaluate('c', 'zk1', {'zk_avg_latency': 60.0, 'health': 'OK'}, now=0), [])
+        self.assertEqual(self.engine.evaluate('c', 'zk1', {'zk_avg_latency': 60.0, 'health': 'OK'}, now=100), [])
+        fired = self.engine.evaluate('c', 'zk1', {'zk_avg_latency': 70.0, 'health': 'OK'}, now=120)
+        self.assertEqual(self._states(fired), [('latency', alerts.FIRING)])
+        self.assertEqual(fired[0]['value'], 70.0)
+        self.assertEqual(self.notified, fired)
+        self.assertEqual([alert['host'] for alert in self.engine.active()], ['zk1'])
+
+    def test_pending_reset(self):
+        self.engine.evaluate('c', 'zk1', {'zk_avg_latency': 60.0}, now=0)
+        self.engine.evaluate('c', 'zk1', {'zk_avg_latency': 10.0}, now=60)
+        self.assertEqual(self.engine.evaluate('c', 'zk1', {'zk_avg_latency': 60.0}, now=130), [])
+
+    def test_hysteresis(self):
+        self.engine.evaluate('c', 'zk1', {'zk_avg_latency': 60.0}, now=0)
+        self.engine.evaluate('c', 'zk1', {'zk_avg_latency': 60.0}, now=120)
+        # between clear and trigger thresholds - keeps firing
+        self.assertEqual(self.engine.evaluate('c', 'zk1', {'zk_avg_latency': 45.0}, now=500), [])
+        self.engine.evaluate('c', 'zk1', {'zk_avg_latency': 30.0}, now=600)
+        self.engine.evaluate('c', 'zk1', {'zk_avg_latency': 45.0}, now=630)
+        self.assertEqual(self.engine.evaluate('c', 'zk1', {'zk_avg_latency': 30.0}, now=680), [])
+        resolved = self.engine.evaluate('c', 'zk1', {'zk_avg_latency': 30.0}, now=740)
+        self.assertEqual(self._states(resolved), [('latency', alerts.RESOLVED)])
+        self.assertEqual(self.engine.active(), [])
+
+    def test_unknown_metric_keeps_firing(self):
+        fired = self.engine.evaluate('c', 'zk1', {'health': Host.HOST_TIMEOUT}, now=0)
+        self.assertEqual(self._states(fired), [('health != OK', alerts.FIRING)])
+        self.assertEqual(self.engine.evaluate('c', 'zk1', {}, now=10), [])
+        resolved = self.engine.evaluate('c', 'zk1', {'health': Host.HOST_HEALTHY}, now=20)
+        self.assertEqual(self._states(resolved), [('health != OK', alerts.RESOLVED)])
+
+    def test_set_rules_keeps_state(self):
+        self.engine.evaluate('c', 'zk1', {'health': 'ERROR', 'zk_avg_latency': 60.0}, now=0)
+        self.engine.evaluate('c', 'zk1', {'health': 'ERROR', 'zk_avg_latency': 60.0}, now=120)
+        self.engine.set_rules(['health != OK'])
+        self.assertEqual([alert['rule'] for alert in self.engine.active()], ['health != OK'])
+
+    def test_prune(self):
+        for cluster, host in (('c', 'zk1'), ('c', 'zk2'), ('d', 'zk1')):
+            self.engine.evaluate(cluster, host, {'health': Host.HOST_TIMEOUT}, now=0)
+        self.engine.prune('c', ['zk2'])
+        self.assertEqual(sorted((alert['cluster'], alert['host']) for alert in self.engine.active()),
+                         [('c', 'zk2'), ('d', 'zk1')])
+        self.engine.prune('d')
+        self.assertEqual([alert['host'] for alert in self.engine.active()], ['zk2'])
+
+    def test_metrics(self):
+        leader, follower = Host('zk1', cluster='c'), Host('zk2', cluster='c')
+        self.engine.metrics(leader, {'info': {'mode': 'LEADER', 'zxid': 0x100000010}})
+        metrics = self.engine.metrics(follower, {
+            'info': {'mode': 'FOLLOWER', 'zxid': 0x100000001, 'latency_max': 12, 'received': 1027},
+            'mntr': {'zk_avg_latency': 1, 'zk_server_state': 'follower'},
+        })
+        self.assertEqual(metrics['follower_zxid_lag'], 15)
+        self.assertEqual(metrics['latency_max'], 12)
+        self.assertEqual(metrics['received'], 1027)
+        self.assertEqual(metrics['zk_server_state'], 'follower')
+        self.assertEqual(metrics['health'], Host.HOST_UNCHECKED)
+        matched = self.engine._index.match(dict(metrics, zk_avg_latency=51, health='OK'))
+        self.assertEqual([rule.name for rule in matched], ['latency'])
+
+    def test_failing_sink(self):
+        self.engine.sinks.insert(0, lambda alert: 1 / 0)
+        self.engine.evaluate('c', 'zk1', {'health': 'ERROR'}, now=0)
+        self.assertEqual(len(self.notified), 1)
+
+
+class SinkTest(TestCase):
+
+    def test_file_sink(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            sink = alerts.build_sink({'type': 'file', 'path': path})
+            sink({'rule': 'r', 'state': alerts.FIRING})
+            with open(path) as log:
+                self.assertEqual(json.loads(log.read()), {'rule': 'r', 'state': alerts.FIRING})
+        finally:
+            os.remove(path)
+
+    def test_unknown_sink(self):
+        with self.assertRaises(ValueError):
+            alerts.build_sink({'type': 'pager'})
+
+
+class WebhookSinkTest(AsyncHTTPTestCase):
+
+    def get_app(self):
+        received = self.received = []
+
+        class Hook(web.RequestHandler):
+            def post(self):
+                received.append(json.loads(self.request.body.decode('utf-8')))
+
+        return web.Application([(r'/hook', Hook)])
+
+    @gen_test
+    def test_send(self):
+        sink = alerts.build_sink({'type': 'webhook', 'url': self.get_url('/hook')})
+        sink({'rule': 'r', 'state': alerts.FIRING})
+        while not self.received:
+            yield gen.sleep(0.01)
+        self.assertEqual(self.received, [{'rule': 'r', 'state': alerts.FIRING}])
+        yield sink.send({'rule': 'r'})
+        yield alerts.WebhookSink(self.get_url('/missing')).send({'rule': 'r'})
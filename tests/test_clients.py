@@ -0,0 +1,113 @@
+# -*- coding:utf-8 -*-
+from functools import partial
+from unittest import TestCase
+from zookeeper_monitor.zk import clients
+
+
+def client(host, port, queued=0, recved=0, sent=0):
+    return {'host': host, 'port': str(port), 'n': '1',
+            'queued': str(queued), 'recved': str(recved), 'sent': str(sent)}
+
+
+class ClientsTest(TestCase):
+
+    def setUp(self):
+        self.stats = {
+            'zk1:2181': {'clients': [
+                client('10.0.1.1', 1000, queued=5, sent=10),
+                client('10.0.1.2', 1001, queued=1, sent=100),
+                client('10.0.2.1', 1002, queued=0, sent=1),
+            ]},
+            'zk2:2181': {'clients': [
+                client('10.0.1.1', 2000, queued=7, sent=3),
+            ]},
+            'zk3:2181': False,
+        }
+
+    def test_subnet(self):
+        self.assertEqual(clients.subnet('10.1.2.3'), '10.1.2.3')
+        self.assertEqual(clients.subnet('10.1.2.3', 24), '10.1.2.0/24')
+        self.assertEqual(clients.subnet('10.1.200.3', 17), '10.1.128.0/17')
+        self.assertEqual(clients.subnet('10.1.2.3', 0), '0.0.0.0/0')
+
+    def test_top_clients(self):
+        top = clients.top_clients(self.stats, 'queued', 2)
+        self.assertEqual([(item['server'], item['port']) for item in top], [('zk2:2181', '2000'), ('zk1:2181', '1000')])
+        top = clients.top_clients(self.stats, 'sent', 1)
+        self.assertEqual(top[0]['host'], '10.0.1.2')
+        self.assertRaises(ValueError, partial(clients.top_clients, self.stats, 'port'))
+
+    def test_group_clients(self):
+        groups = clients.group_clients(self.stats)
+        self.assertEqual(groups[0], {
+            'network': '10.0.1.1', 'connections': 2, 'servers': ['zk1:2181', 'zk2:2181'],
+            'queued': 12, 'recved': 0, 'sent': 13})
+        self.assertEqual(len(groups), 3)
+        groups = clients.group_clients(self.stats, 24)
+        self.assertEqual([(group['network'], group['connections']) for group in groups],
+                         [('10.0.1.0/24', 3), ('10.0.2.0/24', 1)])
+
+    def test_multi_server_clients(self):
+        self.assertEqual(clients.multi_server_clients(self.stats),
+                         [{'host': '10.0.1.1', 'servers': ['zk1:2181', 'zk2:2181']}])
+
+    def test_connection_imbalance(self):
+        imbalance = clients.connection_imbalance(self.stats)
+        self.assertEqual(imbalance['mean'], 2.0)
+        self.assertEqual(imbalance['stddev'], 1.0)
+        self.assertEqual(imbalance['max_ratio'], 1.5)
+        self.assertEqual(imbalance['servers'][1], {'server': 'zk2:2181', 'connections': 1, 'deviation': -1.0})
+        self.assertEqual(clients.connection_imbalance({})['max_ratio'], 0.0)
+
+    def test_paginate(self):
+        self.assertEqual(clients.paginate([1, 2, 3, 4], 1, 2), {'items': [2, 3], 'total': 4, 'offset': 1, 'limit': 2})
+        self.assertEqual(clients.paginate([1, 2], 0)['items'], [1, 2])
+
+
+class QueryClientsTest(TestCase):
+
+    CLIENTS = [
+        {'host': '10.0.{}.{}'.format(num % 3, num), 'port': str(50000 + num), 'n': '1',
+         'queued': str(num % 7), 'recved': str(num), 'sent': '0'}
+        for num in range(20)
+    ]
+
+    def test_paginate(self):
+        page = clients.query_clients(self.CLIENTS, cursor=5, limit=5)
+        self.assertEqual(page['clients'], self.CLIENTS[5:10])
+        self.assertIs(page['clients'][0], self.CLIENTS[5])
+        self.assertEqual((page['total'], page['next']), (20, 10))
+        self.assertIsNone(clients.query_clients(self.CLIENTS, cursor=15, limit=5)['next'])
+        self.assertEqual(clients.query_clients(self.CLIENTS)['clients'], self.CLIENTS)
+
+    def test_sort(self):
+        page = clients.query_clients(self.CLIENTS, sort='recved', limit=3, cursor=1)
+        self.assertEqual([client['recved'] for client in page['clients']], ['18', '17', '16'])
+        page = clients.query_clients(self.CLIENTS, sort='recved', order='asc', limit=3)
+        self.assertEqual([client['recved'] for client in page['clients']], ['0', '1', '2'])
+        page = clients.query_clients(self.CLIENTS, sort='queued')
+        self.assertEqual(page['clients'][0]['queued'], '6')
+
+    def test_sort_host_port(self):
+        items = [client('10.0.0.10', 32000), client('10.0.0.9', 4000), client('zk.local', 100), client('::1', 5)]
+        page = clients.query_clients(items, sort='port', order='asc')
+        self.assertEqual([item['port'] for item in page['clients']], ['5', '100', '4000', '32000'])
+        page = clients.query_clients(items, sort='host', order='asc')
+        self.assertEqual([item['host'] for item in page['clients']], ['10.0.0.9', '10.0.0.10', '::1', 'zk.local'])
+        page = clients.query_clients(items, sort='host', limit=1)
+        self.assertEqual(page['clients'][0]['host'], 'zk.local')
+
+    def test_prefix(self):
+        page = clients.query_clients(self.CLIENTS, prefix='10.0.1.', fields=['host'])
+        self.assertEqual(page['total'], 7)
+        self.assertEqual(page['clients'][0], {'host': '10.0.1.1'})
+        page = clients.query_clients(self.CLIENTS, prefix='10.0.2.0/24', sort='recved', limit=2)
+        self.assertEqual([client['host'] for client in page['clients']], ['10.0.2.17', '10.0.2.14'])
+        self.assertEqual(page['total'], 6)
+        self.assertEqual(clients.query_clients(self.CLIENTS, prefix='10.0.2.2/32')['total'], 1)
+
+    def test_errors(self):
+        for kwargs in ({'sort': 'x'}, {'order': 'up'}, {'fields': ['host', 'x']}, {'prefix': '10.0.0.0/x'},
+                       {'prefix': 'x/8'}):
+            with self.assertRaises(ValueError):
+                clients.query_clients(self.CLIENTS, **kwargs)
@@ -6,6 +6,8 @@ from functools import partial
 from tornado import gen
 from tornado.testing import AsyncTestCase, gen_test
 from zookeeper_monitor import zk
+from zookeeper_monitor.zk.cluster import divergence
+from .fixtures.server import FakeZookeeper, SRVR
 
 
 try:
@@ -101,3 +103,208 @@ class ClusterTest(AsyncTestCase):
 
     def test_str(self):
         self.assertEqual(str(self.cluster), self.FIXTURE_NAME)
+
+    def test_remove_host(self):
+        self.cluster.add_host(addr=self.FIXTURE_HOST, dc='eu-west')
+        self.cluster.add_host(addr=self.FIXTURE_HOST_2, dc='us-east')
+        host = self.cluster.remove_host('{}:2181'.format(self.FIXTURE_HOST))
+        self.assertEqual(host.addr, self.FIXTURE_HOST)
+        self.assertEqual(len(self.cluster._hosts), 1)
+        self.assertEqual(self.cluster._dc, ['us-east'])
+        self.assertIsNone(self.cluster.remove_host('unknown:2181'))
+
+    def test_sync_hosts(self):
+        self.cluster.add_host(addr=self.FIXTURE_HOST, dc='eu-west')
+        self.cluster.add_host(addr=self.FIXTURE_HOST_2)
+        kept = self.cluster.get_host('{}:2181'.format(self.FIXTURE_HOST))
+        kept.health = zk.Host.HOST_HEALTHY
+
+        added, removed = self.cluster.sync_hosts([
+            {'addr': 'newhost.ip', 'port': self.FIXTURE_PORT},
+            {'addr': self.FIXTURE_HOST, 'dc': 'us-east'},
+        ])
+
+        self.assertEqual([str(host) for host in added], ['newhost.ip:{}'.format(self.FIXTURE_PORT)])
+        self.assertEqual([str(host) for host in removed], ['{}:2181'.format(self.FIXTURE_HOST_2)])
+        self.assertEqual(len(self.cluster._hosts), 2)
+        self.assertIs(self.cluster._hosts[1], kept)
+        self.assertEqual(kept.health, zk.Host.HOST_HEALTHY)
+        self.assertEqual(kept.dc, 'us-east')
+        self.assertEqual(self.cluster._dc, ['us-east'])
+        self.assertEqual(added[0].cluster, str(self.cluster))
+
+    def test_removal_listener(self):
+        removals = []
+        self.cluster.add_removal_listener(lambda cluster, removed: removals.append([str(host) for host in removed]))
+        self.cluster.add_removal_listener(lambda cluster, removed: 1 / 0)
+        self.cluster.add_host(addr=self.FIXTURE_HOST)
+        self.cluster.add_host(addr=self.FIXTURE_HOST_2)
+        self.cluster.add_host(addr='third.ip')
+        self.cluster.sync_hosts([{'addr': self.FIXTURE_HOST}, {'addr': 'third.ip'}])
+        self.cluster.sync_hosts([{'addr': self.FIXTURE_HOST}, {'addr': 'third.ip'}])
+        self.cluster.remove_host('third.ip:2181')
+        self.assertEqual(removals, [['{}:2181'.format(self.FIXTURE_HOST_2)], ['third.ip:2181']])
+
+    def test_sync_hosts_error_keeps_hosts(self):
+        self.cluster.add_host(addr=self.FIXTURE_HOST)
+        self.assertRaises(zk.ClusterHostCreateError, partial(self.cluster.sync_hosts, [{'port': 1}]))
+        self.assertRaises(zk.ClusterHostDuplicateError, partial(
+            self.cluster.sync_hosts, [{'addr': 'a'}, {'addr': 'A'}]))
+        self.assertEqual(len(self.cluster._hosts), 1)
+
+    def _conf_mock(self, servers):
+        conf = dict(('server.{}'.format(num), '{}:2888:3888;{}'.format(addr, port))
+                    for num, (addr, port) in enumerate(servers, 1))
+        return MagicMock(return_value=gen.maybe_future(conf))
+
+    @gen_test
+    def test_discover(self):
+        self.cluster.set_seeds([{'addr': self.FIXTURE_HOST, 'dc': 'eu-west'}])
+        self.cluster.add_host(addr=self.FIXTURE_HOST, dc='eu-west')
+        self.cluster.add_host(addr='gone.ip')
+        seed = self.cluster.get_host('{}:2181'.format(self.FIXTURE_HOST))
+        seed.conf = self._conf_mock([(self.FIXTURE_HOST, 2181), (self.FIXTURE_HOST_2, 2182)])
+
+        added, removed = yield self.cluster.discover()
+
+        seed.conf.assert_called_once_with()
+        self.assertEqual([str(host) for host in added], ['{}:2182'.format(self.FIXTURE_HOST_2)])
+        self.assertEqual([str(host) for host in removed], ['gone.ip:2181'])
+        self.assertIs(self.cluster.get_hosts()[0], seed)
+        self.assertEqual(seed.dc, 'eu-west')
+
+    @gen_test
+    def test_discover_no_seed_answered(self):
+        self.cluster.set_seeds([{'addr': self.FIXTURE_HOST}, {'addr': self.FIXTURE_HOST_2}])
+        self.cluster.add_host(addr='kept.ip')
+        for seed in self.cluster.get_seeds():
+            seed.conf = MagicMock(return_value=gen.maybe_future(False))
+        added, removed = yield self.cluster.discover()
+        self.assertEqual((added, removed), ([], []))
+        self.assertEqual(len(self.cluster.get_hosts()), 1)
+        for seed in self.cluster.get_seeds():
+            seed.conf.assert_called_once_with()
+
+    def test_update_leader(self):
+        self.cluster.add_host(addr=self.FIXTURE_HOST)
+        self.cluster.add_host(addr=self.FIXTURE_HOST_2)
+        self.cluster.discover = MagicMock()
+        self.cluster.set_seeds([{'addr': self.FIXTURE_HOST}])
+        first, second = self.cluster.get_hosts()
+        self.assertIsNone(self.cluster.update_leader())
+
+        first.info['mode'] = zk.Host.LEADER
+        self.assertEqual(self.cluster.update_leader(), str(first))
+        first.info['mode'] = zk.Host.FOLLOWER
+        second.info['mode'] = zk.Host.LEADER
+        self.assertEqual(self.cluster.update_leader(), str(second))
+        self.io_loop.run_sync(lambda: gen.sleep(0))
+        self.cluster.discover.assert_called_once_with()
+
+    def test_start_stop_discovery(self):
+        self.cluster.start_discovery(10)
+        self.assertTrue(self.cluster._discovery.is_running())
+        self.cluster.stop_discovery()
+        self.assertIsNone(self.cluster._discovery)
+
+    def test_lanes(self):
+        self.cluster.add_host(addr=self.FIXTURE_HOST, dc='remote')
+        self.cluster.set_lanes({'remote': {'timeout': 10, 'concurrency': 2}})
+        self.cluster.add_host(addr=self.FIXTURE_HOST_2, dc='remote')
+        self.cluster.add_host(addr='local.ip')
+        self.assertEqual([host.timeout for host in self.cluster.get_hosts()], [10, 10, 2])
+        self.assertEqual(self.cluster.get_lane('remote')['concurrency'], 2)
+        self.assertEqual(self.cluster.get_lane(None), {})
+        self.cluster.sync_hosts([{'addr': self.FIXTURE_HOST, 'dc': 'remote'}, {'addr': 'new.ip', 'dc': 'remote'}])
+        self.assertEqual([host.timeout for host in self.cluster.get_hosts()], [10, 10])
+        # lane's timeout removed on reload, hosts get the default back
+        self.cluster.set_lanes({'remote': {'concurrency': 2}})
+        self.assertEqual([host.timeout for host in self.cluster.get_hosts()], [zk.Host.TIMEOUT] * 2)
+
+    def test_get_dc_stats(self):
+        self.cluster.add_host(addr=self.FIXTURE_HOST, dc='eu')
+        self.cluster.add_host(addr=self.FIXTURE_HOST_2, dc='us')
+        self.cluster.add_host(addr='third.ip', dc='eu')
+        self.cluster.add_host(addr='fourth.ip')
+        first, second, third, _ = self.cluster.get_hosts()
+        first.health, third.health = zk.Host.HOST_HEALTHY, zk.Host.HOST_TIMEOUT
+        first.info.update(connections=5, latency_avg=1, latency_max=12)
+        third.info.update(connections=2, latency_avg=4, latency_max=7)
+        groups = self.cluster.get_hosts_by_dc()
+        self.assertEqual(list(groups), ['eu', 'us', None])
+        self.assertEqual(groups['eu'], [first, third])
+        stats = self.cluster.get_dc_stats()
+        self.assertEqual(stats['eu'], {
+            'hosts': 2, 'health': {'OK': 1, 'TIMEOUT': 1}, 'connections': 7, 'latency_avg': 2.5, 'latency_max': 12
+        })
+        self.assertEqual(stats['us']['latency_avg'], None)
+
+
+class ConsistentSnapshotTest(AsyncTestCase):
+
+    @gen.coroutine
+    def _snapshot(self, responses, delay=0, refused=False, **kwargs):
+        servers = [FakeZookeeper({'srvr': response.encode('utf-8')}, delay=delay) for response in responses]
+        cluster = zk.Cluster('c')
+        for server in servers:
+            port = yield gen.convert_yielded(server.start())
+            cluster.add_host(addr='127.0.0.1', port=port)
+        if refused:
+            sock = socket.socket()
+            sock.bind(('127.0.0.1', 0))
+            cluster.add_host(addr='127.0.0.1', port=sock.getsockname()[1])
+            sock.close()
+        try:
+            result = yield cluster.consistent_snapshot(**kwargs)
+        finally:
+            for server in servers:
+                server.stop()
+        raise gen.Return((result, cluster))
+
+    @gen_test
+    def test_consistent(self):
+        leader = SRVR.replace('follower', 'leader').replace('0x100000003', '0x100000010')
+        result, cluster = yield self._snapshot([leader, SRVR, SRVR], max_skew=5)
+        self.assertTrue(result['consistent'])
+        self.assertLess(result['window'], 5)
+        self.assertLessEqual(result['fire_spread'], result['window'])
+        hosts = [result['hosts'][str(host)] for host in cluster.get_hosts()]
+        self.assertTrue(all(host['ok'] and 0 <= host['sent'] <= host['received'] for host in hosts))
+        self.assertEqual([host['mode'] for host in hosts], [zk.Host.LEADER, zk.Host.FOLLOWER, zk.Host.FOLLOWER])
+        self.assertEqual(result['divergence']['zxid_spread'], 13)
+        self.assertFalse(result['divergence']['diverged'])
+        self.assertEqual(cluster.get_hosts()[0].info['zxid'], 0x100000010)
+        self.assertEqual(cluster.update_leader(), str(cluster.get_hosts()[0]))
+
+    @gen_test
+    def test_window_too_wide(self):
+        result, cluster = yield self._snapshot([SRVR, SRVR], delay=0.05, max_skew=0.01)
+        self.assertGreaterEqual(result['window'], 0.05)
+        self.assertFalse(result['consistent'])
+        self.assertIsNone(result['divergence'])
+        self.assertTrue(all(host['ok'] for host in result['hosts'].values()))
+
+    @gen_test
+    def test_failed_hosts(self):
+        result, cluster = yield self._snapshot([SRVR, 'garbage'], refused=True, max_skew=5)
+        states = [result['hosts'][str(host)] for host in cluster.get_hosts()]
+        self.assertEqual([state['ok'] for state in states], [True, False, False])
+        self.assertEqual([host.health for host in cluster.get_hosts()][1:], [zk.Host.HOST_ERROR] * 2)
+        # no leader among answered hosts
+        self.assertTrue(result['divergence']['diverged'])
+
+        result, cluster = yield self._snapshot([SRVR], delay=1, timeout=0.1)
+        self.assertEqual(list(result['hosts'].values()), [{'ok': False, 'sent': 0, 'error': zk.Host.HOST_TIMEOUT}])
+        self.assertIsNone(result['window'])
+
+    def test_divergence(self):
+        leader = {'mode': zk.Host.LEADER, 'zxid': 0x200000005}
+        follower = {'mode': zk.Host.FOLLOWER, 'zxid': 0x200000001}
+        self.assertEqual(divergence({'a': leader, 'b': follower}), {
+            'diverged': False, 'leaders': ['a'], 'modes': {'LEADER': ['a'], 'FOLLOWER': ['b']}, 'epochs': [2],
+            'zxid_min': 0x200000001, 'zxid_max': 0x200000005, 'zxid_spread': 4})
+        result = divergence({'a': leader, 'b': leader, 'c': {'mode': 'standalone', 'zxid': 0x100000009}})
+        self.assertTrue(result['diverged'])
+        self.assertEqual((result['leaders'], result['epochs'], result['zxid_spread']), (['a', 'b'], [1, 2], None))
+        self.assertEqual(result['modes']['STANDALONE'], ['c'])
+        self.assertFalse(divergence({})['diverged'])
@@ -0,0 +1,90 @@
+# -*- coding:utf-8 -*-
+import json
+import os
+import tempfile
+from unittest import TestCase
+from zookeeper_monitor import events
+from zookeeper_monitor.events import EventLog
+from zookeeper_monitor.poller import host_state
+from zookeeper_monitor.zk import Host
+
+
+class EventLogTest(TestCase):
+
+    def _host(self, addr, **info):
+        host = Host(addr, cluster='c')
+        host.health = Host.HOST_HEALTHY
+        host.info.update(mode=Host.FOLLOWER, zxid='0x100000003', zookeeper='3.4.6-1, built on 02/20/2014')
+        host.info.update(info)
+        return host
+
+    def test_zxid_epoch(self):
+        self.assertEqual(events.zxid_epoch('0x100000003'), 1)
+        self.assertEqual(events.zxid_epoch('0x3'), 0)
+        self.assertEqual(events.zxid_epoch(0x500000000), 5)
+        self.assertIsNone(events.zxid_epoch(None))
+        self.assertIsNone(events.zxid_epoch('zz'))
+
+    def test_no_events_on_first_poll(self):
+        log = EventLog()
+        host = Host('zk1', cluster='c')
+        previous = host_state(host)
+        host.health = Host.HOST_HEALTHY
+        host.info.update(mode=Host.FOLLOWER, zxid='0x100000003')
+        self.assertEqual(log.on_poll(host, {}, previous), [])
+
+    def test_changes(self):
+        log = EventLog()
+        host = self._host('zk1')
+        previous = host_state(host)
+        host.health = Host.HOST_TIMEOUT
+        self.assertEqual([event['type'] for event in log.on_poll(host, {}, previous)], [events.HEALTH_CHANGE])
+
+        previous = host_state(host)
+        host.health = Host.HOST_HEALTHY
+        host.info.update(mode=Host.LEADER, zxid='0x200000000', zookeeper='3.5.9-1, built on 01/01/2021')
+        new = log.on_poll(host, {}, previous)
+        self.assertEqual([event['type'] for event in new],
+                         [events.HEALTH_CHANGE, events.MODE_CHANGE, events.EPOCH_CHANGE, events.VERSION_CHANGE])
+        self.assertEqual((new[2]['old'], new[2]['new']), (1, 2))
+        self.assertEqual((new[3]['old'], new[3]['new']), ('3.4.6-1', '3.5.9-1'))
+
+    def test_leader_change(self):
+        log = EventLog()
+        zk1, zk2 = self._host('zk1', mode=Host.LEADER), self._host('zk2')
+        self.assertEqual(log.on_poll(zk1, {}, host_state(zk1)), [])
+        previous = host_state(zk2)
+        zk2.info['mode'] = Host.LEADER
+        new = log.on_poll(zk2, {}, previous)
+        self.assertEqual(new[-1]['type'], events.LEADER_CHANGE)
+        self.assertEqual((new[-1]['old'], new[-1]['new']), ('zk1:2181', 'zk2:2181'))
+
+    def test_ring_buffer(self):
+        log = EventLog(size=3)
+        for num in range(5):
+            log.add('c', 'zk1', events.HEALTH_CHANGE, 'OK', str(num), timestamp=num)
+        self.assertEqual([event['new'] for event in log.query()], ['4', '3', '2'])
+
+    def test_query(self):
+        log = EventLog()
+        log.add('c', 'zk1', events.HEALTH_CHANGE, 'OK', 'TIMEOUT', timestamp=10)
+        log.add('c', 'zk2', events.MODE_CHANGE, 'FOLLOWER', 'LEADER', timestamp=20)
+        log.add('d', 'zk1', events.HEALTH_CHANGE, 'TIMEOUT', 'OK', timestamp=30)
+        self.assertEqual([event['time'] for event in log.query(cluster='c')], [20, 10])
+        self.assertEqual([event['time'] for event in log.query(host='zk1')], [30, 10])
+        self.assertEqual([event['time'] for event in log.query(kind=events.MODE_CHANGE)], [20])
+        self.assertEqual([event['time'] for event in log.query(since=15, until=30)], [20])
+        self.assertEqual([event['time'] for event in log.query(limit=1)], [30])
+
+    def test_file_sink(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            log = EventLog(path=path)
+            log.add('c', 'zk1', events.HEALTH_CHANGE, 'OK', 'TIMEOUT', timestamp=10)
+            log.add('c', 'zk1', events.HEALTH_CHANGE, 'TIMEOUT', 'OK', timestamp=20)
+            with open(path) as sink:
+                lines = [json.loads(line) for line in sink]
+            self.assertEqual([line['new'] for line in lines], ['TIMEOUT', 'OK'])
+        finally:
+            os.remove(path)
@@ -0,0 +1,213 @@
+# -*- coding:utf-8 -*-
+import asyncio
+import socket
+from unittest import TestCase
+from mock import MagicMock, patch
+from tornado import gen
+from tornado.testing import AsyncTestCase, gen_test
+from zookeeper_monitor import exporters
+from zookeeper_monitor.zk import Host
+
+
+def get_host():
+    host = Host('10.0.0.1', dc='eu-west')
+    host.cluster = 'main'
+    return host
+
+
+RECORD = {
+    'ok': True,
+    'info': {'mode': 'leader', 'zxid': 51, 'latency_avg': 1.5, 'connections': 3},
+    'mntr': {'zk_version': '3.4.6', 'zk_znode_count': 10},
+}
+
+
+class FlattenTest(TestCase):
+
+    def test_flatten(self):
+        self.assertEqual(
+            sorted(exporters.flatten(get_host(), RECORD)),
+            [('connections', 3), ('latency_avg', 1.5), ('up', 1), ('zk_znode_count', 10), ('zxid', 51)]
+        )
+        self.assertEqual(list(exporters.flatten(get_host(), {'ok': False, 'info': {}})), [('up', 0)])
+
+    def test_metric_name(self):
+        self.assertEqual(exporters.metric_name('main', None, '10.0.0.1:2181'), 'main.10_0_0_1_2181')
+
+    def test_build_exporter(self):
+        self.assertIsInstance(exporters.build_exporter({'type': 'graphite'}), exporters.GraphiteExporter)
+        with self.assertRaises(ValueError):
+            exporters.build_exporter({'type': 'missing'})
+
+
+class StatsdExporterTest(AsyncTestCase):
+
+    def setUp(self):
+        super(StatsdExporterTest, self).setUp()
+        self.sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sink.bind(('127.0.0.1', 0))
+        self.sink.settimeout(1)
+
+    def tearDown(self):
+        self.sink.close()
+        super(StatsdExporterTest, self).tearDown()
+
+    def receive(self):
+        datagrams = []
+        self.sink.setblocking(False)
+        while True:
+            try:
+                datagrams.append(self.sink.recv(65535))
+            except BlockingIOError:
+                return datagrams
+
+    @gen_test
+    def test_export(self):
+        exporter = exporters.StatsdExporter('127.0.0.1', self.sink.getsockname()[1], prefix='zk')
+        exporter.on_poll(get_host(), RECORD, None)
+        exporter.on_poll(get_host(), {'ok': False}, None)
+        yield gen.sleep(0.05)
+        datagrams = self.receive()
+        self.assertEqual(len(datagrams), 1)
+        lines = datagrams[0].decode('utf-8').split('\n')
+        self.assertIn('zk.main.eu-west.10_0_0_1_2181.latency_avg:1.5|g', lines)
+        self.assertIn('zk.main.eu-west.10_0_0_1_2181.up:0|g', lines)
+        self.assertEqual(len(lines), 6)
+        self.assertEqual((exporter.sent, exporter.datagrams, exporter.dropped), (6, 1, 0))
+        exporter.close()
+
+    @gen_test
+    def test_resolve(self):
+        port = self.sink.getsockname()[1]
+
+        async def getaddrinfo(host, port, **kwargs):
+            await gen.sleep(0.01)
+            if host == 'broken.local':
+                raise socket.gaierror('Name or service not known')
+            return [(socket.AF_INET, socket.SOCK_DGRAM, 0, '', ('127.0.0.1', port))]
+
+        loop = asyncio.get_event_loop()
+        # never resolved synchronously, in the loop
+        with patch.object(socket, 'getaddrinfo', side_effect=AssertionError('blocking')), \
+                patch.object(loop, 'getaddrinfo', side_effect=getaddrinfo):
+            exporter = exporters.StatsdExporter('statsd.local', port)
+            broken = exporters.StatsdExporter('broken.local', port)
+            self.assertIsNone(exporter.sock)
+            for instance in (exporter, broken):
+                instance.add([b'a:1|g'])
+                instance.add([b'b:1|g'])
+            yield gen.sleep(0.05)
+        self.assertEqual(self.receive(), [b'a:1|g\nb:1|g'])
+        self.assertEqual((exporter.address, exporter.sent, exporter.dropped), (('127.0.0.1', port), 2, 0))
+        self.assertEqual((broken.sock, broken.sent, broken.dropped), (None, 0, 2))
+        exporter.close()
+        broken.close()
+
+    @gen_test
+    def test_mtu(self):
+        exporter = exporters.StatsdExporter('127.0.0.1', self.sink.getsockname()[1], mtu=100)
+        lines = [exporter.format('metric.{:03}'.format(num), num, 0) for num in range(100)]
+        exporter.add(lines)
+        yield gen.sleep(0.05)
+        datagrams = self.receive()
+        self.assertTrue(all(len(datagram) <= 100 for datagram in datagrams))
+        self.assertEqual(b'\n'.join(datagrams).split(b'\n'), lines)
+        self.assertEqual((exporter.sent, exporter.datagrams), (100, len(datagrams)))
+        exporter.close()
+
+    @gen_test
+    def test_full_buffer(self):
+        exporter = exporters.StatsdExporter('127.0.0.1', self.sink.getsockname()[1], max_pending=2)
+        exporter.sock = MagicMock()
+        exporter.sock.sendto.side_effect = BlockingIOError()
+        exporter.add([b'a:1|g', b'b:1|g', b'c:1|g'])
+        yield gen.sleep(0.01)
+        self.assertEqual((exporter.sent, exporter.dropped), (0, 3))
+
+
+class GraphiteExporterTest(AsyncTestCase):
+
+    @gen.coroutine
+    def start_server(self, port=0):
+        received = self.received = []
+
+        async def handle(reader, writer):
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                received.append(line)
+            writer.close()
+
+        server = yield asyncio.start_server(handle, '127.0.0.1', port)
+        raise gen.Return(server)
+
+    @gen_test
+    def test_export(self):
+        server = yield self.start_server()
+        port = server.sockets[0].getsockname()[1]
+        exporter = exporters.GraphiteExporter('127.0.0.1', port)
+        exporter.connect()
+        while not exporter.connected():
+            yield gen.sleep(0.01)
+        exporter.on_poll(get_host(), RECORD, None)
+        while len(self.received) < 5:
+            yield gen.sleep(0.01)
+        name, value, timestamp = self.received[0].decode('utf-8').split()
+        self.assertTrue(name.startswith('zookeeper.main.eu-west.10_0_0_1_2181.'))
+        self.assertGreater(int(timestamp), 0)
+        self.assertEqual((exporter.sent, exporter.dropped, exporter.connects), (5, 0, 1))
+        exporter.close()
+        server.close()
+
+    @gen_test
+    def test_first_batch(self):
+        server = yield self.start_server()
+        exporter = exporters.GraphiteExporter('127.0.0.1', server.sockets[0].getsockname()[1])
+        # not connected yet - the batch is sent once connected, not dropped
+        exporter.on_poll(get_host(), RECORD, None)
+        while len(self.received) < 5:
+            yield gen.sleep(0.01)
+        self.assertEqual((exporter.sent, exporter.dropped, exporter.connects), (5, 0, 1))
+        exporter.close()
+        server.close()
+
+    @gen_test
+    def test_reconnect(self):
+        server = yield self.start_server()
+        port = server.sockets[0].getsockname()[1]
+        server.close()
+        yield server.wait_closed()
+        exporter = exporters.GraphiteExporter('127.0.0.1', port, backoff_min=0.01, backoff_max=0.04, max_unsent=2)
+        exporter.add([b'a 1 0\n'])
+        exporter.add([b'b 1 0\n', b'c 1 0\n'])
+        yield gen.sleep(0.1)
+        # only the latest max_unsent lines are kept until connected
+        self.assertEqual(exporter.dropped, 1)
+        self.assertFalse(exporter.connected())
+        self.assertEqual(exporter.backoff, 0.04)
+        server = yield self.start_server(port)
+        while not exporter.connected():
+            yield gen.sleep(0.01)
+        self.assertEqual(exporter.backoff, 0.01)
+        exporter.add([b'd 1 0\n'])
+        while len(self.received) < 3:
+            yield gen.sleep(0.01)
+        self.assertEqual(self.received, [b'b 1 0\n', b'c 1 0\n', b'd 1 0\n'])
+        self.assertEqual((exporter.sent, exporter.dropped), (3, 1))
+        exporter.close()
+        server.close()
+
+    @gen_test
+    def test_backpressure(self):
+        server = yield self.start_server()
+        exporter = exporters.GraphiteExporter('127.0.0.1', server.sockets[0].getsockname()[1], max_buffer=10)
+        exporter.connect()
+        while not exporter.connected():
+            yield gen.sleep(0.01)
+        exporter._writer.transport.get_write_buffer_size = MagicMock(return_value=11)
+        exporter.add([b'a 1 0\n', b'b 1 0\n'])
+        yield gen.sleep(0.01)
+        self.assertEqual((exporter.sent, exporter.dropped), (0, 2))
+        exporter.close()
+        server.close()
@@ -1,4 +1,5 @@
 # -*- coding:utf-8 -*-
+import asyncio
 import socket
 import sys
 import time
@@ -7,12 +8,13 @@ from tornado import gen
 from tornado.testing import AsyncTestCase, gen_test
 from zookeeper_monitor import zk
 from .fixtures import host as FIXTURE
+from .fixtures.server import FakeZookeeper
 
 
 try:
-    from unittest.mock import call, patch, Mock, MagicMock
+    from unittest.mock import call, patch, Mock, MagicMock, AsyncMock
 except:
-    from mock import call, patch, Mock, MagicMock
+    from mock import call, patch, Mock, MagicMock, AsyncMock
 
 
 class HostTest(AsyncTestCase):
@@ -124,51 +126,56 @@ class HostTest(AsyncTestCase):
     def test_init_err_no_addr(self):
         self.assertRaises(TypeError, partial(zk.Host, port=9999, dc='eu-west'))
 
-    def _prepare_executes_mock(self, ip='127.0.0.1', **kwargs):
-        iostream_obj = MagicMock()
-        for attr, val in kwargs.items():
-            mock = val if (isinstance(val, Mock) or hasattr(val, '__call__')) else MagicMock(return_value=val)
-            setattr(iostream_obj, attr, mock)
-        iostream = MagicMock(return_value=iostream_obj)
-
-        resolver = MagicMock(
-            return_value=gen.maybe_future((socket.AF_INET, ip))
-        )
-        patch('zookeeper_monitor.zk.host.Host._resolve', resolver).start()
-        patch('zookeeper_monitor.zk.host.socket.socket', MagicMock).start()
-        patch('zookeeper_monitor.zk.host.IOStream', iostream).start()
-        patch('zookeeper_monitor.zk.host.IOLoop', self.io_loop).start()
-
-        return resolver, iostream, iostream_obj
-
     @gen_test
     def test_execute(self):
-        some_data = 'DATA'
-        some_ip = '123.45.67.89',
-
-        resolver, iostream, iostream_obj = self._prepare_executes_mock(
-            ip=some_ip,
-            connect=None,
-            #write=lambda  a, callback: callback(None),
-            write=MagicMock(side_effect=lambda  a, callback: callback(None)),
-            read_until_close=lambda callback: callback(some_data)
-        )
+        server = FakeZookeeper({'sample_command': b'DATA', 'B__sample_command': b'B_DATA'})
+        port = yield server.start()
+        host = zk.Host('127.0.0.1', port)
 
-        host = zk.Host('localhost', 2181)
-        ret_test = yield host.execute('sample_command')
+        ret = yield host.execute('sample_command')
+        self.assertEqual(ret, b'DATA')
+        ret = yield host.execute_async('    B__sample_command                     \n')
+        self.assertEqual(ret, b'B_DATA')
+        self.assertEqual(server.commands, ['sample_command', 'B__sample_command'])
+        server.stop()
+
+    @gen_test
+    def test_execute_stream(self):
+        server = FakeZookeeper({'wchp': b'x' * 100})
+        port = yield server.start()
+        host = zk.Host('127.0.0.1', port)
+        chunks = []
+        size = yield host.execute_stream('wchp', chunks.append, chunk_size=30)
+        self.assertEqual(size, 100)
+        self.assertEqual(b''.join(chunks), b'x' * 100)
+        self.assertTrue(all(len(chunk) <= 30 for chunk in chunks))
+        server.stop()
 
-        self.assertEqual(ret_test, some_data)
-        self.assertEqual(resolver.call_count, 1)
-        iostream_obj.connect.assert_called_once_with(some_ip)
-        iostream_obj.write.assert_called_once()
-        args, kwargs = iostream_obj.write.call_args
-        self.assertEqual((b'sample_command\n',), args)
+    @gen_test
+    def test_commands_against_server(self):
+        server = FakeZookeeper()
+        port = yield server.start()
+        host = zk.Host('127.0.0.1', port)
+        srvr = yield host.srvr()
+        self.assertEqual(srvr['mode'], zk.Host.FOLLOWER)
+        stat = yield host.stat_async()
+        self.assertEqual(len(stat['clients']), 2)
+        mntr = yield host.mntr()
+        self.assertEqual(mntr['zk_znode_count'], 4)
+        ruok = yield host.ruok_async()
+        self.assertEqual(ruok, 'imok')
+        server.stop()
 
-        iostream_obj.write.reset_mock()
-        yield host.execute('    B__sample_command                     \n')
-        iostream_obj.write.assert_called_once()
-        args, kwargs = iostream_obj.write.call_args
-        self.assertEqual((b'B__sample_command\n',), args)
+    @gen_test
+    def test_command_timeout(self):
+        server = FakeZookeeper(delay=1)
+        port = yield server.start()
+        host = zk.Host('127.0.0.1', port)
+        host.set_timeout(0.05)
+        ret = yield host.srvr()
+        self.assertFalse(ret)
+        self.assertEqual(host.health, zk.Host.HOST_TIMEOUT)
+        server.stop()
 
     def test_set_timeout(self):
         host = zk.Host('localhost', 2181)
@@ -195,43 +202,30 @@ class HostTest(AsyncTestCase):
         host.srvr.assert_called_once()
         self.assertIsInstance(res, dict)
 
-    @gen_test
-    def test_resolve(self):
-        ph_io_loop = 'ioloop placeholder'
-        resolver_obj = Mock()
-        resolver_obj.resolve = MagicMock(return_value=gen.maybe_future(('a', 'b', 'c')))
-        resolver = MagicMock(return_value=resolver_obj)
-        patch('zookeeper_monitor.zk.host.Resolver', resolver).start()
-        host = zk.Host('localhost', 2181)
-        res = yield host._resolve(ph_io_loop)
-        resolver.assert_called_once_with(io_loop=ph_io_loop)
-        resolver_obj.assert_called_once()
-        self.assertEqual(res, 'a')
-
     @gen_test
     def test_srvr_ok(self):
         host = zk.Host('localhost', 2181)
-        host.execute = MagicMock(return_value=gen.maybe_future(
+        host.execute_async = AsyncMock(return_value=
             FIXTURE.result_of_execute_srvr_ok.encode('utf-8')
-        ))
+        )
         ret = yield host.srvr()
-        host.execute.assert_called_once_with('srvr')
+        host.execute_async.assert_called_once_with('srvr')
         self.assertEqual(host.health, zk.Host.HOST_HEALTHY)
         self.assertIsInstance(ret, dict)
 
     @gen_test
     def test_srvr_err(self):
         host = zk.Host('localhost', 2181)
-        host.execute = MagicMock(return_value=gen.maybe_future(
+        host.execute_async = AsyncMock(return_value=
             FIXTURE.result_of_execute_srvr_err.encode('utf-8')
-        ))
+        )
         ret = yield host.srvr()
-        host.execute.assert_called_once()
+        host.execute_async.assert_called_once()
         self.assertEqual(host.health, zk.Host.HOST_ERROR)
         self.assertFalse(ret)
 
         host = zk.Host('localhost', 2181)
-        host.execute = MagicMock(side_effect=Exception)
+        host.execute_async = AsyncMock(side_effect=Exception)
         ret = yield host.srvr()
         self.assertFalse(ret)
         self.assertEqual(host.health, zk.Host.HOST_ERROR)
@@ -239,7 +233,7 @@ class HostTest(AsyncTestCase):
     @gen_test
     def test_srvr_timeout(self):
         host = zk.Host('localhost', 2181)
-        host.execute = MagicMock(side_effect=zk.host.HostConnectionTimeout)
+        host.execute_async = AsyncMock(side_effect=zk.host.HostConnectionTimeout)
         ret = yield host.srvr()
         self.assertFalse(ret)
         self.assertEqual(host.health, zk.Host.HOST_TIMEOUT)
@@ -247,23 +241,201 @@ class HostTest(AsyncTestCase):
     @gen_test
     def test_envi(self):
         host = zk.Host('localhost', 2181)
-        host.execute = MagicMock(return_value=gen.maybe_future(
+        host.execute_async = AsyncMock(return_value=
             FIXTURE.envi['in'].encode('utf-8')
-        ))
+        )
         ret = yield host.envi()
-        host.execute.assert_called_once_with('envi')
+        host.execute_async.assert_called_once_with('envi')
         self.assertEqual(ret, FIXTURE.envi['out'])
 
     @gen_test
     def test_dump_kill_srst_ruok_reqs(self):
         for cmd in ['dump', 'kill', 'ruok', 'srst', 'reqs']:
             host = zk.Host('localhost', 2181)
-            host.execute = MagicMock(return_value=gen.maybe_future(
+            host.execute_async = AsyncMock(return_value=
                 FIXTURE.simple['in'].encode('utf-8')
-            ))
+            )
             method = getattr(host, cmd)
             ret = yield method()
-            host.execute.assert_called_once_with(cmd)
-            host.execute.reset_mock()
+            host.execute_async.assert_called_once_with(cmd)
+            host.execute_async.reset_mock()
             self.assertEqual(ret, FIXTURE.simple['out'])
 
+
+    @gen_test
+    def test_conf(self):
+        host = zk.Host('localhost', 2181)
+        host.execute_async = AsyncMock(return_value=
+            FIXTURE.conf['in'].encode('utf-8')
+        )
+        ret = yield host.conf()
+        host.execute_async.assert_called_once_with('conf')
+        self.assertEqual(ret, FIXTURE.conf['out'])
+
+    def test_parse_servers(self):
+        host = zk.Host('localhost', 2181)
+        self.assertEqual(host._parse_servers(FIXTURE.conf['out']), FIXTURE.conf['servers'])
+        self.assertEqual(host._parse_servers({'clientPort': '2181'}), [])
+
+    @gen_test
+    def test_cons(self):
+        host = zk.Host('localhost', 2181)
+        host.execute_async = AsyncMock(return_value=
+            FIXTURE.cons['in'].encode('utf-8')
+        )
+        ret = yield host.cons()
+        host.execute_async.assert_called_once_with('cons')
+        self.assertEqual(ret.rows(), FIXTURE.cons['rows'])
+        self.assertFalse(ret.truncated)
+
+    @gen_test
+    def test_wchs(self):
+        host = zk.Host('localhost', 2181)
+        host.execute_async = AsyncMock(return_value=
+            b'5 connections watching 12 paths\nTotal watches:31\n'
+        )
+        ret = yield host.wchs()
+        host.execute_async.assert_called_once_with('wchs')
+        self.assertEqual(ret, {'connections': 5, 'paths': 12, 'watches': 31})
+
+    @gen_test
+    def test_wchc_wchp(self):
+        def execute_stream(cmd, callback):
+            for chunk in (b'/pa', b'th\n\t0x1\n\t0', b'x2\n'):
+                callback(chunk)
+            return 11
+
+        for cmd in ('wchc', 'wchp'):
+            host = zk.Host('localhost', 2181)
+            host.execute_stream_async = AsyncMock(side_effect=execute_stream)
+            ret = yield getattr(host, cmd)(top=1, index=True)
+            self.assertEqual(host.execute_stream_async.call_args[0][0], cmd)
+            self.assertEqual(ret['top'], [{'key': '/path', 'watches': 2}])
+            self.assertEqual(ret['index'], {'/path': ['0x1', '0x2']})
+
+    def test_version_tuple(self):
+        self.assertEqual(zk.host.version_tuple('3.4.6-1569965, built on 02/20/2014'), (3, 4, 6))
+        self.assertEqual(zk.host.version_tuple('3.5.10'), (3, 5, 10))
+        self.assertTrue(zk.host.version_tuple('3.10.0') > zk.host.version_tuple('3.4.0'))
+        self.assertEqual(zk.host.version_tuple('unknown'), ())
+
+    @gen_test
+    def test_poll(self):
+        server = FakeZookeeper()
+        port = yield server.start()
+        host = zk.Host('127.0.0.1', port)
+        record = yield host.poll()
+        server.stop()
+
+        self.assertTrue(record['ok'])
+        self.assertEqual(record['host'], str(host))
+        self.assertEqual(record['info']['mode'], zk.Host.FOLLOWER)
+        self.assertEqual(len(record['stat']['clients']), 2)
+        self.assertEqual(record['mntr']['zk_znode_count'], 4)
+        self.assertEqual(sorted(record['commands']), ['mntr', 'srvr', 'stat'])
+        self.assertTrue(all(status['ok'] for status in record['commands'].values()))
+        self.assertEqual(host.health, zk.Host.HOST_HEALTHY)
+
+    @gen_test
+    def test_poll_shared_deadline(self):
+        server = FakeZookeeper(delay={'mntr': 5, 'stat': 0.05})
+        port = yield server.start()
+        host = zk.Host('127.0.0.1', port)
+        host.info['zookeeper'] = '3.4.6'
+        start = time.time()
+        record = yield host.poll(['srvr', 'stat', 'mntr'], timeout=0.3)
+        elapsed = time.time() - start
+        server.stop()
+
+        self.assertLess(elapsed, 1)
+        self.assertFalse(record['ok'])
+        self.assertTrue(record['commands']['srvr']['ok'])
+        self.assertTrue(record['commands']['stat']['ok'])
+        self.assertEqual(record['commands']['mntr'], {'ok': False, 'error': 'TIMEOUT', 'elapsed': record['commands']['mntr']['elapsed']})
+        self.assertNotIn('mntr', record)
+        self.assertEqual(record['info']['mode'], zk.Host.FOLLOWER)
+        self.assertEqual(host.health, zk.Host.HOST_HEALTHY)
+
+    @gen_test
+    def test_poll_all_failed(self):
+        host = zk.Host('127.0.0.1', 2181)
+        host.execute_async = AsyncMock(side_effect=ConnectionRefusedError('refused'))
+        record = yield host.poll(['srvr', 'ruok'])
+        self.assertFalse(record['ok'])
+        self.assertEqual(record['commands']['ruok']['error'], 'refused')
+        self.assertEqual(host.health, zk.Host.HOST_ERROR)
+
+        async def slow(cmd):
+            await asyncio.sleep(1)
+
+        host.execute_async = AsyncMock(side_effect=slow)
+        record = yield host.poll(['ruok'], timeout=0.01)
+        self.assertEqual(host.health, zk.Host.HOST_TIMEOUT)
+
+    def test_poll_unknown_command(self):
+        host = zk.Host('127.0.0.1', 2181)
+        self.assertRaises(zk.HostUnknownCommandError, self.io_loop.run_sync, partial(host.poll, ['nope']))
+        self.assertRaises(zk.HostUnknownCommandError, self.io_loop.run_sync, partial(host.poll, ['get_info']))
+
+    @gen_test
+    def test_mntr_uses_known_version(self):
+        host = zk.Host('localhost', 2181)
+        host.info['zookeeper'] = '3.4.6-1569965, built on 02/20/2014'
+        host.execute_async = AsyncMock(return_value=b'zk_version\t3.4.6\nzk_avg_latency\t0\n')
+        ret = yield host.mntr()
+        host.execute_async.assert_called_once_with('mntr')
+        self.assertEqual(ret, {'zk_version': '3.4.6', 'zk_avg_latency': 0})
+
+        host.info['zookeeper'] = '3.3.1'
+        ret = yield host.mntr()
+        self.assertEqual(ret, {'version_unsupprted': '3.3.1'})
+
+    @gen_test
+    def test_execute_timings(self):
+        server = FakeZookeeper()
+        port = yield server.start()
+        host = zk.Host('127.0.0.1', port)
+        yield host.ruok()
+        server.stop()
+        self.assertEqual(sorted(host.timings['ruok']),
+                         ['bytes', 'handshake', 'latency', 'resumed', 'truncated', 'wait'])
+        self.assertGreater(host.timings['ruok']['latency'], 0)
+        self.assertEqual(host.timings['ruok']['bytes'], 4)
+        self.assertFalse(host.timings['ruok']['truncated'])
+
+    def test_max_bytes(self):
+        host = zk.Host('localhost', 2181)
+        self.assertEqual(host.get_max_bytes('srvr'), (zk.Host.MAX_BYTES, 'truncate'))
+        self.assertEqual(host.get_max_bytes('dump'), (zk.Host.COMMAND_MAX_BYTES['dump'], 'truncate'))
+        host.set_max_bytes('dump', 10, 'abort')
+        self.assertEqual(host.get_max_bytes('dump'), (10, 'abort'))
+        self.assertEqual(zk.Host('localhost').get_max_bytes('dump')[0], zk.Host.COMMAND_MAX_BYTES['dump'])
+
+    @gen_test
+    def test_truncated_response(self):
+        mntr = b''.join(b'zk_metric_%d\t%d\n' % (num, num) for num in range(1000))
+        reqs = ('ąę\n' * 50).encode('utf-8')
+        server = FakeZookeeper({'mntr': mntr, 'dump': b'x' * 100, 'reqs': reqs})
+        port = yield server.start()
+        host = zk.Host('127.0.0.1', port)
+        host.info['zookeeper'] = '3.4.6'
+        host.set_max_bytes('mntr', 1000)
+        ret = yield host.mntr()
+        self.assertTrue(ret['truncated'])
+        self.assertTrue(host.timings['mntr']['truncated'])
+        self.assertEqual(host.timings['mntr']['bytes'], 1001)
+        self.assertEqual(ret['zk_metric_0'], '0')
+        self.assertLess(len(ret), 100)
+
+        # cut in the middle of a multibyte character, partial last line is dropped
+        host.set_max_bytes('reqs', 13)
+        ret = yield host.reqs()
+        self.assertTrue(ret.truncated)
+        self.assertEqual(ret, 'ąę\nąę')
+        self.assertNotEqual(host.health, zk.Host.HOST_ERROR)
+
+        host.set_max_bytes('dump', 10, 'abort')
+        ret = yield host.dump()
+        self.assertFalse(ret)
+        self.assertEqual(host.health, zk.Host.HOST_ERROR)
+        server.stop()
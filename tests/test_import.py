@@ -0,0 +1,32 @@
+# -*- coding:utf-8 -*-
+import json
+import subprocess
+import sys
+from unittest import TestCase
+
+
+class ImportTest(TestCase):
+    """ Library users (short-lived check scripts) import zk package very often """
+
+    IMPORT_BUDGET = 0.25
+    HEAVY_MODULES = ['anyconfig', 'yaml', 'tornado.web', 'tornado.iostream', 'tornado.netutil', 'distutils']
+    SCRIPT = (
+        'import json, sys, time\n'
+        't = time.time()\n'
+        'import zookeeper_monitor.zk\n'
+        't = time.time() - t\n'
+        'print(json.dumps([t, [name for name in {} if name in sys.modules]]))\n'
+    )
+
+    def _import(self):
+        output = subprocess.check_output([sys.executable, '-c', self.SCRIPT.format(self.HEAVY_MODULES)])
+        return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+    def test_import_is_lightweight(self):
+        _, loaded = self._import()
+        self.assertEqual(loaded, [])
+
+    def test_import_time_budget(self):
+        # best of few runs, so a noisy neighbour doesn't fail the build
+        elapsed = min(self._import()[0] for _ in range(3))
+        self.assertLess(elapsed, self.IMPORT_BUDGET)
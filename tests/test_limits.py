@@ -0,0 +1,168 @@
+# -*- coding:utf-8 -*-
+import asyncio
+from unittest import TestCase
+from zookeeper_monitor import zk
+from zookeeper_monitor.zk import limits
+from zookeeper_monitor.zk.limits import ConnectionLimiter, TokenBucket
+from .fixtures.server import FakeZookeeper
+
+try:
+    from unittest.mock import patch
+except:
+    from mock import patch
+
+
+class TokenBucketTest(TestCase):
+
+    def test_consume(self):
+        bucket = TokenBucket(rate=2, burst=2)
+        self.assertTrue(bucket.consume(0))
+        self.assertTrue(bucket.consume(0))
+        self.assertFalse(bucket.consume(0))
+        self.assertEqual(bucket.delay(0.25), 0.25)
+        self.assertTrue(bucket.consume(0.5))
+        self.assertTrue(bucket.consume(100))
+        self.assertTrue(bucket.consume(100))
+        self.assertFalse(bucket.consume(100))
+
+
+class ConnectionLimiterTest(TestCase):
+
+    def test_max_connections(self):
+        async def run():
+            limiter = ConnectionLimiter(2)
+            running = []
+            peak = []
+
+            async def command(num):
+                async with limiter.slot('c') as slot:
+                    running.append(num)
+                    peak.append(len(running))
+                    await asyncio.sleep(0.01)
+                    running.remove(num)
+                    return slot.wait
+
+            waits = await asyncio.gather(*[command(num) for num in range(6)])
+            return limiter, max(peak), waits
+
+        limiter, peak, waits = asyncio.run(run())
+        self.assertEqual(peak, 2)
+        self.assertEqual(limiter.active, 0)
+        self.assertEqual(waits[:2], [0.0, 0.0])
+        self.assertTrue(all(wait > 0 for wait in waits[2:]))
+
+    def test_fair_across_clusters(self):
+        async def run():
+            limiter = ConnectionLimiter(1)
+            order = []
+
+            async def command(cluster):
+                async with limiter.slot(cluster):
+                    order.append(cluster)
+                    await asyncio.sleep(0)
+
+            await asyncio.gather(*([command('big') for _ in range(4)] + [command('small') for _ in range(2)]))
+            return order
+
+        self.assertEqual(asyncio.run(run()), ['big', 'big', 'small', 'big', 'small', 'big'])
+
+    def test_rate(self):
+        async def run():
+            limiter = ConnectionLimiter(None)
+            limiter.set_rate('slow', rate=50, burst=1)
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            done = {}
+
+            async def command(cluster, num):
+                async with limiter.slot(cluster):
+                    done[(cluster, num)] = loop.time() - start
+
+            await asyncio.gather(*([command('slow', num) for num in range(3)] + [command('fast', 0)]))
+            return done
+
+        done = asyncio.run(run())
+        self.assertLess(done[('fast', 0)], 0.01)
+        self.assertGreaterEqual(done[('slow', 2)], 0.035)
+
+    def test_cancelled_waiter(self):
+        async def run():
+            limiter = ConnectionLimiter(1)
+            await limiter.acquire('c')
+            waiter = asyncio.ensure_future(limiter.acquire('c'))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await asyncio.sleep(0)
+            limiter.release()
+            return limiter
+
+        limiter = asyncio.run(run())
+        self.assertEqual(limiter.active, 0)
+        self.assertEqual(limiter.queued(), 0)
+
+    def test_queue_timeout(self):
+        async def run():
+            limiter = ConnectionLimiter(1)
+            await limiter.acquire('c')
+            with self.assertRaises(zk.HostQueueTimeout):
+                await limiter.acquire('c', timeout=0.01)
+            limiter.release()
+            return limiter
+
+        limiter = asyncio.run(run())
+        self.assertEqual((limiter.active, limiter.queued()), (0, 0))
+
+
+class SaturatedLimiterTest(TestCase):
+    """ Time in limiter's queue doesn't count against command's timeout """
+
+    def setUp(self):
+        patcher = patch.object(limits, 'limiter', ConnectionLimiter(1))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def _saturated(self, command, hold=0.3):
+        server = FakeZookeeper()
+        host = zk.Host('127.0.0.1', await server.start())
+        host.set_timeout(0.1)
+
+        async def busy():
+            async with limits.limiter.slot('ui'):
+                await asyncio.sleep(hold)
+
+        blocker = asyncio.ensure_future(busy())
+        await asyncio.sleep(0)
+        try:
+            result = await command(host)
+        finally:
+            await blocker
+            server.stop()
+        return host, result
+
+    def test_waiting_command_succeeds(self):
+        host, result = asyncio.run(self._saturated(lambda host: host.srvr_async()))
+        self.assertEqual(result['mode'], zk.Host.FOLLOWER)
+        self.assertEqual(host.health, zk.Host.HOST_HEALTHY)
+        self.assertGreaterEqual(host.timings['srvr']['wait'], 0.25)
+
+    def test_waiting_poll_succeeds(self):
+        host, record = asyncio.run(self._saturated(lambda host: host.poll_async(['srvr', 'ruok'])))
+        self.assertTrue(record['ok'], record['commands'])
+        self.assertGreaterEqual(record['commands']['srvr']['wait'], 0.25)
+
+    def test_queue_timeout_keeps_health(self):
+        def command(host):
+            host.QUEUE_TIMEOUT = 0.05
+            return host.srvr_async()
+
+        host, result = asyncio.run(self._saturated(command))
+        self.assertFalse(result)
+        self.assertEqual(host.health, zk.Host.HOST_UNCHECKED)
+
+        def poll(host):
+            host.QUEUE_TIMEOUT = 0.05
+            return host.poll_async(['srvr'])
+
+        host, record = asyncio.run(self._saturated(poll))
+        self.assertEqual(record['commands']['srvr']['error'], zk.Host.QUEUE_TIMEOUT_ERROR)
+        self.assertEqual(host.health, zk.Host.HOST_UNCHECKED)
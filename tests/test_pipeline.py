@@ -0,0 +1,184 @@
+# -*- coding:utf-8 -*-
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from zookeeper_monitor import alerts, events, pipeline
+from zookeeper_monitor.poller import Poller
+from zookeeper_monitor.zk import Host
+
+
+class Collector(object):
+    """ Custom sink loaded by import path """
+
+    instances = []
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.items = []
+        self.closed = False
+        Collector.instances.append(self)
+
+    async def write(self, host, record, previous):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.items.append(record['n'])
+
+    def close(self):
+        self.closed = True
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def feed(flow, count, wait=0.05):
+    host = Host('zk1')
+    for num in range(count):
+        flow.on_poll(host, {'n': num}, {})
+    await asyncio.sleep(wait)
+
+
+class PipelineTest(TestCase):
+
+    def test_flow(self):
+        written = []
+
+        async def test():
+            flow = pipeline.Pipeline()
+            flow.enrichers.append(lambda host, record, previous: record.update(double=record['n'] * 2))
+            flow.add_sink('collect', lambda host, record, previous: written.append((str(host), record['double'])))
+            await feed(flow, 3)
+            flow.stop()
+            return flow.get_stats()
+
+        stats = run(test())
+        self.assertEqual(written, [('zk1:2181', 0), ('zk1:2181', 2), ('zk1:2181', 4)])
+        self.assertEqual((stats['enrich']['in'], stats['enrich']['out'], stats['fan_out']['out']), (3, 3, 3))
+        self.assertEqual(stats['sinks']['collect']['out'], 3)
+        self.assertEqual(stats['sinks']['collect']['policy'], pipeline.BLOCK)
+        self.assertGreaterEqual(stats['enrich']['wait_avg'], 0)
+        self.assertIsNotNone(stats['sinks']['collect']['latency_avg'])
+
+    def test_slow_sink_drops(self):
+        fast = []
+
+        async def test():
+            flow = pipeline.Pipeline()
+            flow.add_sink('fast', lambda host, record, previous: fast.append(record['n']))
+            flow.set_sinks([{'type': 'tests.test_pipeline:Collector', 'delay': 0.01, 'queue': 2, 'policy': 'drop'},
+                            {'type': 'tests.test_pipeline.Collector', 'name': 'fresh', 'delay': 0.01, 'queue': 2,
+                             'policy': 'drop_oldest'}])
+            await feed(flow, 10, wait=0.2)
+            flow.stop()
+            return flow.get_stats()
+
+        Collector.instances = []
+        stats = run(test())
+        slow, fresh = Collector.instances
+        self.assertEqual(fast, list(range(10)))
+        self.assertEqual(stats['fan_out']['out'], 10)
+        # full queue keeps the first (drop) or the latest (drop_oldest) records
+        self.assertEqual((slow.items, fresh.items), ([0, 1], [8, 9]))
+        self.assertEqual(stats['sinks']['tests.test_pipeline:Collector']['dropped'], 8)
+        self.assertEqual(stats['sinks']['fresh']['dropped'], 8)
+
+    def test_blocking_sink_backpressure(self):
+        async def test():
+            flow = pipeline.Pipeline(size=3)
+            flow.set_sinks([{'type': 'tests.test_pipeline:Collector', 'delay': 0.01, 'queue': 1, 'policy': 'block'}])
+            await feed(flow, 20, wait=0.2)
+            flow.stop()
+            return flow.get_stats()
+
+        Collector.instances = []
+        stats = run(test())
+        # polling never waits - pipeline's input sheds its oldest records, blocking sink loses none
+        self.assertEqual((stats['enrich']['in'], stats['enrich']['dropped'], stats['enrich']['max_queue']), (20, 17, 3))
+        self.assertEqual(Collector.instances[0].items, [17, 18, 19])
+        self.assertEqual(stats['sinks']['tests.test_pipeline:Collector']['dropped'], 0)
+
+    def test_errors(self):
+        def broken(host, record, previous):
+            raise ValueError('broken')
+
+        async def test():
+            flow = pipeline.Pipeline()
+            flow.enrichers.append(broken)
+            flow.add_sink('broken', broken)
+            await feed(flow, 2)
+            flow.stop()
+            return flow.get_stats()
+
+        stats = run(test())
+        self.assertEqual((stats['enrich']['errors'], stats['enrich']['out']), (2, 2))
+        self.assertEqual((stats['sinks']['broken']['errors'], stats['sinks']['broken']['out']), (2, 2))
+
+    def test_set_sinks(self):
+        flow = pipeline.Pipeline()
+        Collector.instances = []
+        flow.set_sinks([{'type': 'tests.test_pipeline:Collector'}])
+        collector = Collector.instances[0]
+        for config in ({'type': 'missing.module:Sink'}, {'type': 'log', 'policy': 'wait'}, {'queue': 1},
+                       {'type': 'tests.test_pipeline:run', 'some': 1}):
+            with self.assertRaises((ValueError, TypeError)):
+                flow.set_sinks([config])
+        self.assertEqual([stage.name for stage in flow.get_sinks()], ['tests.test_pipeline:Collector'])
+        flow.set_sinks(None)
+        self.assertEqual(flow.get_sinks(), [])
+        self.assertTrue(collector.closed)
+
+
+class QueuedRecordsTest(TestCase):
+
+    def test_sinks_see_state_of_their_poll(self):
+        healths = iter([Host.HOST_HEALTHY, Host.HOST_TIMEOUT, Host.HOST_HEALTHY, Host.HOST_ERROR])
+        host = Host('zk1', cluster='c')
+
+        async def poll_async(commands):
+            host.health = next(healths)
+            return {'ok': host.health == Host.HOST_HEALTHY, 'info': {}}
+
+        host.poll_async = poll_async
+        log = events.EventLog()
+        notified = []
+        engine = alerts.AlertEngine(['health != OK'], [notified.append])
+
+        async def test():
+            flow = pipeline.Pipeline(size=4)
+            flow.add_sink('events', log.on_poll)
+            flow.add_sink('alerts', engine.on_poll)
+            poller = Poller(lambda: None)
+            poller.add_listener(flow.on_poll)
+            # all polls are done before the pipeline runs - sinks see the host in its last state
+            records = [await poller.poll_host(host) for _ in range(4)]
+            queued = flow.get_stats()['enrich']['queue']
+            await asyncio.sleep(0.05)
+            flow.stop()
+            return records, queued
+
+        records, queued = run(test())
+        self.assertEqual((queued, host.health), (4, Host.HOST_ERROR))
+        self.assertEqual([(event['old'], event['new'], event['time']) for event in log.query()][::-1], [
+            (Host.HOST_HEALTHY, Host.HOST_TIMEOUT, records[1]['time']),
+            (Host.HOST_TIMEOUT, Host.HOST_HEALTHY, records[2]['time']),
+            (Host.HOST_HEALTHY, Host.HOST_ERROR, records[3]['time']),
+        ])
+        self.assertEqual([(alert['state'], alert['value']) for alert in notified], [
+            (alerts.FIRING, Host.HOST_TIMEOUT), (alerts.RESOLVED, Host.HOST_HEALTHY), (alerts.FIRING, Host.HOST_ERROR)])
+
+
+class JsonLinesSinkTest(TestCase):
+
+    def test_write(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'polls.log')
+        stage, sink = pipeline.load_sink({'type': 'jsonl', 'path': path})
+        self.assertEqual((stage.policy, stage.name), (pipeline.DROP, 'jsonl'))
+        sink.write(Host('zk1', cluster='c'), {'ok': True, 'host': 'zk1:2181'}, {})
+        with open(path) as source:
+            line = json.loads(source.read())
+        self.assertEqual((line['ok'], line['cluster']), (True, 'c'))
@@ -0,0 +1,74 @@
+# -*- coding:utf-8 -*-
+import asyncio
+from unittest import TestCase
+from zookeeper_monitor.poller import Poller
+from zookeeper_monitor.zk import Cluster, Host
+from .fixtures.server import FakeZookeeper, SRVR
+
+
+class PollerTest(TestCase):
+
+    def test_poll(self):
+        async def run():
+            server = FakeZookeeper()
+            port = await server.start()
+            cluster = Cluster('c')
+            cluster.add_host(addr='127.0.0.1', port=port)
+            cluster.add_host(addr='127.0.0.1', port=1)
+            calls = []
+            poller = Poller(lambda: cluster)
+            poller.add_listener(lambda host, record, previous: calls.append((str(host), previous['health'])))
+            poller.add_listener(lambda host, record, previous: 1 / 0)
+            try:
+                records = await poller.poll()
+                server.responses['srvr'] = SRVR.replace('follower', 'leader').encode('utf-8')
+                await poller.poll()
+            finally:
+                server.stop()
+            return cluster, poller, records, calls
+
+        cluster, poller, records, calls = asyncio.run(run())
+        self.assertEqual([record['ok'] for record in records], [True, False])
+        self.assertEqual(poller.polls, 2)
+        self.assertEqual([call for call in calls if call[0] == '127.0.0.1:1'],
+                         [('127.0.0.1:1', Host.HOST_UNCHECKED), ('127.0.0.1:1', Host.HOST_ERROR)])
+        self.assertEqual(cluster.update_leader(), str(cluster.get_hosts()[0]))
+
+    def test_lanes(self):
+        async def run():
+            slow, fast = FakeZookeeper(delay=0.3), FakeZookeeper()
+            slow_port, fast_port = await slow.start('0.0.0.0'), await fast.start()
+            cluster = Cluster('c')
+            cluster.set_lanes({'remote': {'timeout': 1, 'concurrency': 1}})
+            for num in range(2):
+                cluster.add_host(addr='127.0.0.{}'.format(num + 1), port=slow_port, dc='remote')
+            cluster.add_host(addr='127.0.0.1', port=fast_port, dc='local')
+            poller = Poller(lambda: cluster)
+            try:
+                first = asyncio.ensure_future(poller.poll())
+                await asyncio.sleep(0.05)
+                start = asyncio.get_running_loop().time()
+                second = await poller.poll()
+                elapsed = asyncio.get_running_loop().time() - start
+                first = await first
+                return first, second, elapsed, asyncio.get_running_loop().time() - start
+            finally:
+                slow.stop()
+                fast.stop()
+
+        first, second, elapsed, total = asyncio.run(run())
+        self.assertEqual([record['ok'] for record in first], [True, True, True])
+        self.assertEqual([record['host'] for record in second], [first[2]['host']])
+        self.assertLess(elapsed, 0.2)
+        # concurrency 1 - remote hosts are polled one by one
+        self.assertGreater(total, 0.45)
+
+    def test_owns(self):
+        async def run():
+            cluster = Cluster('c')
+            for num in range(4):
+                cluster.add_host(addr='127.0.0.{}'.format(num + 1), port=1)
+            poller = Poller(lambda: cluster, owns=lambda cluster, host: host.startswith('127.0.0.1'))
+            return await poller.poll()
+
+        self.assertEqual([record['host'] for record in asyncio.run(run())], ['127.0.0.1:1'])
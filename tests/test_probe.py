@@ -0,0 +1,141 @@
+# -*- coding:utf-8 -*-
+import socket
+import sys
+from unittest import TestCase
+from tornado import gen
+from tornado.testing import AsyncTestCase, gen_test
+from zookeeper_monitor import zk
+from zookeeper_monitor.zk import probe, transport
+from .fixtures.server import FakeZookeeper, TLS_CERT, tls_context
+
+
+class TimerWheelTest(TestCase):
+
+    def test_expire(self):
+        wheel = probe.TimerWheel(tick=1, slots=4, now=0)
+        for key, deadline in (('a', 0.5), ('b', 2.5), ('c', 9), ('d', 3)):
+            wheel.schedule(key, deadline)
+        wheel.cancel('d')
+        self.assertEqual(len(wheel), 3)
+        self.assertEqual(wheel.advance(0.4), [])
+        self.assertEqual(wheel.advance(2), ['a'])
+        # c is hashed into b's bucket, but due in a later revolution
+        self.assertEqual(wheel.advance(2.5), ['b'])
+        self.assertEqual(wheel.advance(8.9), [])
+        self.assertEqual(wheel.advance(100), ['c'])
+        self.assertEqual(len(wheel), 0)
+
+    def test_past_deadline(self):
+        wheel = probe.TimerWheel(tick=1, slots=4, now=10)
+        wheel.schedule('a', 5)
+        wheel.schedule('b', 11)
+        wheel.schedule('b', 20)
+        self.assertEqual(wheel.advance(10), ['a'])
+        self.assertEqual(wheel.advance(12), [])
+        self.assertEqual(wheel.advance(20), ['b'])
+
+
+class ProberTest(AsyncTestCase):
+
+    @gen.coroutine
+    def _probe(self, servers, refused=0, **kwargs):
+        cluster = zk.Cluster('c')
+        for server in servers:
+            port = yield gen.convert_yielded(server.start())
+            cluster.add_host(addr='127.0.0.1', port=port)
+        for _ in range(refused):
+            sock = socket.socket()
+            sock.bind(('127.0.0.1', 0))
+            cluster.add_host(addr='127.0.0.1', port=sock.getsockname()[1])
+            sock.close()
+        try:
+            result = yield cluster.probe(**kwargs)
+        finally:
+            for server in servers:
+                server.stop()
+        raise gen.Return((result, cluster))
+
+    @gen_test
+    def test_probe(self):
+        servers = [FakeZookeeper(), FakeZookeeper({'ruok': b''}), FakeZookeeper({'ruok': b'imok, really'}),
+                   FakeZookeeper(delay=1)]
+        result, cluster = yield self._probe(servers, refused=1, timeout=0.2)
+        hosts = cluster.get_hosts()
+        self.assertEqual([result[str(host)] for host in hosts],
+                         ['OK', 'ERROR', 'ERROR', 'TIMEOUT', 'ERROR'])
+        self.assertEqual([host.health for host in hosts], ['OK', 'ERROR', 'ERROR', 'TIMEOUT', 'ERROR'])
+        self.assertEqual([host.alive for host in hosts], [True, False, False, False, False])
+        self.assertEqual(hosts[0].timings['ruok']['bytes'], 4)
+        self.assertGreaterEqual(hosts[3].timings['ruok']['latency'], 0.2)
+        self.assertEqual(servers[0].commands, ['ruok'])
+
+    @gen_test
+    def test_keeps_error(self):
+        servers = [FakeZookeeper() for _ in range(3)]
+        cluster = zk.Cluster('c')
+        for server in servers:
+            port = yield gen.convert_yielded(server.start())
+            cluster.add_host(addr='127.0.0.1', port=port)
+        hosts = cluster.get_hosts()
+        # ex. invalid srvr response - alive, but not healthy
+        hosts[0].health, hosts[1].health = zk.Host.HOST_ERROR, zk.Host.HOST_TIMEOUT
+        try:
+            result = yield cluster.probe(timeout=1)
+        finally:
+            for server in servers:
+                server.stop()
+        self.assertEqual(set(result.values()), set(['OK']))
+        self.assertEqual([(host.health, host.alive) for host in hosts],
+                         [('ERROR', True), ('OK', True), ('OK', True)])
+
+    @gen_test
+    def test_max_open_and_domains(self):
+        servers = [FakeZookeeper() for _ in range(5)]
+        cluster = zk.Cluster('c')
+        for server in servers:
+            port = yield gen.convert_yielded(server.start())
+            cluster.add_host(addr='localhost', port=port)
+        prober = probe.Prober(timeout=2, max_open=2)
+        try:
+            result = yield gen.convert_yielded(prober.probe_async(cluster.get_hosts()))
+        finally:
+            for server in servers:
+                server.stop()
+        self.assertEqual(set(result.values()), set(['OK']))
+        stats = prober.get_stats()
+        self.assertEqual((stats['rounds'], stats['probes'], stats['OK']), (1, 5, 5))
+        self.assertGreater(stats['rate'], 0)
+        self.assertIsNotNone(stats['cpu_per_probe'])
+
+    @gen_test
+    def test_tls_delegated(self):
+        server, plain = FakeZookeeper(), FakeZookeeper()
+        port = yield gen.convert_yielded(server.start(ssl=tls_context()))
+        host = zk.Host('127.0.0.1', port)
+        host.set_tls(transport.create_context(ca=TLS_CERT))
+        plain_port = yield gen.convert_yielded(plain.start())
+        try:
+            result = yield gen.convert_yielded(
+                probe.Prober().probe_async([host, zk.Host('127.0.0.1', plain_port)], update_host_info=False))
+        finally:
+            server.stop()
+            plain.stop()
+        self.assertEqual(list(result.values()), ['OK', 'OK'])
+        self.assertEqual((host.health, host.alive), (zk.Host.HOST_UNCHECKED, None))
+        self.assertEqual(host._tls.get_stats()['full'], 1)
+
+    @gen_test
+    def test_unreachable_hosts(self):
+        # connect fails at once for every host - more of them than recursion limit
+        count = sys.getrecursionlimit() + 500
+        cluster = zk.Cluster('c')
+        for port in range(1, count + 1):
+            cluster.add_host(addr='255.255.255.255', port=port)
+        result = yield cluster.probe(timeout=1, max_open=8)
+        self.assertEqual(len(result), count)
+        self.assertEqual(set(result.values()), set(['ERROR']))
+
+    @gen_test
+    def test_empty(self):
+        result, _ = yield self._probe([])
+        self.assertEqual(result, {})
@@ -0,0 +1,35 @@
+# -*- coding:utf-8 -*-
+from unittest import TestCase
+from zookeeper_monitor.zk import schema
+
+
+class SchemaTest(TestCase):
+
+    def test_parse_srvr(self):
+        parsed = schema.parse_srvr([
+            ('zookeeper', '3.4.6-1569965, built on 02/20/2014 09:09 GMT'),
+            ('latency', '0/1.5/12'),
+            ('zxid', '0x100000003'),
+            ('node', '4'),
+            ('mode', 'follower'),
+        ])
+        self.assertEqual(parsed, {
+            'zookeeper': '3.4.6-1569965, built on 02/20/2014 09:09 GMT',
+            'latency_min': 0, 'latency_avg': 1.5, 'latency_max': 12,
+            'zxid': 0x100000003, 'zxid_epoch': 1, 'zxid_counter': 3,
+            'node': 4,
+            'mode': 'follower',
+        })
+
+    def test_parse_mntr(self):
+        parsed = schema.parse_mntr([('zk_avg_latency', '0.25'), ('zk_znode_count', '4'), ('zk_new_metric', '7')])
+        self.assertEqual(parsed, {'zk_avg_latency': 0.25, 'zk_znode_count': 4, 'zk_new_metric': '7'})
+
+    def test_invalid_value_passed_through(self):
+        self.assertEqual(schema.parse_srvr([('zxid', 'zz'), ('sent', '')]), {'zxid': 'zz', 'sent': ''})
+
+    def test_interned_keys(self):
+        key = ''.join(['zk_', 'new_metric'])
+        first = list(schema.parse_mntr([(key, '1')]))[0]
+        second = list(schema.parse_mntr([(''.join(['zk_new', '_metric']), '1')]))[0]
+        self.assertIs(first, second)
@@ -0,0 +1,73 @@
+# -*- coding:utf-8 -*-
+import json
+from unittest import TestCase
+from zookeeper_monitor.zk import sessions
+from .fixtures import host as FIXTURE
+
+
+def make_table(rows):
+    table = sessions.ConsTable()
+    for row in rows:
+        table.append(dict((key, str(value)) for key, value in row.items()))
+    return table
+
+
+class ConsTableTest(TestCase):
+
+    def test_parse(self):
+        table, errors = sessions.parse(FIXTURE.cons['in'].split('\n'))
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table.rows(), FIXTURE.cons['rows'])
+        self.assertEqual(errors, FIXTURE.cons['errors'])
+        self.assertEqual(table.column('maxlat').typecode, 'q')
+        self.assertEqual(list(table.column('maxlat')), [2, 41, sessions.MISSING])
+        self.assertEqual(table.column('sid'), ['0x100d', '0x100e', None])
+
+    def test_append_invalid(self):
+        table = sessions.ConsTable()
+        with self.assertRaises(ValueError):
+            table.append({'host': '10.0.0.1', 'port': '1', 'maxlat': 'x'})
+        self.assertEqual(len(table), 0)
+        self.assertEqual(len(table.column('port')), 0)
+
+    def test_dump_load(self):
+        table, _ = sessions.parse(FIXTURE.cons['in'].split('\n'))
+        table.truncated = True
+        loaded = sessions.ConsTable.load(json.loads(json.dumps(table.dump())))
+        self.assertEqual((loaded.rows(), loaded.truncated), (table.rows(), True))
+        self.assertEqual(loaded.column('avglat').typecode, 'd')
+        dump = table.dump()
+        dump['columns']['maxlat'].append(1)
+        for data in ({}, {'columns': {'host': []}}, dump):
+            with self.assertRaises(ValueError):
+                sessions.ConsTable.load(data)
+
+
+class AnalyticsTest(TestCase):
+
+    def setUp(self):
+        self.tables = {
+            'zk1:2181': make_table({'host': '10.0.0.1', 'port': num, 'maxlat': num, 'recved': num * 10}
+                                   for num in range(1, 101)),
+            'zk2:2181': make_table([{'host': '10.0.0.2', 'port': 1, 'maxlat': 500, 'recved': 1},
+                                    {'host': '10.0.0.3', 'port': 2}]),
+            'zk3:2181': False,
+        }
+
+    def test_percentiles(self):
+        result = sessions.percentiles(self.tables, 'maxlat')
+        self.assertEqual(result, {'count': 101, 'max': 500, 'p50': 51, 'p90': 91, 'p99': 100})
+        self.assertEqual(sessions.percentiles(self.tables, 'recved', (100,))['p100'], 1000)
+        self.assertEqual(sessions.percentiles({}, 'maxlat'), {'count': 0, 'max': None, 'p50': None,
+                                                              'p90': None, 'p99': None})
+        with self.assertRaises(ValueError):
+            sessions.percentiles(self.tables, 'host')
+
+    def test_top_sessions(self):
+        top = sessions.top_sessions(self.tables, by='maxlat', limit=3)
+        self.assertEqual([(item['server'], item['maxlat']) for item in top],
+                         [('zk2:2181', 500), ('zk1:2181', 100), ('zk1:2181', 99)])
+        self.assertEqual(top[0]['host'], '10.0.0.2')
+        self.assertEqual(len(sessions.top_sessions(self.tables, by='maxlat', limit=1000)), 101)
+        with self.assertRaises(ValueError):
+            sessions.top_sessions(self.tables, by='sid')
@@ -0,0 +1,260 @@
+# -*- coding:utf-8 -*-
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from unittest import TestCase
+from tornado import gen, web
+from tornado.httpclient import AsyncHTTPClient
+from tornado.httpserver import HTTPServer
+from tornado.testing import AsyncTestCase, bind_unused_port, gen_test
+from zookeeper_monitor.sharding import HashRing, Shard
+from zookeeper_monitor.web import WebMonitor
+from zookeeper_monitor.zk import Host, sessions
+
+
+try:
+    from unittest.mock import patch
+except:
+    from mock import patch
+
+
+class HashRingTest(TestCase):
+
+    KEYS = ['c/10.0.{}.{}:2181'.format(num // 250, num % 250) for num in range(3000)]
+
+    def test_balance(self):
+        ring = HashRing(['a', 'b', 'c'])
+        counts = Counter(ring.get(key) for key in self.KEYS)
+        self.assertEqual(set(counts), {'a', 'b', 'c'})
+        for count in counts.values():
+            self.assertLess(abs(count - 1000), 250)
+
+    def test_minimal_movement(self):
+        before = HashRing(['a', 'b', 'c'])
+        after = HashRing(['a', 'b', 'c', 'd'])
+        moved = [key for key in self.KEYS if before.get(key) != after.get(key)]
+        self.assertTrue(all(after.get(key) == 'd' for key in moved))
+        self.assertLess(len(moved), len(self.KEYS) / 2)
+
+    def test_empty(self):
+        self.assertIsNone(HashRing([]).get('key'))
+
+
+class ShardTest(TestCase):
+
+    def test_owns(self):
+        peers = ['http://a:8080/', 'http://b:8080']
+        shards = [Shard(peer, peers) for peer in peers]
+        for num in range(100):
+            host = '10.0.0.{}:2181'.format(num)
+            self.assertEqual(sum(shard.owns('c', host) for shard in shards), 1)
+            self.assertEqual(shards[0].owner('c', host), shards[1].owner('c', host))
+        self.assertEqual(shards[0].remotes(), ['http://b:8080'])
+
+    def test_not_in_peers(self):
+        with self.assertRaises(ValueError):
+            Shard('http://c:8080', ['http://a:8080'])
+
+
+class BrokenHandler(web.RequestHandler):
+    """ Peer answering with invalid json """
+
+    def get(self):
+        self.write('<html>upgrading</html>')
+
+
+class ShardedWebMonitorTest(AsyncTestCase):
+
+    HOSTS = [{'addr': 'zk{}'.format(num)} for num in range(12)]
+
+    def setUp(self):
+        super(ShardedWebMonitorTest, self).setUp()
+        self.servers = []
+        self.monitors = []
+        self.polled = []
+        self.stated = []
+        self.consed = []
+        patchers = [
+            patch.object(Host, 'srvr', autospec=True, side_effect=self._srvr),
+            patch.object(Host, 'stat', autospec=True, side_effect=self._stat),
+            patch.object(Host, 'cons', autospec=True, side_effect=self._cons),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        sockets = [bind_unused_port() for _ in range(3)]
+        peers = ['http://127.0.0.1:{}'.format(port) for _, port in sockets]
+        for (sock, _), url in zip(sockets, peers):
+            webmonitor = WebMonitor()
+            webmonitor.set_cluster({'name': 'c', 'hosts': self.HOSTS})
+            webmonitor.set_peers(url, peers)
+            server = HTTPServer(webmonitor)
+            server.add_sockets([sock])
+            self.servers.append(server)
+            self.monitors.append(webmonitor)
+
+    def tearDown(self):
+        for server in self.servers:
+            server.stop()
+        super(ShardedWebMonitorTest, self).tearDown()
+
+    def _srvr(self, host):
+        self.polled.append(host)
+        host.health = 'OK'
+        return gen.maybe_future({})
+
+    def _stat(self, host):
+        self.stated.append(host)
+        client = {'host': '10.0.0.1', 'port': '4000', 'n': '1', 'queued': '0', 'recved': '1', 'sent': '1'}
+        return gen.maybe_future({'head': str(host), 'clients': [client]})
+
+    def _cons(self, host):
+        self.consed.append(host)
+        # zk<n> has one session with maxlat n
+        num = int(host.addr[2:])
+        line = '/10.0.0.{0}:4000[1](queued=0,recved=1,sent=1,sid=0x{0},maxlat={0})'.format(num)
+        table, _ = sessions.parse([line])
+        return gen.maybe_future(table)
+
+    @gen.coroutine
+    def _fetch(self, monitor, path):
+        url = '{}{}'.format(monitor.shard.name, path)
+        response = yield AsyncHTTPClient().fetch(url, raise_error=False)
+        raise gen.Return(json.loads(response.body.decode('utf-8')))
+
+    @gen_test
+    def test_full_view(self):
+        data = yield self._fetch(self.monitors[0], '/cluster.json')
+        self.assertEqual([info['addr'] for info in data['hosts']], [host['addr'] for host in self.HOSTS])
+        self.assertEqual(set(info['health'] for info in data['hosts']), {'OK'})
+        self.assertTrue(all(data['peers'].values()))
+        polls = Counter(str(host) for host in self.polled)
+        self.assertEqual(len(polls), len(self.HOSTS))
+        self.assertEqual(set(polls.values()), {1})
+
+    @gen_test
+    def test_local_slice(self):
+        data = yield self._fetch(self.monitors[1], '/cluster.json?local=1')
+        owned = [str(host) for host in self.monitors[1].get_cluster().get_hosts() if self.monitors[1].owns(host)]
+        self.assertEqual(['{}:{}'.format(info['addr'], info['port']) for info in data['hosts']], owned)
+        self.assertNotIn('peers', data)
+
+    @gen_test
+    def test_peer_down(self):
+        self.servers[2].stop()
+        data = yield self._fetch(self.monitors[0], '/cluster.json')
+        self.assertEqual(len(data['hosts']), len(self.HOSTS))
+        self.assertFalse(data['peers'][self.monitors[2].shard.name])
+
+    @gen_test
+    def test_peer_invalid_json(self):
+        self.servers[2].stop()
+        broken = web.Application([(r'/cluster.json', BrokenHandler)])
+        self.servers[2] = broken.listen(int(self.monitors[2].shard.name.rsplit(':', 1)[1]), '127.0.0.1')
+        data = yield self._fetch(self.monitors[0], '/cluster.json')
+        self.assertEqual(len(data['hosts']), len(self.HOSTS))
+        self.assertFalse(data['peers'][self.monitors[2].shard.name])
+
+    @gen_test
+    def test_clients(self):
+        data = yield self._fetch(self.monitors[0], '/cluster/clients/imbalance.json')
+        self.assertEqual(sorted(item['server'] for item in data['servers']),
+                         sorted('{}:2181'.format(host['addr']) for host in self.HOSTS))
+        self.assertEqual(data['mean'], 1.0)
+        # every host is queried once, by its owner
+        stats = Counter(str(host) for host in self.stated)
+        self.assertEqual((len(stats), set(stats.values())), (len(self.HOSTS), {1}))
+        data = yield self._fetch(self.monitors[0], '/cluster/clients/multi.json')
+        self.assertEqual(data['items'][0]['servers'], sorted('{}:2181'.format(host['addr']) for host in self.HOSTS))
+
+    @gen_test
+    def test_sessions(self):
+        data = yield self._fetch(self.monitors[0], '/cluster/sessions.json?limit=2')
+        self.assertEqual([(item['server'], item['maxlat']) for item in data['sessions']],
+                         [('zk11:2181', 11), ('zk10:2181', 10)])
+        self.assertEqual((data['percentiles']['maxlat']['count'], data['total'], data['failed']), (12, 12, []))
+        self.assertNotIn('tables', data)
+        consed = Counter(str(host) for host in self.consed)
+        self.assertEqual((len(consed), set(consed.values())), (len(self.HOSTS), {1}))
+
+        self.servers[2].stop()
+        data = yield self._fetch(self.monitors[0], '/cluster/sessions.json')
+        owned = [host for host in self.monitors[2].get_cluster().get_hosts() if self.monitors[2].owns(host)]
+        self.assertEqual(data['failed'], sorted(str(host) for host in owned))
+
+    @gen_test
+    def test_host_from_owner(self):
+        monitor = self.monitors[0]
+        host = next(host for host in monitor.get_cluster().get_hosts() if not monitor.owns(host))
+        data = yield self._fetch(monitor, '/cluster/host/{}-2181.json'.format(host.addr))
+        self.assertEqual(data['stat']['head'], str(host))
+        self.assertEqual([str(stated) for stated in self.stated], [str(host)])
+        self.assertNotIn(host, self.stated)
+
+
+class ShardedProcessesTest(AsyncTestCase):
+    """ Monitor instances as separate processes, started from command line """
+
+    HOSTS = [{'addr': '127.0.0.{}'.format(num), 'port': 1} for num in range(2, 10)]
+
+    def setUp(self):
+        super(ShardedProcessesTest, self).setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        config = os.path.join(directory, 'cluster.json')
+        with open(config, 'w') as sink:
+            json.dump({'name': 'c', 'hosts': self.HOSTS}, sink)
+        ports = []
+        for _ in range(2):
+            sock, port = bind_unused_port()
+            sock.close()
+            ports.append(port)
+        self.peers = ['http://127.0.0.1:{}'.format(port) for port in ports]
+        self.processes = [
+            subprocess.Popen([sys.executable, '-m', 'zookeeper_monitor.web', '-c', config, '-p', str(port),
+                              '--poll-interval', '0', '--peers', ','.join(self.peers)],
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            for port in ports
+        ]
+        for process in self.processes:
+            self.addCleanup(process.wait)
+            self.addCleanup(process.kill)
+
+    @gen.coroutine
+    def _fetch(self, url):
+        deadline = time.time() + 20
+        while True:
+            try:
+                response = yield AsyncHTTPClient().fetch(url)
+            except (IOError, OSError):
+                if time.time() > deadline:
+                    raise
+                yield gen.sleep(0.1)
+            else:
+                raise gen.Return(json.loads(response.body.decode('utf-8')))
+
+    @gen_test(timeout=60)
+    def test_full_view(self):
+        slices = []
+        for peer in self.peers:
+            data = yield self._fetch('{}/cluster.json?local=1'.format(peer))
+            slices.append(['{}:{}'.format(info['addr'], info['port']) for info in data['hosts']])
+        self.assertEqual(sorted(slices[0] + slices[1]), sorted('{addr}:{port}'.format(**host) for host in self.HOSTS))
+        self.assertTrue(all(slices))
+
+        data = yield self._fetch('{}/cluster.json'.format(self.peers[0]))
+        self.assertEqual([info['addr'] for info in data['hosts']], [host['addr'] for host in self.HOSTS])
+        # refused connections - every host polled once, by its owner
+        self.assertEqual(set(info['health'] for info in data['hosts']), {Host.HOST_ERROR})
+        self.assertEqual(data['peers'], {self.peers[1]: True})
+
+        self.processes[1].kill()
+        self.processes[1].wait()
+        data = yield self._fetch('{}/cluster.json'.format(self.peers[0]))
+        self.assertEqual(len(data['hosts']), len(self.HOSTS))
+        self.assertEqual(data['peers'], {self.peers[1]: False})
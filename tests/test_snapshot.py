@@ -0,0 +1,67 @@
+# -*- coding:utf-8 -*-
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from zookeeper_monitor import snapshot
+from zookeeper_monitor.events import EventLog
+from zookeeper_monitor.zk import Cluster, Host
+
+
+def make_cluster():
+    cluster = Cluster('c')
+    cluster.add_host(addr='zk1')
+    cluster.add_host(addr='zk2')
+    return cluster
+
+
+class SnapshotTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'snapshot')
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_dump_load(self):
+        state = {'time': 1.5, 'hosts': {'zk1:2181': {'info': {'zxid': 1 << 40, 'mode': 'LEADER'}}}}
+        size = snapshot.dump(self.path, state)
+        self.assertEqual(os.path.getsize(self.path), size)
+        self.assertEqual(os.listdir(self.directory), ['snapshot'])
+        self.assertEqual(snapshot.load(self.path), state)
+        snapshot.dump(self.path, {'time': 2})
+        self.assertEqual(snapshot.load(self.path), {'time': 2})
+
+    def test_invalid(self):
+        data = snapshot.dumps({'time': 1})
+        for broken in (b'', b'ZKMS', b'XXXX' + data[4:], data[:6] + b'broken',
+                       snapshot.HEADER.pack(snapshot.MAGIC, snapshot.VERSION + 1) + data[6:]):
+            with self.assertRaises(snapshot.SnapshotError):
+                snapshot.loads(broken)
+        with self.assertRaises(ValueError):
+            snapshot.dumps({'host': Host('zk1')})
+
+    def test_capture_restore(self):
+        cluster = make_cluster()
+        events = EventLog()
+        leader = cluster.get_host('zk1:2181')
+        leader.health = Host.HOST_HEALTHY
+        leader.info.update(mode=Host.LEADER, zxid=0x100000003)
+        leader.timings['srvr'] = {'wait': 0, 'latency': 0.01, 'bytes': 100, 'truncated': False}
+        events.add('c', 'zk1:2181', 'mode', 'FOLLOWER', 'LEADER', timestamp=10)
+        events._leaders['c'] = 'zk1:2181'
+        snapshot.dump(self.path, snapshot.capture(cluster, events))
+
+        cluster = make_cluster()
+        cluster.add_host(addr='zk3')
+        events = EventLog()
+        restored = snapshot.restore(snapshot.load(self.path), cluster, events)
+        self.assertEqual([str(host) for host in restored], ['zk1:2181', 'zk2:2181'])
+        host = cluster.get_host('zk1:2181')
+        self.assertEqual((host.health, host.info['mode'], host.info['zxid']), (Host.HOST_HEALTHY, Host.LEADER, 0x100000003))
+        self.assertEqual(host.timings['srvr']['latency'], 0.01)
+        self.assertEqual(cluster.get_host('zk3:2181').health, Host.HOST_UNCHECKED)
+        self.assertEqual(cluster.update_leader(), 'zk1:2181')
+        self.assertEqual([event['type'] for event in events.query()], ['mode'])
+        self.assertEqual(events._leaders, {'c': 'zk1:2181'})
+
+        self.assertEqual(snapshot.restore(snapshot.load(self.path), Cluster('other')), [])
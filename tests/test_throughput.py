@@ -0,0 +1,106 @@
+# -*- coding:utf-8 -*-
+from unittest import TestCase
+from zookeeper_monitor import exporters
+from zookeeper_monitor.alerts import AlertEngine
+from zookeeper_monitor.throughput import Ewma, ThroughputEstimator, ZxidRate
+from zookeeper_monitor.zk import Host
+
+
+def make_host(addr, mode=Host.FOLLOWER, zxid=None, cluster='c'):
+    host = Host(addr, cluster=cluster)
+    host.health = Host.HOST_HEALTHY
+    host.info.update(mode=mode, zxid=zxid)
+    return host
+
+
+class EwmaTest(TestCase):
+
+    def test_time_weighted(self):
+        ewma = Ewma(tau=10)
+        self.assertEqual(ewma.update(100, 1), 100)
+        ewma.update(0, 10)
+        self.assertAlmostEqual(ewma.value, 100 / 2.718281828, places=3)
+        ewma.update(1000, 0)
+        self.assertAlmostEqual(ewma.value, 100 / 2.718281828, places=3)
+
+
+class ZxidRateTest(TestCase):
+
+    def test_rate(self):
+        rate = ZxidRate(tau=30)
+        self.assertTrue(rate.update(0x500000000, 0))
+        self.assertIsNone(rate.get())
+        for second in range(1, 100):
+            rate.update(0x500000000 + second * 200, second * 10)
+        self.assertAlmostEqual(rate.get(), 20)
+        self.assertEqual((rate.epoch, rate.counter, rate.zxid), (5, 99 * 200, 0x500000000 + 99 * 200))
+
+    def test_epoch_rollover_and_stale_samples(self):
+        rate = ZxidRate(tau=1e-9)
+        rate.update(0x5000000ff, 0)
+        self.assertTrue(rate.update(0x600000014, 10))
+        self.assertEqual((rate.get(), rate.rollovers, rate.epoch), (2, 1, 6))
+        self.assertFalse(rate.update(0x5fffffff0, 20))
+        self.assertFalse(rate.update(0x600000010, 20))
+        self.assertFalse(rate.update(0x600000020, 10))
+        self.assertEqual((rate.counter, rate.get()), (0x14, 2))
+        rate.update(0x600000014, 20)
+        self.assertEqual(rate.get(), 0)
+
+
+class ThroughputEstimatorTest(TestCase):
+
+    def test_cluster_and_hosts(self):
+        throughput = ThroughputEstimator(tau=1e-9)
+        leader, follower = make_host('zk1', Host.LEADER), make_host('zk2')
+        for now, leader_zxid, follower_zxid in ((0, 0x100000000, 0x100000000), (10, 0x100000064, 0x100000032),
+                                                (20, 0x1000000c8, 0x100000064)):
+            leader.info['zxid'], follower.info['zxid'] = leader_zxid, follower_zxid
+            throughput.update(leader, now)
+            rates = throughput.update(follower, now)
+        self.assertEqual(throughput.get('c'), {'rate': 10, 'leader': 'zk1:2181', 'zxid': 0x1000000c8, 'epoch': 1,
+                                               'rollovers': 0})
+        self.assertEqual(rates, {'zxid_rate': 5, 'write_rate': 10, 'zxid_lag': 100, 'zxid_lag_rate': 5,
+                                 'zxid_lag_time': 10})
+        self.assertEqual(throughput.get_host('c', 'zk1:2181')['zxid_lag'], 0)
+
+        # election - follower becomes leader of the next epoch, lag of the old epoch is unknown
+        follower.info.update(mode=Host.LEADER, zxid=0x200000000)
+        throughput.update(follower, 30)
+        leader.info.update(mode=Host.FOLLOWER, zxid=0x1000000c8)
+        self.assertNotIn('zxid_lag', throughput.update(leader, 30))
+        self.assertEqual(throughput.get('c')['rollovers'], 1)
+        self.assertEqual(throughput.get('c')['leader'], 'zk2:2181')
+        self.assertEqual(throughput.get('other'), {'rate': None, 'leader': None, 'zxid': None, 'epoch': None,
+                                                   'rollovers': 0})
+
+    def test_unhealthy_not_sampled(self):
+        throughput = ThroughputEstimator()
+        host = make_host('zk1', Host.LEADER, 0x100000000)
+        host.health = Host.HOST_ERROR
+        self.assertEqual(throughput.update(host, 0), {})
+        self.assertIsNone(throughput.get('c')['zxid'])
+
+    def test_on_poll_feeds_alerts_and_exporters(self):
+        throughput = ThroughputEstimator(tau=1e-9)
+        host = make_host('zk1', Host.LEADER, 0x100000000)
+        throughput.update(host, 0)
+        host.info['zxid'] = 0x100000064
+        record = {'ok': True, 'info': dict(host.info)}
+        rates = throughput.on_poll(host, record, {})
+        self.assertIs(record['rates'], rates)
+        self.assertGreater(rates['write_rate'], 0)
+        self.assertIn('write_rate', dict(exporters.flatten(host, record)))
+        self.assertEqual(AlertEngine().metrics(host, record)['zxid_lag'], 0)
+        self.assertIsNone(throughput.on_poll(host, {'ok': False, 'info': {}}, {}))
+
+    def test_on_poll_uses_record_state(self):
+        throughput = ThroughputEstimator(tau=1e-9)
+        host = make_host('zk1', Host.LEADER, 0x100000000)
+        state = {'health': Host.HOST_HEALTHY, 'mode': Host.LEADER, 'zxid': 0x100000000, 'zookeeper': None}
+        throughput.on_poll(host, {'info': {'zxid': 0x100000000}, 'state': state, 'time': 100}, {})
+        # host went on (ex. record was queued), the sample is still the record's one
+        host.info['zxid'], host.health = 0x100000500, Host.HOST_ERROR
+        state = dict(state, zxid=0x100000064)
+        rates = throughput.on_poll(host, {'info': {'zxid': 0x100000064}, 'state': state, 'time': 110}, {})
+        self.assertEqual(rates['write_rate'], 10)
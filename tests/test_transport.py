@@ -0,0 +1,188 @@
+# -*- coding:utf-8 -*-
+import asyncio
+import socket
+import ssl
+from unittest import TestCase
+from zookeeper_monitor import zk
+from zookeeper_monitor.zk import transport
+from .fixtures.server import FakeZookeeper, TLS_CERT, tls_context
+
+
+class TransportTest(TestCase):
+    """ Transport runs on a bare asyncio loop, without tornado's IOLoop """
+
+    def _run(self, coro):
+        return asyncio.run(coro)
+
+    def test_resolve(self):
+        family, sockaddr = self._run(transport.resolve('127.0.0.1', '2181'))
+        self.assertEqual(family, socket.AF_INET)
+        self.assertEqual(sockaddr, ('127.0.0.1', 2181))
+
+    def test_request(self):
+        async def run():
+            server = FakeZookeeper({'abcd': b'response'})
+            port = await server.start()
+            try:
+                return await transport.request('127.0.0.1', port, ' abcd \n'), server.commands
+            finally:
+                server.stop()
+
+        self.assertEqual(self._run(run()), (b'response', ['abcd']))
+
+    def test_stream(self):
+        async def run():
+            server = FakeZookeeper({'wchc': b'0123456789' * 10})
+            port = await server.start()
+            chunks = []
+            try:
+                size = await transport.stream('127.0.0.1', port, 'wchc', chunks.append, chunk_size=16)
+            finally:
+                server.stop()
+            return size, chunks
+
+        size, chunks = self._run(run())
+        self.assertEqual(size, 100)
+        self.assertEqual(b''.join(chunks), b'0123456789' * 10)
+
+    def test_connection_refused(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        self.assertRaises(ConnectionError, self._run, transport.request('127.0.0.1', port, 'ruok'))
+
+    def test_host_native_commands(self):
+        async def run():
+            server = FakeZookeeper()
+            port = await server.start()
+            host = zk.Host('127.0.0.1', port)
+            try:
+                return await host.srvr_async(), await host.ruok_async(), host
+            finally:
+                server.stop()
+
+        srvr, ruok, host = self._run(run())
+        self.assertEqual(srvr['mode'], zk.Host.FOLLOWER)
+        self.assertEqual(ruok, 'imok')
+        self.assertEqual(host.health, zk.Host.HOST_HEALTHY)
+
+    def _request(self, response, **kwargs):
+        async def run():
+            server = FakeZookeeper({'dump': response})
+            port = await server.start()
+            try:
+                return await transport.request('127.0.0.1', port, 'dump', **kwargs)
+            finally:
+                server.stop()
+
+        return self._run(run())
+
+    def test_request_grows_buffer(self):
+        data = bytes(range(256)) * 2000
+        response = self._request(data)
+        self.assertEqual(response, data)
+        self.assertEqual(response.nbytes, len(data))
+        self.assertFalse(response.truncated)
+
+    def test_request_max_bytes(self):
+        data = b'x' * 200000
+        response = self._request(data, max_bytes=100000)
+        self.assertEqual(response, b'x' * 100000)
+        self.assertTrue(response.truncated)
+        self.assertGreater(response.nbytes, 100000)
+
+        response = self._request(data, max_bytes=200000)
+        self.assertFalse(response.truncated)
+        self.assertEqual(len(response), 200000)
+
+        self.assertRaises(zk.HostResponseTooLarge, self._request, data, max_bytes=10, overflow=transport.ABORT)
+
+
+class TLSTransportTest(TestCase):
+    """ 4lw over TLS against fake zookeeper with self-signed certificate """
+
+    def _run(self, coro):
+        return asyncio.run(coro)
+
+    def _serve(self, run, responses=None):
+        async def serve():
+            server = FakeZookeeper(responses)
+            port = await server.start(ssl=tls_context())
+            try:
+                return await run(port)
+            finally:
+                server.stop()
+
+        return self._run(serve())
+
+    def test_request_resumes_session(self):
+        tls = transport.TLS(transport.create_context(ca=TLS_CERT), '127.0.0.1')
+
+        async def run(port):
+            return [await transport.request('127.0.0.1', port, 'ruok', tls=tls) for _ in range(3)]
+
+        responses = self._serve(run)
+        self.assertEqual(responses, [b'imok'] * 3)
+        self.assertEqual([response.resumed for response in responses], [False, True, True])
+        self.assertTrue(all(response.handshake > 0 for response in responses))
+        stats = tls.get_stats()
+        self.assertEqual((stats['full'], stats['resumed']), (1, 2))
+        self.assertGreater(stats['full_avg'], 0)
+
+    def test_stream_and_large_response(self):
+        tls = transport.TLS(transport.create_context(ca=TLS_CERT), 'localhost')
+        data = bytes(range(256)) * 2000
+
+        async def run(port):
+            chunks = []
+            size = await transport.stream('127.0.0.1', port, 'wchc', chunks.append, tls=tls)
+            response = await transport.request('127.0.0.1', port, 'dump', max_bytes=1000, tls=tls)
+            return size, b''.join(chunks), response
+
+        size, streamed, response = self._serve(run, {'wchc': data, 'dump': data})
+        self.assertEqual((size, streamed), (len(data), data))
+        self.assertEqual(response, data[:1000])
+        self.assertTrue(response.truncated)
+
+    def test_verify(self):
+        async def run(port):
+            return await transport.request('127.0.0.1', port, 'ruok', tls=transport.TLS(context, 'other'))
+
+        context = transport.create_context(ca=TLS_CERT)
+        self.assertRaises(ssl.SSLCertVerificationError, self._serve, run)
+        context = transport.create_context()
+        self.assertRaises(ssl.SSLCertVerificationError, self._serve, run)
+        context = transport.create_context(ca=TLS_CERT, check_hostname=False)
+        self.assertEqual(self._serve(run), b'imok')
+        context = transport.create_context(verify=False)
+        self.assertEqual(self._serve(run), b'imok')
+
+    def test_cluster_hosts(self):
+        cluster = zk.Cluster('c')
+        cluster.add_host(addr='127.0.0.1', port=1)
+        cluster.set_tls({'ca': TLS_CERT})
+        context = cluster._tls
+
+        async def run(port):
+            host = zk.Host('127.0.0.1', port)
+            cluster.add_host(host)
+            results = [await host.srvr_async(), await host.ruok_async()]
+            cluster.sync_hosts([{'addr': '127.0.0.1', 'port': port}])
+            results.append(await host.ruok_async())
+            return host, results
+
+        host, results = self._serve(run)
+        self.assertEqual(results[0]['mode'], zk.Host.FOLLOWER)
+        self.assertEqual(results[1:], ['imok', 'imok'])
+        self.assertIs(host._tls.context, context)
+        self.assertEqual((host.timings['srvr']['resumed'], host.timings['ruok']['resumed']), (False, True))
+        info = self._run(self._get_info(host))
+        self.assertEqual((info['tls']['full'], info['tls']['resumed']), (1, 2))
+        self.assertFalse(any(key.startswith('_') for key in info))
+
+        cluster.set_tls(None)
+        self.assertIsNone(host._tls)
+
+    async def _get_info(self, host):
+        return await host.get_info()
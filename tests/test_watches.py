@@ -0,0 +1,53 @@
+# -*- coding:utf-8 -*-
+from unittest import TestCase
+from zookeeper_monitor.zk.watches import WatchParser
+
+
+WCHC = (
+    b'0x14d4b9d2a6e0000\n'
+    b'\t/a\n'
+    b'\t/b\n'
+    b'\n'
+    b'0x14d4b9d2a6e0001\n'
+    b'\t/a\n'
+    b'0x14d4b9d2a6e0002\n'
+    b'\t/a\n'
+    b'\t/b\n'
+    b'\t/c\n'
+)
+
+
+class WatchParserTest(TestCase):
+
+    def _parse(self, data, chunk_size, **kwargs):
+        parser = WatchParser(**kwargs)
+        for pos in range(0, len(data), chunk_size):
+            parser.feed(data[pos:pos + chunk_size])
+        return parser.close()
+
+    def test_aggregates(self):
+        for chunk_size in (1, 3, 7, len(WCHC)):
+            result = self._parse(WCHC, chunk_size, top=2)
+            self.assertEqual(result, {
+                'groups': 3,
+                'watches': 6,
+                'max': 3,
+                'top': [{'key': '0x14d4b9d2a6e0002', 'watches': 3}, {'key': '0x14d4b9d2a6e0000', 'watches': 2}],
+            })
+
+    def test_index(self):
+        result = self._parse(WCHC, 5, top=0, index=True)
+        self.assertEqual(result['top'], [])
+        self.assertEqual(result['index'], {
+            '0x14d4b9d2a6e0000': ['/a', '/b'],
+            '0x14d4b9d2a6e0001': ['/a'],
+            '0x14d4b9d2a6e0002': ['/a', '/b', '/c'],
+        })
+
+    def test_no_trailing_newline_and_orphans(self):
+        result = self._parse(b'\t/orphan\r\n/path\r\n\t0x1\r\n\t0x2', 4, index=True)
+        self.assertEqual(result['index'], {'/path': ['0x1', '0x2']})
+        self.assertEqual(result['watches'], 2)
+
+    def test_empty(self):
+        self.assertEqual(self._parse(b'', 1), {'groups': 0, 'watches': 0, 'max': 0, 'top': []})
@@ -0,0 +1,407 @@
+# -*- coding:utf-8 -*-
+import json
+import os
+import tempfile
+from tornado import gen
+from tornado.testing import AsyncTestCase, AsyncHTTPTestCase
+from zookeeper_monitor import zk
+from zookeeper_monitor.poller import host_state
+from zookeeper_monitor.web import WebMonitor
+from zookeeper_monitor.zk import sessions
+from .fixtures import host as FIXTURE
+
+
+try:
+    from unittest.mock import MagicMock, patch
+except:
+    from mock import MagicMock, patch
+
+
+class WebMonitorTest(AsyncTestCase):
+
+    FIXTURE_CONFIG = {
+        'name': 'cluster-name',
+        'hosts': [
+            {'addr': '10.1.15.1', 'port': 2181, 'dc': 'eu-west'},
+            {'addr': '10.1.15.2', 'port': 2181, 'dc': 'eu-west'},
+        ]
+    }
+
+    def setUp(self):
+        super(WebMonitorTest, self).setUp()
+        self.webmonitor = WebMonitor()
+        fd, self.config_file = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        self._write_config(self.FIXTURE_CONFIG)
+
+    def tearDown(self):
+        os.remove(self.config_file)
+        super(WebMonitorTest, self).tearDown()
+
+    def _write_config(self, data):
+        with open(self.config_file, 'w') as config:
+            json.dump(data, config)
+
+    def test_set_cluster_keeps_unchanged_hosts(self):
+        self.webmonitor.set_cluster(self.FIXTURE_CONFIG)
+        cluster = self.webmonitor.get_cluster()
+        kept = cluster.get_host('10.1.15.1:2181')
+        kept.health = zk.Host.HOST_HEALTHY
+
+        self.webmonitor.set_cluster({
+            'name': 'cluster-name',
+            'hosts': [{'addr': '10.1.15.1', 'port': 2181}, {'addr': '10.1.15.3', 'port': 2181}]
+        })
+        self.assertIs(self.webmonitor.get_cluster(), cluster)
+        self.assertIs(cluster.get_host('10.1.15.1:2181'), kept)
+        self.assertEqual(kept.health, zk.Host.HOST_HEALTHY)
+        self.assertIsNone(cluster.get_host('10.1.15.2:2181'))
+        self.assertEqual(cluster.get_host('10.1.15.3:2181').health, zk.Host.HOST_UNCHECKED)
+
+    def test_set_cluster_renamed(self):
+        self.webmonitor.set_cluster(self.FIXTURE_CONFIG)
+        cluster = self.webmonitor.get_cluster()
+        self.webmonitor.set_cluster(dict(self.FIXTURE_CONFIG, name='other'))
+        self.assertIsNot(self.webmonitor.get_cluster(), cluster)
+        self.assertEqual(str(self.webmonitor.get_cluster()), 'other')
+
+    def test_set_cluster_prunes_alerts(self):
+        self.webmonitor.set_alerts({'rules': ['health != OK']})
+        self.webmonitor.set_cluster(self.FIXTURE_CONFIG)
+        for host in self.webmonitor.get_cluster().get_hosts():
+            self.webmonitor.alerts.evaluate('cluster-name', str(host), {'health': zk.Host.HOST_TIMEOUT}, now=0)
+        # host removed on reload - its firing alert is gone
+        self.webmonitor.set_cluster(dict(self.FIXTURE_CONFIG, hosts=self.FIXTURE_CONFIG['hosts'][:1]))
+        self.assertEqual([alert['host'] for alert in self.webmonitor.alerts.active()], ['10.1.15.1:2181'])
+        self.webmonitor.set_cluster(dict(self.FIXTURE_CONFIG, name='other'))
+        self.assertEqual(self.webmonitor.alerts.active(), [])
+
+    def test_reload_config(self):
+        self.assertFalse(self.webmonitor.reload_config())
+        self.webmonitor.load_config_from_file(self.config_file)
+        kept = self.webmonitor.get_cluster().get_host('10.1.15.1:2181')
+
+        self._write_config({'name': 'cluster-name', 'hosts': [{'addr': '10.1.15.1', 'port': 2181}]})
+        self.assertTrue(self.webmonitor.reload_config())
+        self.assertEqual(self.webmonitor.get_cluster().get_hosts(), [kept])
+
+        with open(self.config_file, 'w') as config:
+            config.write('{broken')
+        self.assertFalse(self.webmonitor.reload_config())
+        self.assertEqual(self.webmonitor.get_cluster().get_hosts(), [kept])
+
+    def test_check_config(self):
+        self.webmonitor.load_config_from_file(self.config_file)
+        self._write_config({'name': 'cluster-name', 'hosts': [{'addr': '10.1.15.9', 'port': 2181}]})
+        os.utime(self.config_file, (0, 0))
+        self.webmonitor._check_config()
+        self.assertEqual([str(host) for host in self.webmonitor.get_cluster().get_hosts()], ['10.1.15.9:2181'])
+
+    def test_set_cluster_seeds(self):
+        self.webmonitor.set_cluster({'name': 'seeded', 'seeds': [{'addr': '10.1.15.1'}], 'discovery_interval': 30})
+        cluster = self.webmonitor.get_cluster()
+        self.assertEqual([str(host) for host in cluster.get_hosts()], ['10.1.15.1:2181'])
+        self.assertEqual([str(host) for host in cluster.get_seeds()], ['10.1.15.1:2181'])
+        self.assertTrue(cluster._discovery.is_running())
+
+        self.webmonitor.set_cluster({'name': 'seeded', 'hosts': [{'addr': '10.1.15.2'}]})
+        self.assertIsNone(cluster._discovery)
+        self.assertEqual([str(host) for host in cluster.get_hosts()], ['10.1.15.2:2181'])
+
+    def test_set_alerts(self):
+        self.webmonitor.set_alerts({'rules': ['health != OK'], 'sinks': [{'type': 'file', 'path': '/dev/null'}]})
+        self.assertEqual(self.webmonitor.poller.commands, ('srvr',))
+        self.webmonitor.set_alerts({'rules': ['zk_avg_latency > 10']})
+        self.assertEqual(self.webmonitor.poller.commands, ('srvr', 'mntr'))
+        self.assertEqual(self.webmonitor.alerts.sinks, [])
+        with self.assertRaises(ValueError):
+            self.webmonitor.set_alerts({'rules': ['broken']})
+        self.assertEqual([rule.name for rule in self.webmonitor.alerts.rules], ['zk_avg_latency > 10'])
+
+    def test_set_exporters(self):
+        self.webmonitor.set_exporters([{'type': 'statsd', 'port': 8125}])
+        exporter = self.webmonitor.exporters[0]
+        self.assertEqual(self.webmonitor.poller.commands, ('srvr', 'mntr'))
+        with self.assertRaises(ValueError):
+            self.webmonitor.set_exporters([{'type': 'missing'}])
+        self.assertEqual(self.webmonitor.exporters, [exporter])
+        self.webmonitor.set_exporters(None)
+        self.assertEqual(self.webmonitor.exporters, [])
+        self.assertEqual(self.webmonitor.poller.commands, ('srvr',))
+        self.assertTrue(exporter.sock._closed)
+
+    def test_set_pipeline(self):
+        self.webmonitor.set_pipeline({'sinks': [{'type': 'log', 'policy': 'drop_oldest', 'queue': 10}]})
+        self.assertEqual([sink.name for sink in self.webmonitor.pipeline.get_sinks()],
+                         ['events', 'alerts', 'exporters', 'log'])
+        with self.assertRaises(ValueError):
+            self.webmonitor.set_pipeline({'sinks': [{'type': 'missing'}]})
+        self.webmonitor.set_pipeline(None)
+        self.assertEqual([sink.name for sink in self.webmonitor.pipeline.get_sinks()], ['events', 'alerts', 'exporters'])
+
+
+class ClientsHandlerTest(AsyncHTTPTestCase):
+
+    def get_app(self):
+        webmonitor = WebMonitor()
+        webmonitor.set_cluster({'name': 'c', 'hosts': [{'addr': 'zk1'}, {'addr': 'zk2'}]})
+        stats = {
+            'zk1:2181': {'clients': [{'host': '10.0.0.{}'.format(num), 'port': '1', 'n': '1',
+                                      'queued': str(num), 'recved': '0', 'sent': '0'} for num in range(5)]},
+            'zk2:2181': False,
+        }
+        for host in webmonitor.get_cluster().get_hosts():
+            host.stat = MagicMock(return_value=gen.maybe_future(stats[str(host)]))
+        return webmonitor
+
+    def test_top(self):
+        response = self.fetch('/cluster/clients/top.json?by=queued&limit=2&offset=1')
+        self.assertEqual(response.code, 200)
+        data = json.loads(response.body.decode('utf-8'))
+        self.assertEqual([item['queued'] for item in data['items']], ['3', '2'])
+        self.assertEqual(data['total'], 5)
+
+    def test_views(self):
+        for view in ('groups', 'multi', 'imbalance'):
+            response = self.fetch('/cluster/clients/{}.json'.format(view))
+            self.assertEqual(response.code, 200)
+
+    def test_errors(self):
+        self.assertEqual(self.fetch('/cluster/clients/unknown.json').code, 404)
+        self.assertEqual(self.fetch('/cluster/clients/top.json?by=port').code, 400)
+        self.assertEqual(self.fetch('/cluster/clients/top.json?limit=x').code, 400)
+
+
+class SessionsHandlerTest(AsyncHTTPTestCase):
+
+    def get_app(self):
+        webmonitor = WebMonitor()
+        webmonitor.set_cluster({'name': 'c', 'hosts': [{'addr': 'zk1'}, {'addr': 'zk2'}]})
+        tables = {'zk1:2181': sessions.parse(FIXTURE.cons['in'].split('\n'))[0], 'zk2:2181': False}
+        patcher = patch.object(zk.Host, 'cons', autospec=True,
+                               side_effect=lambda host: gen.maybe_future(tables[str(host)]))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return webmonitor
+
+    def test_sessions(self):
+        response = self.fetch('/cluster/sessions.json?by=avglat&limit=1')
+        self.assertEqual(response.code, 200)
+        data = json.loads(response.body.decode('utf-8'))
+        self.assertEqual([(item['server'], item['host']) for item in data['sessions']],
+                         [('zk1:2181', '0:0:0:0:0:0:0:1')])
+        self.assertEqual(data['percentiles']['maxlat'], {'count': 2, 'max': 41, 'p50': 2, 'p90': 41, 'p99': 41})
+        self.assertEqual((data['total'], data['failed']), (3, ['zk2:2181']))
+
+    def test_errors(self):
+        self.assertEqual(self.fetch('/cluster/sessions.json?by=host').code, 400)
+        self.assertEqual(self.fetch('/cluster/sessions.json?limit=0').code, 400)
+
+
+class ConsistencyHandlerTest(AsyncHTTPTestCase):
+
+    def get_app(self):
+        webmonitor = WebMonitor()
+        webmonitor.set_cluster({'name': 'c', 'hosts': [{'addr': 'zk1'}]})
+        patcher = patch.object(zk.Cluster, 'consistent_snapshot', autospec=True,
+                               side_effect=lambda cluster, max_skew: gen.maybe_future({'max_skew': max_skew}))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return webmonitor
+
+    def test_consistency(self):
+        data = json.loads(self.fetch('/cluster/consistency.json').body.decode('utf-8'))
+        self.assertEqual(data, {'max_skew': zk.Cluster.SNAPSHOT_MAX_SKEW})
+        data = json.loads(self.fetch('/cluster/consistency.json?max_skew=0.2').body.decode('utf-8'))
+        self.assertEqual(data, {'max_skew': 0.2})
+        self.assertEqual(self.fetch('/cluster/consistency.json?max_skew=x').code, 400)
+
+
+class PipelineHandlerTest(AsyncHTTPTestCase):
+
+    def get_app(self):
+        return WebMonitor()
+
+    def test_pipeline(self):
+        host = zk.Host('zk1', cluster='c')
+        host.health = zk.Host.HOST_HEALTHY
+        previous = host_state(host)
+        host.health = zk.Host.HOST_TIMEOUT
+        self._app.on_poll(host, {'ok': False, 'host': 'zk1:2181', 'health': host.health, 'info': {}}, previous)
+        data = json.loads(self.fetch('/pipeline.json').body.decode('utf-8'))
+        self.assertEqual((data['enrich']['in'], data['enrich']['out']), (1, 1))
+        self.assertEqual(sorted(data['sinks']), ['alerts', 'events', 'exporters'])
+        self.assertEqual(data['sinks']['events']['out'], 1)
+        self.assertEqual([event['host'] for event in self._app.events.query()], ['zk1:2181'])
+
+
+class EventsHandlerTest(AsyncHTTPTestCase):
+
+    def get_app(self):
+        webmonitor = WebMonitor()
+        webmonitor.events.add('c', 'zk1:2181', 'health', 'OK', 'TIMEOUT', timestamp=10)
+        webmonitor.events.add('c', 'zk2:2181', 'mode', 'FOLLOWER', 'LEADER', timestamp=20)
+        return webmonitor
+
+    def test_events(self):
+        response = self.fetch('/events.json?host=zk1:2181')
+        self.assertEqual(response.code, 200)
+        data = json.loads(response.body.decode('utf-8'))
+        self.assertEqual([event['type'] for event in data['events']], ['health'])
+        data = json.loads(self.fetch('/events.json?since=15').body.decode('utf-8'))
+        self.assertEqual([event['host'] for event in data['events']], ['zk2:2181'])
+
+    def test_errors(self):
+        self.assertEqual(self.fetch('/events.json?type=unknown').code, 400)
+        self.assertEqual(self.fetch('/events.json?since=x').code, 400)
+
+
+class ClusterHandlerTest(AsyncHTTPTestCase):
+
+    def get_app(self):
+        webmonitor = WebMonitor()
+        webmonitor.set_cluster({
+            'name': 'c',
+            'hosts': [{'addr': 'zk1', 'dc': 'eu'}, {'addr': 'zk2', 'dc': 'us'}, {'addr': 'zk3', 'dc': 'eu'}],
+            'dcs': {'us': {'timeout': 10}},
+        })
+        patcher = patch.object(zk.Host, 'srvr', autospec=True, side_effect=self._srvr)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return webmonitor
+
+    @staticmethod
+    def _srvr(host):
+        # zk1 is leader writing 100 transactions between requests
+        leader = host.addr == 'zk1'
+        zxid = host.info['zxid'] + 100 if leader and host.info['mode'] == zk.Host.LEADER else 0x100000003
+        host.health = zk.Host.HOST_HEALTHY
+        host.info.update(mode=zk.Host.LEADER if leader else zk.Host.FOLLOWER, zxid=zxid, connections=2,
+                         latency_avg=1, latency_max=3)
+        return gen.maybe_future(dict(host.info))
+
+    def test_grouped_by_dc(self):
+        data = json.loads(self.fetch('/cluster.json').body.decode('utf-8'))
+        self.assertEqual([host['addr'] for host in data['hosts']], ['zk1', 'zk3', 'zk2'])
+        self.assertEqual([(dc['name'], dc['hosts']) for dc in data['dcs']],
+                         [('eu', ['zk1:2181', 'zk3:2181']), ('us', ['zk2:2181'])])
+        self.assertEqual(data['dcs'][0]['stats']['connections'], 4)
+        self.assertEqual(data['hosts'][2]['timeout'], 10)
+
+    def test_busy_lane(self):
+        # us is still polled in background - it's served from its last known state, not polled again
+        self._app.poller.is_busy = lambda dc: dc == 'us'
+        data = json.loads(self.fetch('/cluster.json').body.decode('utf-8'))
+        self.assertEqual([(host['addr'], host['health']) for host in data['hosts']],
+                         [('zk1', zk.Host.HOST_HEALTHY), ('zk3', zk.Host.HOST_HEALTHY), ('zk2', zk.Host.HOST_UNCHECKED)])
+        self.assertEqual(sorted(call[0][0].addr for call in zk.Host.srvr.call_args_list), ['zk1', 'zk3'])
+
+    def test_html(self):
+        response = self.fetch('/cluster')
+        self.assertEqual(response.code, 200)
+        body = response.body.decode('utf-8')
+        self.assertLess(body.index('>eu<'), body.index('>us<'))
+        self.assertIn('0x100000003', body)
+
+    def test_throughput(self):
+        data = json.loads(self.fetch('/cluster.json').body.decode('utf-8'))
+        self.assertIsNone(data['throughput']['rate'])
+        data = json.loads(self.fetch('/cluster.json').body.decode('utf-8'))
+        self.assertEqual((data['throughput']['leader'], data['throughput']['epoch']), ('zk1:2181', 1))
+        self.assertGreater(data['throughput']['rate'], 0)
+        rates = dict((host['addr'], host['rates']) for host in data['hosts'])
+        self.assertEqual((rates['zk1']['zxid_lag'], rates['zk2']['zxid_lag']), (0, 100))
+        self.assertIn('txn/s', self.fetch('/cluster').body.decode('utf-8'))
+
+
+class WarmStartTest(AsyncHTTPTestCase):
+
+    def get_app(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        previous = WebMonitor()
+        previous.set_cluster({'name': 'c', 'hosts': [{'addr': 'zk1'}, {'addr': 'zk2'}]})
+        previous.get_cluster().get_host('zk1:2181').info.update(mode=zk.Host.LEADER, zxid=7)
+        previous.set_snapshot(self.path, 0)
+        previous.save_snapshot()
+
+        webmonitor = WebMonitor()
+        webmonitor.set_cluster({'name': 'c', 'hosts': [{'addr': 'zk1'}, {'addr': 'zk2'}]})
+        self.srvr = MagicMock(side_effect=lambda host: gen.maybe_future({}))
+        patcher = patch.object(zk.Host, 'srvr', autospec=True, side_effect=self.srvr)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        webmonitor.poller.poll = MagicMock()
+        webmonitor.set_snapshot(self.path, 0)
+        return webmonitor
+
+    def test_stale(self):
+        self.assertEqual(self._app.stale, set(['zk1:2181', 'zk2:2181']))
+        data = json.loads(self.fetch('/cluster.json').body.decode('utf-8'))
+        self.assertTrue(data['stale'])
+        self.assertEqual([(host['info']['zxid'], host['stale']) for host in data['hosts']], [(7, True), (None, True)])
+        self.assertFalse(self.srvr.called)
+        self.assertIn('(stale)', self.fetch('/cluster').body.decode('utf-8'))
+        self.assertEqual(self._app.poller.poll.call_count, 1)
+
+        host = self._app.get_cluster().get_host('zk1:2181')
+        self._app.on_poll(host, {}, host_state(host))
+        data = json.loads(self.fetch('/cluster.json').body.decode('utf-8'))
+        self.assertEqual([host['stale'] for host in data['hosts']], [False, True])
+        self.assertEqual(self.srvr.call_count, 1)
+
+    def test_invalid_snapshot(self):
+        with open(self.path, 'wb') as sink:
+            sink.write(b'broken')
+        self.assertEqual(self._app.load_snapshot(self.path), [])
+
+
+class HostHandlerTest(AsyncHTTPTestCase):
+
+    CLIENTS = [{'host': '10.0.0.{}'.format(num), 'port': '1', 'n': '1', 'queued': str(num % 5), 'recved': '0',
+                'sent': '0'} for num in range(250)]
+
+    def get_app(self):
+        webmonitor = WebMonitor()
+        webmonitor.set_cluster({'name': 'c', 'hosts': [{'addr': 'zk1'}]})
+        patcher = patch.object(zk.Host, 'stat', autospec=True, side_effect=self._stat)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return webmonitor
+
+    def _stat(self, host):
+        host.info.update(mode=zk.Host.FOLLOWER, zxid=1)
+        return gen.maybe_future({'head': 'Zookeeper version: 3.4.6', 'clients': self.CLIENTS})
+
+    def _fetch_json(self, query):
+        response = self.fetch('/cluster/host/zk1-2181.json?' + query)
+        self.assertEqual(response.code, 200)
+        return json.loads(response.body.decode('utf-8'))
+
+    def test_all_clients_by_default(self):
+        data = self._fetch_json('')
+        self.assertEqual(len(data['stat']['clients']), 250)
+        self.assertEqual(data['stat']['head'], 'Zookeeper version: 3.4.6')
+        self.assertEqual(data['info']['addr'], 'zk1')
+
+    def test_query(self):
+        data = self._fetch_json(
+            'sort=queued&order=desc&limit=2&cursor=1&fields=host,queued&info=health&prefix=10.0.0.1')
+        self.assertEqual(data['stat']['clients'],
+                         [{'host': '10.0.0.19', 'queued': '4'}, {'host': '10.0.0.104', 'queued': '4'}])
+        self.assertEqual(data['stat']['total'], 111)
+        self.assertEqual(data['stat']['next'], 3)
+        self.assertEqual(data['info'], {'health': zk.Host.HOST_UNCHECKED})
+
+    def test_errors(self):
+        self.assertEqual(self.fetch('/cluster/host/zk1-2181.json?sort=x').code, 400)
+        self.assertEqual(self.fetch('/cluster/host/zk1-2181.json?limit=0').code, 400)
+        self.assertEqual(self.fetch('/cluster/host/zk9-2181.json').code, 404)
+
+    def test_html_first_page(self):
+        response = self.fetch('/cluster/host/zk1-2181?sort=queued')
+        self.assertEqual(response.code, 200)
+        body = response.body.decode('utf-8')
+        self.assertEqual(body.count('<td>10.0.0.'), 200)
+        self.assertIn('data-next="200"', body)
@@ -0,0 +1,458 @@
+# -*- coding:utf-8 -*-
+""" Alert rules evaluated on every poll
+
+Rules are compiled once, then evaluated incrementally as each host's poll result arrives.
+Numeric rules are indexed by metric and threshold, so the cost of a poll depends on number
+of matching (and already active) rules, not on the number of all rules.
+
+Metrics are typed values of srvr and mntr fields (see zk.schema), host's health and mode,
+follower_zxid_lag and write throughput rates when polled with throughput estimator
+(zxid_rate, write_rate, zxid_lag_rate, ... - see throughput.ThroughputEstimator.get_host).
+
+Rule expression:
+
+    <metric> <op> <value> [for <duration>]
+
+    zk_avg_latency > 50 for 2m
+    follower_zxid_lag > 10000
+    health != OK
+
+An alert is pending until its condition holds for `duration`, then it fires. Firing alert
+resolves when its `clear` condition (default - the rule's condition is false) holds for its duration,
+so a metric oscillating around threshold doesn't flap (hysteresis).
+
+Example config:
+
+    alerts:
+      rules:
+        - {name: latency, expr: zk_avg_latency > 50 for 2m, clear: zk_avg_latency < 40 for 1m}
+        - health != OK for 30s
+      sinks:
+        - {type: webhook, url: "http://alertmanager/hook"}
+        - {type: file, path: /var/log/zk-alerts.log}
+
+"""
+import json
+import logging
+import operator
+import re
+import time
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from tornado import httpclient
+from tornado.ioloop import IOLoop
+from .zk import Host
+from .poller import record_state
+
+PENDING = 'pending'
+FIRING = 'firing'
+RESOLVED = 'resolved'
+
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+ORDERING = ('>', '>=', '<', '<=')
+UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600}
+RE_EXPR = re.compile(
+    r'^\s*(?P<metric>[\w.]+)\s*(?P<op>>=|<=|==|!=|>|<)\s*(?P<value>[^\s]+)'
+    r'(?:\s+for\s+(?P<duration>\d+(?:\.\d+)?)(?P<unit>[smh]?))?\s*$'
+)
+
+
+class RuleSyntaxError(ValueError):
+    """ Invalid rule's expression """
+    pass
+
+
+def number(value):
+    """ Converts value to float if it is numeric, otherwise returns it unchanged """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+class Condition(namedtuple('Condition', 'metric op value duration')):
+    """ Compiled `metric op value for duration` """
+
+    def test(self, metrics):
+        """ Checks condition
+
+        Args:
+            metrics (dict): Host's metrics
+        Returns:
+            True/False, None if metric is unknown
+        """
+        value = metrics.get(self.metric)
+        if value is None:
+            return None
+        try:
+            return OPERATORS[self.op](value, self.value)
+        except TypeError:
+            return False
+
+
+def compile_condition(expr):
+    """ Compiles expression
+
+    Args:
+        expr (string): ex. zk_avg_latency > 50 for 2m
+    Returns:
+        Condition
+    Raises:
+        RuleSyntaxError: If expression is invalid
+    """
+    match = RE_EXPR.match(expr or '')
+    if not match:
+        raise RuleSyntaxError('Invalid rule: {}'.format(expr))
+    value = number(match.group('value'))
+    if match.group('op') in ORDERING and not isinstance(value, float):
+        raise RuleSyntaxError('Rule {} compares with non-numeric value'.format(expr))
+    duration = float(match.group('duration') or 0) * UNITS[match.group('unit') or '']
+    return Condition(match.group('metric'), match.group('op'), value, duration)
+
+
+class Rule(object):
+    """ Alert rule """
+
+    def __init__(self, expr, name=None, clear=None):
+        """ Create rule
+
+        Args:
+            expr (string): Condition firing alert
+            name (string): Unique name, default expr
+            clear (string): Condition resolving alert, default - expr is false
+        Raises:
+            RuleSyntaxError: If expression is invalid
+        """
+        self.expr = expr
+        self.name = name or expr
+        self.clear_expr = clear
+        self.trigger = compile_condition(expr)
+        self.clear = compile_condition(clear) if clear else None
+
+    def is_cleared(self, metrics):
+        """ Checks if firing alert can be resolved, unknown metric keeps it firing """
+        if self.clear is not None:
+            return bool(self.clear.test(metrics))
+        return self.trigger.test(metrics) is False
+
+    def __eq__(self, other):
+        return isinstance(other, Rule) and (self.name, self.expr, self.clear_expr) == \
+            (other.name, other.expr, other.clear_expr)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.name, self.expr, self.clear_expr))
+
+
+class RuleIndex(object):
+    """ Finds rules whose conditions hold without testing all of them
+
+    Ordering rules are grouped by metric and operator and sorted by threshold,
+    so matching ones are a slice found with bisect.
+    """
+
+    def __init__(self, rules):
+        groups = {}
+        for rule in rules:
+            groups.setdefault((rule.trigger.metric, rule.trigger.op), []).append(rule)
+        self._ordered = {}
+        self._equal = {}
+        self._other = {}
+        for (metric, op), group in groups.items():
+            if op in ORDERING:
+                group.sort(key=lambda rule: rule.trigger.value)
+                thresholds = [rule.trigger.value for rule in group]
+                self._ordered.setdefault(metric, []).append((op, thresholds, group))
+            elif op == '==':
+                for rule in group:
+                    self._equal.setdefault(metric, {}).setdefault(rule.trigger.value, []).append(rule)
+            else:
+                self._other.setdefault(metric, []).extend(group)
+
+    def match(self, metrics):
+        """ Gets rules whose conditions hold
+
+        Args:
+            metrics (dict): Host's metrics
+        Returns:
+            List of rules
+        """
+        matched = []
+        for metric, groups in self._ordered.items():
+            value = metrics.get(metric)
+            if not isinstance(value, (int, float)):
+                continue
+            for op, thresholds, group in groups:
+                if op == '>':
+                    matched.extend(group[:bisect_left(thresholds, value)])
+                elif op == '>=':
+                    matched.extend(group[:bisect_right(thresholds, value)])
+                elif op == '<':
+                    matched.extend(group[bisect_right(thresholds, value):])
+                else:
+                    matched.extend(group[bisect_left(thresholds, value):])
+        for metric, values in self._equal.items():
+            matched.extend(values.get(metrics.get(metric), ()))
+        for metric, group in self._other.items():
+            if metric in metrics:
+                matched.extend(rule for rule in group if rule.trigger.test(metrics))
+        return matched
+
+
+class Alert(object):
+    """ State of rule on host """
+
+    __slots__ = ('rule', 'cluster', 'host', 'state', 'since', 'cleared', 'value')
+
+    def __init__(self, rule, cluster, host, since, value):
+        self.rule = rule
+        self.cluster = cluster
+        self.host = host
+        self.state = PENDING
+        self.since = since
+        self.cleared = None
+        self.value = value
+
+    def to_dict(self, now=None):
+        """ Gets alert as dict """
+        return {
+            'time': self.since if now is None else now,
+            'since': self.since,
+            'state': self.state,
+            'rule': self.rule.name,
+            'expr': self.rule.expr,
+            'cluster': self.cluster,
+            'host': self.host,
+            'value': self.value,
+        }
+
+
+class FileSink(object):
+    """ Appends alerts to file as JSON lines """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, alert):
+        try:
+            with open(self.path, 'a') as sink:
+                sink.write(json.dumps(alert) + '\n')
+        except (OSError, IOError) as exception:
+            logging.warning('Unable to write alert to %s: %s', self.path, exception)
+
+
+class WebhookSink(object):
+    """ POSTs alerts as JSON to URL, in background """
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self, alert):
+        IOLoop.current().spawn_callback(self.send, alert)
+
+    async def send(self, alert):
+        """ Sends alert, failures are logged """
+        try:
+            await httpclient.AsyncHTTPClient().fetch(
+                self.url, method='POST', body=json.dumps(alert), request_timeout=self.timeout,
+                headers={'Content-Type': 'application/json'}
+            )
+        except (httpclient.HTTPError, IOError) as exception:
+            logging.warning('Unable to send alert to %s: %s', self.url, exception)
+
+
+SINKS = {
+    'file': FileSink,
+    'webhook': WebhookSink,
+}
+
+
+def build_sink(config):
+    """ Creates sink from config ex. {"type": "file", "path": "/tmp/alerts.log"}
+
+    Raises:
+        ValueError: If type of sink is unknown
+    """
+    config = dict(config)
+    kind = config.pop('type', None)
+    if kind not in SINKS:
+        raise ValueError('Unknown alert sink: {}'.format(kind))
+    return SINKS[kind](**config)
+
+
+class AlertEngine(object):
+    """ Evaluates rules against hosts' metrics """
+
+    def __init__(self, rules=(), sinks=()):
+        """ Create engine
+
+        Args:
+            rules (list): Rules - Rule, expression or dict (expr, name, clear)
+            sinks (list): Callables receiving fired and resolved alerts (dict)
+        """
+        self.rules = []
+        self.sinks = list(sinks)
+        self._index = RuleIndex([])
+        self._states = {}
+        self._leader_zxid = {}
+        self.set_rules(rules)
+
+    @staticmethod
+    def compile(rules):
+        """ Compiles rules' config
+
+        Args:
+            rules (list): Rule, expression or dict (expr, name, clear)
+        Returns:
+            List of Rule
+        Raises:
+            RuleSyntaxError: If any of rules is invalid or names are duplicated
+        """
+        compiled = []
+        for rule in rules or ():
+            if isinstance(rule, dict):
+                rule = Rule(rule.get('expr'), rule.get('name'), rule.get('clear'))
+            elif not isinstance(rule, Rule):
+                rule = Rule(rule)
+            compiled.append(rule)
+        names = [rule.name for rule in compiled]
+        if len(set(names)) != len(names):
+            raise RuleSyntaxError('Duplicated rules names')
+        return compiled
+
+    def set_rules(self, rules):
+        """ Replaces rules, state of unchanged rules is kept
+
+        Raises:
+            RuleSyntaxError: If any of rules is invalid
+        """
+        self.rules = self.compile(rules)
+        self._index = RuleIndex(self.rules)
+        rules = set(self.rules)
+        for states in self._states.values():
+            for name in [name for name, alert in states.items() if alert.rule not in rules]:
+                del states[name]
+
+    def metrics(self, host, record):
+        """ Gets host's metrics from poll's record
+
+        Values are already typed by parser (see zk.schema), followers get
+        follower_zxid_lag against last seen leader's zxid. Health is host's health
+        after the poll (see poller.record_state).
+
+        Args:
+            host (Host): Host
+            record (dict): Poll's record, see Host.poll
+        Returns:
+            Dict of metrics
+        """
+        metrics = {'health': record_state(host, record)['health']}
+        info = record.get('info')
+        if info:
+            metrics.update(info)
+            zxid = info.get('zxid')
+            cluster = str(host.cluster)
+            if isinstance(zxid, int) and info.get('mode') == Host.LEADER:
+                self._leader_zxid[cluster] = zxid
+            elif isinstance(zxid, int) and cluster in self._leader_zxid:
+                metrics['follower_zxid_lag'] = max(self._leader_zxid[cluster] - zxid, 0)
+        metrics.update(record.get('mntr') or {})
+        metrics.update(record.get('rates') or {})
+        return metrics
+
+    def on_poll(self, host, record, previous):  # pylint: disable=W0613
+        """ Poller's listener - evaluates rules against host's poll, at poll's time """
+        return self.evaluate(str(host.cluster), str(host), self.metrics(host, record), record.get('time'))
+
+    def evaluate(self, cluster, host, metrics, now=None):
+        """ Evaluates rules against host's metrics
+
+        Only matching rules and host's active alerts are checked.
+
+        Args:
+            cluster (string): Cluster's name
+            host (string): Host's name
+            metrics (dict): Host's metrics
+            now (float): Unix time, default now
+        Returns:
+            List of fired and resolved alerts (dicts), they are passed to sinks as well
+        """
+        now = time.time() if now is None else now
+        states = self._states.setdefault((cluster, host), {})
+        for rule in self._index.match(metrics):
+            if rule.name not in states:
+                states[rule.name] = Alert(rule, cluster, host, now, metrics.get(rule.trigger.metric))
+        notifications = []
+        for name, alert in list(states.items()):
+            rule = alert.rule
+            value = metrics.get(rule.trigger.metric)
+            if alert.state == PENDING:
+                if not rule.trigger.test(metrics):
+                    del states[name]
+                    continue
+                alert.value = value
+                if now - alert.since >= rule.trigger.duration:
+                    alert.state = FIRING
+                    alert.since = now
+                    notifications.append(alert.to_dict(now))
+            elif rule.is_cleared(metrics):
+                alert.cleared = now if alert.cleared is None else alert.cleared
+                duration = rule.clear.duration if rule.clear else rule.trigger.duration
+                if now - alert.cleared >= duration:
+                    del states[name]
+                    alert.state = RESOLVED
+                    alert.value = value
+                    notifications.append(alert.to_dict(now))
+            else:
+                alert.cleared = None
+                alert.value = value
+        for notification in notifications:
+            self.notify(notification)
+        return notifications
+
+    def prune(self, cluster, hosts=()):
+        """ Drops states (pending and firing alerts) of cluster's hosts, except given ones
+
+        Args:
+            cluster (string): Cluster's name
+            hosts (list): Names of hosts still in the cluster, empty - cluster is gone
+        """
+        hosts = set(hosts)
+        for key in [key for key in self._states if key[0] == cluster and key[1] not in hosts]:
+            del self._states[key]
+        if not hosts:
+            self._leader_zxid.pop(cluster, None)
+
+    def notify(self, alert):
+        """ Passes alert to sinks """
+        logging.info('Alert %s %s %s/%s: %s', alert['state'], alert['rule'], alert['cluster'], alert['host'],
+                     alert['value'])
+        for sink in self.sinks:
+            try:
+                sink(alert)
+            except Exception as exception:
+                logging.warning('Alert sink %s failed: %s', sink, exception)
+
+    def active(self, cluster=None):
+        """ Gets firing alerts
+
+        Args:
+            cluster (string): Cluster's name, None - all
+        Returns:
+            List of alerts (dicts)
+        """
+        return [
+            alert.to_dict()
+            for (alert_cluster, _), states in self._states.items() if cluster in (None, alert_cluster)
+            for alert in states.values() if alert.state == FIRING
+        ]
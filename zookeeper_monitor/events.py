@@ -0,0 +1,170 @@
+# -*- coding:utf-8 -*-
+""" State-change events
+
+Poller's listener which diffs host's state before and after every poll
+and records typed events in a bounded ring buffer (oldest events are dropped),
+optionally appended to a file as JSON lines.
+
+Example:
+
+    events = EventLog(size=10000, path='/var/log/zk-events.log')
+    poller.add_listener(events.on_poll)
+    events.query(cluster='prod', type=MODE_CHANGE, since=time.time() - 3600)
+
+"""
+import json
+import logging
+import time
+from collections import deque
+from .zk import Host
+from .poller import record_state
+
+MODE_CHANGE = 'mode'
+HEALTH_CHANGE = 'health'
+LEADER_CHANGE = 'leader'
+EPOCH_CHANGE = 'epoch'
+VERSION_CHANGE = 'version'
+
+TYPES = (MODE_CHANGE, HEALTH_CHANGE, LEADER_CHANGE, EPOCH_CHANGE, VERSION_CHANGE)
+
+
+def zxid_epoch(zxid):
+    """ Gets epoch (high 32 bits) of zxid
+
+    Args:
+        zxid (string, int): Zxid ex. 0x100000003
+    Returns:
+        Epoch (int) or None if zxid is unknown
+    """
+    if zxid is None:
+        return None
+    try:
+        return (zxid if isinstance(zxid, int) else int(zxid, 16)) >> 32
+    except ValueError:
+        return None
+
+
+def short_version(version):
+    """ Strips build info from version ex. '3.4.6-1569965, built on ...' -> '3.4.6-1569965' """
+    return version.split(',')[0].strip() if version else None
+
+
+class EventLog(object):
+    """ Bounded log of hosts' state changes """
+
+    SIZE = 10000
+
+    def __init__(self, size=SIZE, path=None):
+        """ Create event log
+
+        Args:
+            size (int): Max number of events kept in memory
+            path (string): File events are appended to (JSON lines), None - disabled
+        """
+        self.events = deque(maxlen=size)
+        self.path = path
+        self._leaders = {}
+
+    def on_poll(self, host, record, previous):  # pylint: disable=W0613
+        """ Poller's listener - records changes of host's state
+
+        Changes from unknown state (first poll) are not events. Host's state after the poll
+        is taken from record (see poller.record_state), events are stamped with poll's time.
+
+        Args:
+            host (Host): Polled host
+            record (dict): Poll's record
+            previous (dict): Host's state before poll, see poller.host_state
+        Returns:
+            List of new events
+        """
+        cluster = str(host.cluster)
+        name = str(host)
+        state = record_state(host, record)
+        health, mode = state['health'], state['mode']
+        new = []
+
+        def emit(kind, old, current):
+            new.append(self.add(cluster, name, kind, old, current, record.get('time')))
+
+        if health != previous['health'] and previous['health'] != Host.HOST_UNCHECKED:
+            emit(HEALTH_CHANGE, previous['health'], health)
+        if mode != previous['mode'] and previous['mode'] not in (None, Host.UNKNOWN):
+            emit(MODE_CHANGE, previous['mode'], mode)
+        old_epoch, epoch = zxid_epoch(previous['zxid']), zxid_epoch(state['zxid'])
+        if old_epoch is not None and epoch is not None and epoch > old_epoch:
+            emit(EPOCH_CHANGE, old_epoch, epoch)
+        old_version, version = short_version(previous['zookeeper']), short_version(state['zookeeper'])
+        if old_version and version and old_version != version:
+            emit(VERSION_CHANGE, old_version, version)
+        if mode == Host.LEADER and health == Host.HOST_HEALTHY:
+            leader = self._leaders.get(cluster)
+            if leader != name:
+                self._leaders[cluster] = name
+                if leader is not None:
+                    emit(LEADER_CHANGE, leader, name)
+        return new
+
+    def add(self, cluster, host, kind, old, new, timestamp=None):
+        """ Records event
+
+        Args:
+            cluster (string): Cluster's name
+            host (string): Host's name
+            kind (string): Event's type, one of TYPES
+            old: Previous value
+            new: Current value
+            timestamp (float): Unix time, default now
+        Returns:
+            Event (dict)
+        """
+        event = {
+            'time': time.time() if timestamp is None else timestamp,
+            'cluster': cluster,
+            'host': host,
+            'type': kind,
+            'old': old,
+            'new': new,
+        }
+        self.events.append(event)
+        logging.info('Event %s %s/%s: %s -> %s', kind, cluster, host, old, new)
+        if self.path:
+            self._write(event)
+        return event
+
+    def _write(self, event):
+        try:
+            with open(self.path, 'a') as sink:
+                sink.write(json.dumps(event) + '\n')
+        except (OSError, IOError) as exception:
+            logging.warning('Unable to write event to %s: %s', self.path, exception)
+
+    def query(self, cluster=None, host=None, kind=None, since=None, until=None, limit=None):
+        """ Finds events, newest first
+
+        Args:
+            cluster (string): Cluster's name
+            host (string): Host's name
+            kind (string): Event's type
+            since (float): Unix time, events at or after
+            until (float): Unix time, events before
+            limit (int): Max number of events
+        Returns:
+            List of events
+        """
+        result = []
+        for event in reversed(self.events):
+            if until is not None and event['time'] >= until:
+                continue
+            if since is not None and event['time'] < since:
+                break
+            if cluster is not None and event['cluster'] != cluster:
+                continue
+            if host is not None and event['host'] != host:
+                continue
+            if kind is not None and event['type'] != kind:
+                continue
+            result.append(event)
+            if limit is not None and len(result) >= limit:
+                break
+        return result
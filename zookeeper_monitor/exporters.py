@@ -0,0 +1,337 @@
+# -*- coding:utf-8 -*-
+""" Push exporters of polled metrics
+
+Poller's listeners flattening numeric srvr/mntr values of every host into
+StatsD (UDP) or Graphite plaintext (TCP) lines. Lines of all hosts polled in
+the same loop iteration are batched:
+
+    - statsd - many metrics per datagram, up to MTU
+    - graphite - one write on a persistent connection, reconnected with exponential backoff
+
+Exporters never wait for the network - when socket's buffer is full metrics are
+dropped (and counted). While graphite is disconnected (ex. before the first connect)
+the latest lines are kept and sent once connected. StatsD's host name is resolved
+in background on the first flush (IPs are used at once), never in the loop.
+
+Example config:
+
+    exporters:
+      - {type: statsd, host: 127.0.0.1, port: 8125, prefix: zookeeper}
+      - {type: graphite, host: graphite.local, port: 2003}
+
+"""
+import asyncio
+import logging
+import re
+import socket
+import time
+
+RE_NAME = re.compile(r'[^\w-]')
+
+
+def metric_name(*parts):
+    """ Joins parts into dotted metric name, dots and other special chars in parts are replaced with _ """
+    return '.'.join(RE_NAME.sub('_', str(part)) for part in parts if part)
+
+
+def flatten(host, record):
+    """ Gets host's numeric metrics from poll's record
+
+    Args:
+        host (Host): Polled host
+        record (dict): Poll's record, see Host.poll
+    Yields:
+        Tuples of metric's name (relative to host) and value
+    """
+    yield 'up', 1 if record.get('ok') else 0
+    for data in (record.get('info'), record.get('mntr'), record.get('rates')):
+        for key, value in (data or {}).items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield key, value
+
+
+class Exporter(object):
+    """ Base of batching exporters """
+
+    MAX_PENDING = 100000
+
+    def __init__(self, prefix='zookeeper', max_pending=MAX_PENDING):
+        """ Create exporter
+
+        Args:
+            prefix (string): Prefix of metrics' names
+            max_pending (int): Max lines waiting for flush, above are dropped
+        """
+        self.prefix = prefix
+        self.max_pending = max_pending
+        self.sent = 0
+        self.dropped = 0
+        self._pending = []
+        self._flush_handle = None
+
+    def format(self, name, value, timestamp):
+        """ Formats metric's line """
+        raise NotImplementedError
+
+    def on_poll(self, host, record, previous):  # pylint: disable=W0613
+        """ Poller's listener - queues host's metrics (at poll's time), they are flushed in the next loop iteration """
+        timestamp = int(record.get('time') or time.time())
+        base = metric_name(host.cluster, host.dc, host)
+        lines = [self.format('{}.{}.{}'.format(self.prefix, base, name), value, timestamp)
+                 for name, value in flatten(host, record)]
+        self.add(lines)
+
+    def add(self, lines):
+        """ Queues lines (bytes) for batched flush """
+        space = self.max_pending - len(self._pending)
+        if space < len(lines):
+            self.dropped += len(lines) - max(space, 0)
+            lines = lines[:max(space, 0)]
+        self._pending.extend(lines)
+        if self._flush_handle is None and self._pending:
+            self._flush_handle = asyncio.get_event_loop().call_soon(self._flush)
+
+    def _flush(self):
+        self._flush_handle = None
+        lines, self._pending = self._pending, []
+        self.flush(lines)
+
+    def flush(self, lines):
+        """ Sends lines """
+        raise NotImplementedError
+
+    def close(self):
+        """ Stops exporter """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._pending = []
+
+
+class StatsdExporter(Exporter):
+    """ Sends gauges to StatsD over UDP, packed into datagrams up to MTU """
+
+    MTU = 1432
+
+    def __init__(self, host='127.0.0.1', port=8125, prefix='zookeeper', mtu=MTU, **kwargs):
+        """ Create exporter
+
+        Args:
+            host (string): StatsD's IP or name, name is resolved once, asynchronously on the first flush
+            port (int): StatsD's port
+            prefix (string): Prefix of metrics' names
+            mtu (int): Max size of datagram's payload
+        """
+        super(StatsdExporter, self).__init__(prefix, **kwargs)
+        self.host = host
+        self.port = int(port)
+        self.mtu = mtu
+        self.address = None
+        self.sock = None
+        self.datagrams = 0
+        self._resolving = None
+        self._unresolved = []
+        for family in (socket.AF_INET, socket.AF_INET6):
+            try:
+                socket.inet_pton(family, host)
+            except (OSError, ValueError):
+                continue
+            self._open(family, (host, self.port))
+            break
+
+    def _open(self, family, address):
+        self.sock = socket.socket(family, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.address = address
+
+    def resolve(self):
+        """ Starts resolving StatsD's name in background (if not resolved nor resolving yet) """
+        if self.sock is not None or self._resolving is not None:
+            return
+        self._resolving = asyncio.ensure_future(self._resolve())
+
+    async def _resolve(self):
+        try:
+            infos = await asyncio.get_event_loop().getaddrinfo(self.host, self.port, type=socket.SOCK_DGRAM)
+            family, _, _, _, address = infos[0]
+        except (OSError, IndexError) as exception:
+            logging.warning('Unable to resolve statsd %s:%s: %s', self.host, self.port, exception)
+            self.dropped += len(self._unresolved)
+            self._unresolved = []
+        else:
+            self._open(family, address)
+        self._resolving = None
+        lines, self._unresolved = self._unresolved, []
+        if lines:
+            self.flush(lines)
+
+    def format(self, name, value, timestamp):
+        return '{}:{}|g'.format(name, value).encode('utf-8')
+
+    def flush(self, lines):
+        if self.sock is None:
+            # kept until resolved, at most max_pending (the oldest are dropped)
+            self._unresolved.extend(lines)
+            over = len(self._unresolved) - self.max_pending
+            if over > 0:
+                self.dropped += over
+                del self._unresolved[:over]
+            self.resolve()
+            return
+        datagram = bytearray()
+        count = 0
+        for line in lines:
+            if datagram and len(datagram) + 1 + len(line) > self.mtu:
+                self._send(datagram, count)
+                datagram = bytearray()
+                count = 0
+            if datagram:
+                datagram += b'\n'
+            datagram += line
+            count += 1
+        if datagram:
+            self._send(datagram, count)
+
+    def _send(self, datagram, count):
+        try:
+            self.sock.sendto(datagram, self.address)
+        except (BlockingIOError, InterruptedError):
+            self.dropped += count
+        except OSError as exception:
+            logging.warning('Unable to send metrics to statsd %s: %s', self.address, exception)
+            self.dropped += count
+        else:
+            self.sent += count
+            self.datagrams += 1
+
+    def close(self):
+        super(StatsdExporter, self).close()
+        self._unresolved = []
+        if self._resolving is not None:
+            self._resolving.cancel()
+            self._resolving = None
+        if self.sock is not None:
+            self.sock.close()
+
+
+class GraphiteExporter(Exporter):
+    """ Writes plaintext protocol lines to Graphite over a persistent TCP connection """
+
+    BACKOFF_MIN = 1
+    BACKOFF_MAX = 60
+    MAX_BUFFER = 1 << 20
+    MAX_UNSENT = 10000
+
+    def __init__(self, host='127.0.0.1', port=2003, prefix='zookeeper', max_buffer=MAX_BUFFER,
+                 backoff_min=BACKOFF_MIN, backoff_max=BACKOFF_MAX, max_unsent=MAX_UNSENT, **kwargs):
+        """ Create exporter
+
+        Args:
+            host (string): Graphite's address
+            port (int): Graphite's plaintext port
+            prefix (string): Prefix of metrics' names
+            max_buffer (int): Max bytes waiting in connection's write buffer, above metrics are dropped
+            backoff_min (float): First reconnect delay in seconds, doubled on every failure
+            backoff_max (float): Max reconnect delay
+            max_unsent (int): Max lines kept while disconnected, sent once connected, above the oldest are dropped
+        """
+        super(GraphiteExporter, self).__init__(prefix, **kwargs)
+        self.host = host
+        self.port = int(port)
+        self.max_buffer = max_buffer
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.backoff = backoff_min
+        self.max_unsent = max_unsent
+        self.connects = 0
+        self._unsent = []
+        self._writer = None
+        self._connecting = None
+        self._closed = False
+
+    def format(self, name, value, timestamp):
+        return '{} {} {}\n'.format(name, value, timestamp).encode('utf-8')
+
+    def connected(self):
+        """ Checks if connection is up """
+        return self._writer is not None and not self._writer.is_closing()
+
+    def connect(self):
+        """ Starts connecting in background (if not connected nor connecting yet) """
+        if self._closed or self.connected() or self._connecting is not None:
+            return
+        self._connecting = asyncio.ensure_future(self._connect())
+
+    async def _connect(self):
+        while not self._closed:
+            try:
+                _, self._writer = await asyncio.open_connection(self.host, self.port)
+            except OSError as exception:
+                logging.warning('Unable to connect to graphite %s:%s: %s, retry in %ss',
+                                self.host, self.port, exception, self.backoff)
+                await asyncio.sleep(self.backoff)
+                self.backoff = min(self.backoff * 2, self.backoff_max)
+            else:
+                self.connects += 1
+                self.backoff = self.backoff_min
+                break
+        self._connecting = None
+        lines, self._unsent = self._unsent, []
+        if lines and self.connected():
+            self.flush(lines)
+
+    def _keep(self, lines):
+        """ Keeps lines until connected, only the latest max_unsent """
+        self._unsent.extend(lines)
+        over = len(self._unsent) - self.max_unsent
+        if over > 0:
+            self.dropped += over
+            del self._unsent[:over]
+
+    def flush(self, lines):
+        if not self.connected():
+            self._keep(lines)
+            self.connect()
+            return
+        if self._writer.transport.get_write_buffer_size() > self.max_buffer:
+            self.dropped += len(lines)
+            return
+        try:
+            self._writer.write(b''.join(lines))
+        except (OSError, RuntimeError) as exception:
+            logging.warning('Unable to send metrics to graphite %s:%s: %s', self.host, self.port, exception)
+            self._keep(lines)
+            self._writer.close()
+            self.connect()
+        else:
+            self.sent += len(lines)
+
+    def close(self):
+        super(GraphiteExporter, self).close()
+        self._closed = True
+        self._unsent = []
+        if self._connecting is not None:
+            self._connecting.cancel()
+            self._connecting = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+EXPORTERS = {
+    'statsd': StatsdExporter,
+    'graphite': GraphiteExporter,
+}
+
+
+def build_exporter(config):
+    """ Creates exporter from config ex. {"type": "statsd", "host": "127.0.0.1", "port": 8125}
+
+    Raises:
+        ValueError: If type of exporter is unknown
+    """
+    config = dict(config)
+    kind = config.pop('type', None)
+    if kind not in EXPORTERS:
+        raise ValueError('Unknown exporter: {}'.format(kind))
+    return EXPORTERS[kind](**config)
@@ -1,12 +1,20 @@
 # -*- coding:utf-8 -*-
+import json
+import logging
 import os
 import anyconfig
-from tornado import gen, web
+from urllib.parse import urlencode
+from tornado import gen, httpclient, web
+from . import events
+from .zk import clients, sessions
+from .zk.cluster import dc_stats
 
 
 class BaseHandler(web.RequestHandler):
     """ Handles json request for cluster data """
     ACTION = 'r'
+    PEER_TIMEOUT = 5
+    CLIENTS_LIMIT = None
 
     def get_template_path(self):
         self.root_path = os.path.dirname(__file__)
@@ -26,28 +34,136 @@ class BaseHandler(web.RequestHandler):
         self.write(json)
         self.finish()
 
+    def is_sharded(self):
+        """ Checks if data of other instances' hosts should be fetched from peers
+
+        Peers ask each other with `?local=1`, so requests are not forwarded further.
+        """
+        return self.application.shard is not None and not self.get_argument('local', None)
+
+    @gen.coroutine
+    def fetch_peer(self, url):
+        """ Fetches json from peer
+
+        Args:
+            url (string): Peer's URL with path
+        Returns:
+            Decoded json or None if peer failed or sent invalid json
+        """
+        try:
+            response = yield httpclient.AsyncHTTPClient().fetch(url, request_timeout=self.PEER_TIMEOUT)
+            data = json.loads(response.body.decode('utf-8'))
+        except (httpclient.HTTPError, IOError, ValueError) as exception:
+            logging.warning('Unable to fetch %s: %s', url, exception)
+            raise gen.Return(None)
+        raise gen.Return(data)
+
+    @gen.coroutine
+    def fetch_slices(self, path, key):
+        """ Fetches data of hosts owned by other instances from peers
+
+        Args:
+            path (string): Path of peers' local data, ex. /cluster/clients/stats.json?local=1
+            key (string): Key of peer's response with dict host's name -> data
+        Returns:
+            Dict host's name -> data of hosts not owned by this instance, False if their peer failed
+        """
+        slices = yield [self.fetch_peer('{}{}'.format(peer, path)) for peer in self.application.shard.remotes()]
+        remote = {}
+        for peer_data in slices:
+            if isinstance(peer_data, dict) and isinstance(peer_data.get(key), dict):
+                remote.update(peer_data[key])
+        cluster = self.application.get_cluster()
+        raise gen.Return(dict(
+            (str(host), remote.get(str(host), False)) for host in cluster.get_hosts() if not self.application.owns(host)
+        ))
+
     @gen.coroutine
     def get_cluster_data(self, param=None):  # pylint: disable=W0613
         """ Cluster data provider
 
+        When sharded, only owned hosts are polled, the others are fetched from peers
+        (hosts of unavailable peer are reported with their last known local state).
+        Hosts restored from snapshot and not polled yet are not polled here, they are
+        reported at once with their snapshot's state and `stale` set.
+        Hosts are polled in their DC's lane (see Poller.run_lane), DC whose lane is still
+        busy (ex. WAN-degraded DC still polled in background) is reported with its hosts'
+        last known state.
+        Polled zxids feed throughput estimator, local hosts get their `rates`.
+
         Returns:
-            Dict with host data
+            Dict with host data, hosts are ordered by DC, `dcs` lists DCs with
+            their hosts' names and aggregates (see zk.cluster.dc_stats),
+            `throughput` has cluster's write rate (see throughput.ThroughputEstimator.get)
         """
         data = {}
         cluster = self.application.get_cluster()
         data['name'] = str(cluster)
         data['hosts'] = []
-        for host in cluster.get_hosts():
-            yield host.srvr()
+        infos = {}
+        owned = [host for host in cluster.get_hosts() if self.application.owns(host)]
+        stale = self.application.stale
+        throughput = self.application.throughput
+        poller = self.application.poller
+        polled = []
+        lanes = []
+        for dc, hosts in cluster.get_hosts_by_dc().items():
+            hosts = [host for host in hosts if host in owned and str(host) not in stale]
+            if not hosts or poller.is_busy(dc):
+                continue
+            polled.extend(hosts)
+            lanes.append(poller.run_lane(dc, hosts, lambda host: host.srvr(), cluster.get_lane(dc).get('concurrency')))
+        # lanes concurrently, so a slow DC costs its hosts' timeout, not a sum of them
+        results = yield lanes
+        for host, result in zip(polled, [result for lane in results for result in lane]):
+            if result:
+                throughput.update(host)
+        for host in owned:
             info = yield host.get_info()
-            info['cluster'] = str(info['cluster'])
-            data['hosts'].append(info)
+            info = dict(info, cluster=str(info['cluster']), stale=str(host) in stale,
+                        rates=throughput.get_host(str(cluster), str(host)))
+            infos[str(host)] = info
+        cluster.update_leader()
+        if self.is_sharded():
+            shard = self.application.shard
+            slices = yield dict(
+                (peer, self.fetch_peer('{}/cluster.json?local=1'.format(peer))) for peer in shard.remotes()
+            )
+            data['peers'] = dict((peer, slices[peer] is not None) for peer in slices)
+            for peer_data in slices.values():
+                for info in (peer_data or {}).get('hosts', []):
+                    infos.setdefault('{}:{}'.format(info['addr'], info['port']), info)
+        data['dcs'] = []
+        for dc, hosts in cluster.get_hosts_by_dc().items():
+            dc_hosts = []
+            for host in hosts:
+                if str(host) in infos:
+                    dc_hosts.append(infos[str(host)])
+                elif self.is_sharded():
+                    info = yield host.get_info()
+                    dc_hosts.append(dict(info, cluster=str(info['cluster']), stale=True))
+            if dc_hosts:
+                data['hosts'].extend(dc_hosts)
+                data['dcs'].append({
+                    'name': dc,
+                    'hosts': ['{}:{}'.format(info['addr'], info['port']) for info in dc_hosts],
+                    'stats': dc_stats(dc_hosts),
+                })
+        data['stale'] = any(info.get('stale') for info in data['hosts'])
+        data['throughput'] = throughput.get(str(cluster))
         raise gen.Return(data)
 
     @gen.coroutine
     def get_host_data(self, zhost):
         """ Host stat provider
 
+        Clients are filtered with `?prefix=` (IP prefix ex. 10.1. or CIDR ex. 10.1.0.0/16),
+        sorted with `?sort=` (host, port, n, queued, recved, sent) and `?order=` (asc, desc),
+        paginated with `?limit=` and `?cursor=` (`next` of the previous page), only `?fields=`
+        of clients and `?info=` of host's info are returned (comma separated, default all).
+
+        When sharded, data of host owned by other instance is fetched from it.
+
         Args:
             zhost (string): IP and port of host in cluster. Should be delimited by : or -
 
@@ -57,12 +173,241 @@ class BaseHandler(web.RequestHandler):
             Dict with host data
         """
         cluster = self.application.get_cluster()
-        zhost = zhost.replace('-', ':')  # allow w/o escaping issue
-        host = cluster.get_host(zhost)
+        name = zhost.replace('-', ':')  # allow w/o escaping issue
+        host = cluster.get_host(name)
+        if host is None:
+            raise web.HTTPError(404, 'Unknown host: {}'.format(name))
+        if self.is_sharded() and not self.application.owns(host):
+            owner = self.application.shard.owner(str(cluster), str(host))
+            query = dict((arg, self.get_argument(arg)) for arg in self.request.arguments)
+            query['local'] = 1
+            if self.CLIENTS_LIMIT and 'limit' not in query:
+                query['limit'] = self.CLIENTS_LIMIT
+            data = yield self.fetch_peer('{}/cluster/host/{}.json?{}'.format(owner, zhost, urlencode(query)))
+            if data is not None:
+                raise gen.Return(data)
         stat = yield host.stat()
         info = yield host.get_info()
+        info_fields = self.get_list_argument('info')
+        if info_fields is not None:
+            info = dict((field, info[field]) for field in info_fields if field in info)
+        if stat:
+            limit = self.CLIENTS_LIMIT
+            if self.get_argument('limit', None) is not None:
+                limit = self.get_int_argument('limit', None, minimum=1)
+            try:
+                page = clients.query_clients(
+                    stat['clients'],
+                    prefix=self.get_argument('prefix', None),
+                    sort=self.get_argument('sort', None),
+                    order=self.get_argument('order', 'desc'),
+                    fields=self.get_list_argument('fields'),
+                    cursor=self.get_int_argument('cursor', 0),
+                    limit=limit
+                )
+            except ValueError as exception:
+                raise web.HTTPError(400, str(exception))
+            stat = dict((key, val) for key, val in stat.items() if key != 'clients')
+            stat.update(page)
         raise gen.Return({'stat': stat, 'info': info})
 
+    @gen.coroutine
+    def get_stats(self):
+        """ Fetches stat of all cluster's hosts concurrently
+
+        When sharded, only owned hosts are queried, stats of the others are fetched
+        from peers (`stats` view with `?local=1`).
+
+        Returns:
+            Dict host's name -> parsed stat (False if failed), in cluster's order
+        """
+        cluster = self.application.get_cluster()
+        stats = yield dict((str(host), host.stat()) for host in cluster.get_hosts() if self.application.owns(host))
+        if self.is_sharded():
+            remote = yield self.fetch_slices('/cluster/clients/stats.json?local=1', 'stats')
+            stats.update(remote)
+        raise gen.Return(dict((str(host), stats[str(host)]) for host in cluster.get_hosts() if str(host) in stats))
+
+    def get_int_argument(self, name, default, minimum=0):
+        """ Gets query argument as int
+
+        Raises:
+            HTTPError: 400 if argument is not an int or is below minimum
+        """
+        try:
+            value = int(self.get_argument(name, default))
+        except ValueError:
+            raise web.HTTPError(400, 'Argument {} should be int'.format(name))
+        if value < minimum:
+            raise web.HTTPError(400, 'Argument {} should be >= {}'.format(name, minimum))
+        return value
+
+    def get_list_argument(self, name):
+        """ Gets comma separated query argument
+
+        Returns:
+            List of items, None if argument is not given
+        """
+        value = self.get_argument(name, None)
+        if value is None:
+            return None
+        return [item.strip() for item in value.split(',') if item.strip()]
+
+    def get_float_argument(self, name, default=None):
+        """ Gets query argument as float
+
+        Raises:
+            HTTPError: 400 if argument is not a number
+        """
+        value = self.get_argument(name, None)
+        if value is None:
+            return default
+        try:
+            return float(value)
+        except ValueError:
+            raise web.HTTPError(400, 'Argument {} should be number'.format(name))
+
+    @gen.coroutine
+    def get_clients_data(self, view):
+        """ Clients analytics across all hosts
+
+        Args:
+            view (string): One of:
+                - top - top clients by `?by=` (queued, recved, sent)
+                - groups - clients grouped by IP or subnet `?prefix=` (default 32)
+                - multi - clients connected to more than one server
+                - imbalance - connections imbalance per server
+                - stats - parsed stat of every host (views are computed from, peers merge them)
+              Lists are paginated with `?offset=` and `?limit=` (default 50)
+        Returns:
+            Dict with view data
+        """
+        offset = self.get_int_argument('offset', 0)
+        limit = self.get_int_argument('limit', 50, minimum=1)
+        if view not in ('top', 'groups', 'multi', 'imbalance', 'stats'):
+            raise web.HTTPError(404, 'Unknown clients view: {}'.format(view))
+        stats = yield self.get_stats()
+        if view == 'stats':
+            raise gen.Return({'stats': stats})
+        if view == 'imbalance':
+            raise gen.Return(clients.connection_imbalance(stats))
+        if view == 'top':
+            try:
+                items = clients.top_clients(stats, self.get_argument('by', 'queued'), offset + limit)
+            except ValueError as exception:
+                raise web.HTTPError(400, str(exception))
+            result = clients.paginate(items, offset, limit)
+            result['total'] = sum(1 for _ in clients.iter_clients(stats))
+        elif view == 'groups':
+            prefix = self.get_int_argument('prefix', 32)
+            result = clients.paginate(clients.group_clients(stats, min(prefix, 32)), offset, limit)
+        else:
+            result = clients.paginate(clients.multi_server_clients(stats), offset, limit)
+        raise gen.Return(result)
+
+    @gen.coroutine
+    def get_sessions_data(self, param=None):  # pylint: disable=W0613
+        """ Worst sessions across all hosts (parsed `cons`)
+
+        Top `?limit=` (default 20) sessions by `?by=` (queued, recved, sent, llat, minlat,
+        avglat, maxlat - default maxlat) and cluster-wide percentiles of latency and request counts.
+
+        When sharded, only owned hosts are queried, tables of the others are fetched from peers
+        (`?local=1` response of sharded instance carries its hosts' `tables`, see ConsTable.dump).
+
+        Returns:
+            Dict with sessions, percentiles (column -> see zk.sessions.percentiles),
+            total number of connections and failed hosts
+        """
+        limit = self.get_int_argument('limit', 20, minimum=1)
+        cluster = self.application.get_cluster()
+        tables = yield dict((str(host), host.cons()) for host in cluster.get_hosts() if self.application.owns(host))
+        peer_request = self.application.shard is not None and not self.is_sharded()
+        if self.is_sharded():
+            remote = yield self.fetch_slices('/cluster/sessions.json?local=1', 'tables')
+            for name, table in remote.items():
+                try:
+                    tables[name] = False if table is False else sessions.ConsTable.load(table)
+                except ValueError as exception:
+                    logging.warning('Invalid sessions of %s from peer: %s', name, exception)
+                    tables[name] = False
+        try:
+            top = sessions.top_sessions(tables, self.get_argument('by', 'maxlat'), limit)
+        except ValueError as exception:
+            raise web.HTTPError(400, str(exception))
+        result = {
+            'sessions': top,
+            'percentiles': dict(
+                (column, sessions.percentiles(tables, column)) for column in ('avglat', 'maxlat', 'recved', 'sent')
+            ),
+            'total': sum(len(table) for table in tables.values() if table),
+            'failed': sorted(name for name, table in tables.items() if table is False),
+        }
+        if peer_request:
+            result['tables'] = dict((name, False if table is False else table.dump()) for name, table in tables.items())
+        raise gen.Return(result)
+
+    @gen.coroutine
+    def get_consistency_data(self, param=None):  # pylint: disable=W0613
+        """ Consistent snapshot - srvr of all hosts sent in the same moment
+
+        Hosts' zxids and modes are compared only if all answered within `?max_skew=`
+        seconds (default 0.05), see zk.Cluster.consistent_snapshot.
+
+        Returns:
+            Dict with skew window, hosts' zxids and timestamps, divergence
+        """
+        cluster = self.application.get_cluster()
+        max_skew = self.get_float_argument('max_skew', cluster.SNAPSHOT_MAX_SKEW)
+        result = yield cluster.consistent_snapshot(max_skew=max_skew)
+        cluster.update_leader()
+        raise gen.Return(result)
+
+    @gen.coroutine
+    def get_pipeline_data(self, param=None):  # pylint: disable=W0613
+        """ Poll results' pipeline counters
+
+        Returns:
+            Dict of stage -> counters (see pipeline.Stage.get_stats), sinks' under `sinks`
+        """
+        raise gen.Return(self.application.pipeline.get_stats())
+
+    @gen.coroutine
+    def get_events_data(self, param=None):  # pylint: disable=W0613
+        """ State-change events, newest first
+
+        Filtered with `?cluster=`, `?host=`, `?type=`, `?since=` and `?until=` (unix time),
+        at most `?limit=` (default 100) events.
+
+        Returns:
+            Dict with events
+        """
+        kind = self.get_argument('type', None)
+        if kind is not None and kind not in events.TYPES:
+            raise web.HTTPError(400, 'Unknown event type: {}'.format(kind))
+        result = self.application.events.query(
+            cluster=self.get_argument('cluster', None),
+            host=self.get_argument('host', None),
+            kind=kind,
+            since=self.get_float_argument('since'),
+            until=self.get_float_argument('until'),
+            limit=self.get_int_argument('limit', 100, minimum=1)
+        )
+        raise gen.Return({'events': result})
+
+    @gen.coroutine
+    def get_alerts_data(self, param=None):  # pylint: disable=W0613
+        """ Firing alerts, optionally of `?cluster=`
+
+        Returns:
+            Dict with alerts and rules
+        """
+        alerts = self.application.alerts
+        raise gen.Return({
+            'alerts': alerts.active(self.get_argument('cluster', None)),
+            'rules': [rule.name for rule in alerts.rules],
+        })
+
 
 class JsonClusterHandler(BaseHandler):
     """ Handles json request for cluster data """
@@ -74,6 +419,36 @@ class JsonHostHandler(BaseHandler):
     ACTION = 'host'
 
 
+class JsonClientsHandler(BaseHandler):
+    """ Handles json request for clients analytics """
+    ACTION = 'clients'
+
+
+class JsonSessionsHandler(BaseHandler):
+    """ Handles json request for the worst sessions """
+    ACTION = 'sessions'
+
+
+class JsonConsistencyHandler(BaseHandler):
+    """ Handles json request for consistent snapshot """
+    ACTION = 'consistency'
+
+
+class JsonPipelineHandler(BaseHandler):
+    """ Handles json request for pipeline's counters """
+    ACTION = 'pipeline'
+
+
+class JsonEventsHandler(BaseHandler):
+    """ Handles json request for state-change events """
+    ACTION = 'events'
+
+
+class JsonAlertsHandler(BaseHandler):
+    """ Handles json request for firing alerts """
+    ACTION = 'alerts'
+
+
 class HtmlClusterHandler(BaseHandler):
     """ Handles only html and sets appropriate JS param """
     ACTION = 'cluster'
@@ -90,5 +465,9 @@ class HtmlClusterHandler(BaseHandler):
 
 
 class HtmlHostHandler(HtmlClusterHandler):
-    """ Handles only html and sets appropriate JS param """
+    """ Handles only html and sets appropriate JS param
+
+    Renders the first page of clients, the rest is loaded by the page.
+    """
     ACTION = 'host'
+    CLIENTS_LIMIT = 200
@@ -0,0 +1,386 @@
+# -*- coding:utf-8 -*-
+""" Streaming pipeline of poll results
+
+Poller's records flow through stages connected with bounded queues:
+
+    poll -> enrich (derived fields ex. throughput rates) -> fan-out -> sinks (events, alerts, exporters, custom)
+
+Every stage is an async generator consuming items of its queue, run by its own task,
+so polling only puts a record into the first queue and never waits for sinks.
+Every sink has its own queue and policy applied when the queue is full:
+
+    - drop - new item is dropped (load shedding)
+    - drop_oldest - the oldest queued item is dropped, so the sink gets the freshest data
+    - block - fan-out waits (backpressure), the pipeline's input sheds its oldest items then
+
+Records are parsed by Host.poll already, enrichers and sinks get (host, record, previous)
+just as poller's listeners do. They run later than the poll, so they use the record's
+state and time only (see poller.record_state), never host's current state.
+Stages count items in/out, dropped ones, errors, queue's high watermark, time spent
+in queue and in the stage.
+
+Custom sinks are loaded from config by registered name or import path, the object
+(or factory's result, called with the rest of config) is a callable or has `write`,
+which can be a coroutine function, and optionally `close`:
+
+    pipeline:
+      sinks:
+        - {type: jsonl, path: /var/log/zk-polls.log, policy: drop_oldest, queue: 100}
+        - {type: "mypackage.sinks:Archive", policy: block, url: "http://archive/"}
+
+"""
+import asyncio
+import importlib
+import inspect
+import json
+import logging
+import time
+
+DROP = 'drop'
+DROP_OLDEST = 'drop_oldest'
+BLOCK = 'block'
+POLICIES = (DROP, DROP_OLDEST, BLOCK)
+
+QUEUE_SIZE = 1000
+
+
+class Stage(object):
+    """ Stage - async generator function between bounded queues, with counters
+
+    Attributes:
+        name (string): Stage's name
+        policy (string): What to do with item when the queue is full, see POLICIES
+        size (int): Queue's size
+    """
+
+    def __init__(self, name, func, size=QUEUE_SIZE, policy=BLOCK):
+        """
+        Args:
+            name (string): Stage's name
+            func: Async generator function (stage, items) yielding items passed to the next stage
+            size (int): Queue's size
+            policy (string): One of POLICIES
+        Raises:
+            ValueError: If policy is unknown
+        """
+        if policy not in POLICIES:
+            raise ValueError('Unknown policy: {}'.format(policy))
+        self.name = name
+        self.func = func
+        self.size = size
+        self.policy = policy
+        self.next = None
+        self.counters = {'in': 0, 'out': 0, 'dropped': 0, 'errors': 0, 'max_queue': 0, 'wait': 0.0, 'busy': 0.0}
+        self._queue = None
+        self._task = None
+        self._started = None
+        self._dequeued = None
+
+    @property
+    def queue(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.size)
+        return self._queue
+
+    def put_nowait(self, item):
+        """ Queues item without waiting, full queue sheds an item (block policy drops the oldest)
+
+        Returns:
+            True if item was queued without dropping any
+        """
+        queued = True
+        if self.queue.full():
+            self.counters['dropped'] += 1
+            if self.policy == DROP:
+                return False
+            self.queue.get_nowait()
+            queued = False
+        self._enqueue(item)
+        return queued
+
+    async def put(self, item):
+        """ Queues item according to policy - waits for space if policy is block """
+        if self.policy == BLOCK:
+            await self.queue.put((time.perf_counter(), item))
+            self._count_in()
+        else:
+            self.put_nowait(item)
+
+    def _enqueue(self, item):
+        self.queue.put_nowait((time.perf_counter(), item))
+        self._count_in()
+
+    def _count_in(self):
+        self.counters['in'] += 1
+        self.counters['max_queue'] = max(self.counters['max_queue'], self.queue.qsize())
+
+    async def items(self):
+        """ Items of the queue (async generator), marks when the item's processing starts """
+        while True:
+            queued, item = await self.queue.get()
+            self._dequeued = time.perf_counter()
+            self.counters['wait'] += self._dequeued - queued
+            yield item
+
+    async def run(self):
+        """ Runs stage's generator and passes its items to the next stage """
+        async for item in self.func(self, self.items()):
+            self.counters['out'] += 1
+            if self._dequeued is not None:
+                self.counters['busy'] += time.perf_counter() - self._dequeued
+            if self.next is not None:
+                await self.next.put(item)
+
+    def start(self):
+        if self._task is None:
+            self._started = time.time()
+            self._task = asyncio.ensure_future(self.run())
+
+    def stop(self):
+        """ Cancels stage's task, queued items are discarded (so producers blocked on full queue go on) """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        while self._queue is not None and not self._queue.empty():
+            self._queue.get_nowait()
+
+    def get_stats(self):
+        """ Gets stage's counters
+
+        Returns:
+            Dict of in, out, dropped, errors, queue (current size), max_queue, policy,
+            rate (items out per second), wait_avg and latency_avg (seconds in queue and in stage)
+        """
+        counters = self.counters
+        elapsed = time.time() - self._started if self._started else 0
+        return {
+            'in': counters['in'],
+            'out': counters['out'],
+            'dropped': counters['dropped'],
+            'errors': counters['errors'],
+            'queue': self._queue.qsize() if self._queue is not None else 0,
+            'max_queue': counters['max_queue'],
+            'policy': self.policy,
+            'rate': counters['out'] / elapsed if elapsed > 0 else None,
+            'wait_avg': counters['wait'] / counters['out'] if counters['out'] else None,
+            'latency_avg': counters['busy'] / counters['out'] if counters['out'] else None,
+        }
+
+
+def call(stage, func, item):
+    """ Calls func(host, record, previous), failures are logged and counted in stage's errors
+
+    Returns:
+        Func's result, None if it failed
+    """
+    try:
+        return func(*item)
+    except Exception as exception:
+        stage.counters['errors'] += 1
+        logging.warning('Pipeline %s failed: %s', stage.name, exception)
+        return None
+
+
+def enrich(enrichers):
+    """ Enriching stage - every enricher adds derived fields to record """
+    async def stage_func(stage, items):
+        async for item in items:
+            for enricher in enrichers:
+                call(stage, enricher, item)
+            yield item
+    return stage_func
+
+
+def fan_out(sinks):
+    """ Fan-out stage - passes item to every sink's queue (waits for sinks with block policy) """
+    async def stage_func(stage, items):  # pylint: disable=W0613
+        async for item in items:
+            for sink in list(sinks):
+                await sink.put(item)
+            yield item
+    return stage_func
+
+
+def writer(write):
+    """ Sink's stage - calls write(host, record, previous), awaits it if it is a coroutine """
+    async def stage_func(stage, items):
+        async for item in items:
+            result = call(stage, write, item)
+            if inspect.isawaitable(result):
+                try:
+                    await result
+                except Exception as exception:
+                    stage.counters['errors'] += 1
+                    logging.warning('Pipeline %s failed: %s', stage.name, exception)
+            yield item
+    return stage_func
+
+
+class JsonLinesSink(object):
+    """ Appends hosts' poll records to file as JSON lines (history) """
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, host, record, previous):  # pylint: disable=W0613
+        line = dict(record, cluster=str(host.cluster))
+        line.setdefault('time', time.time())
+        line = json.dumps(line, default=str)
+        with open(self.path, 'a') as sink:
+            sink.write(line + '\n')
+
+
+class LogSink(object):
+    """ Logs summary of every poll """
+
+    def __init__(self, level='info'):
+        self.level = getattr(logging, level.upper())
+
+    def write(self, host, record, previous):  # pylint: disable=W0613
+        logging.log(self.level, 'Polled %s: ok=%s elapsed=%.3f', host, record.get('ok'), record.get('elapsed') or 0)
+
+
+SINKS = {
+    'jsonl': JsonLinesSink,
+    'log': LogSink,
+}
+
+
+def resolve(name):
+    """ Gets registered sink or imports object by path `module:attr` or `module.attr`
+
+    Raises:
+        ValueError: If object cannot be imported
+    """
+    if name in SINKS:
+        return SINKS[name]
+    module, _, attr = name.rpartition(':') if ':' in name else name.rpartition('.')
+    try:
+        return getattr(importlib.import_module(module), attr)
+    except (ImportError, AttributeError, ValueError) as exception:
+        raise ValueError('Unable to load sink {}: {}'.format(name, exception))
+
+
+def load_sink(config):
+    """ Builds sink's stage from config
+
+    Class is instantiated, function is called with the rest of config - or it is the sink
+    itself if there is no more config.
+
+    Args:
+        config (dict): type (registered name or import path), optional name, policy, queue,
+            the rest is passed to sink's factory (class or function)
+    Returns:
+        Tuple of Stage and sink object
+    Raises:
+        ValueError: If type or policy is unknown, or sink is neither callable nor has write
+    """
+    config = dict(config)
+    kind = config.pop('type', None)
+    if not kind:
+        raise ValueError('Sink type is missing')
+    name = config.pop('name', kind)
+    policy = config.pop('policy', DROP)
+    size = int(config.pop('queue', QUEUE_SIZE))
+    factory = resolve(kind)
+    sink = factory(**config) if inspect.isclass(factory) or config else factory
+    write = getattr(sink, 'write', sink)
+    if not callable(write):
+        raise ValueError('Sink {} is neither callable nor has write'.format(kind))
+    return Stage(name, writer(write), size, policy), sink
+
+
+class Pipeline(object):
+    """ Poll results' pipeline: input -> enrich -> fan-out -> sinks
+
+    Attributes:
+        enrichers (list): Functions (host, record, previous) adding derived fields to record
+    """
+
+    def __init__(self, size=QUEUE_SIZE):
+        """
+        Args:
+            size (int): Size of the queues of input and fan-out stages
+        """
+        self.enrichers = []
+        self._sinks = []
+        self._custom = []
+        self._enrich = Stage('enrich', enrich(self.enrichers), size, DROP_OLDEST)
+        self._fan_out = Stage('fan_out', fan_out(self._sinks), size, BLOCK)
+        self._enrich.next = self._fan_out
+        self._running = False
+
+    def on_poll(self, host, record, previous):
+        """ Poller's listener - queues host's record, never waits (full input drops its oldest item)
+
+        Pipeline is started with the first record.
+        """
+        if not self._running:
+            self.start()
+        self._enrich.put_nowait((host, record, previous))
+
+    def add_sink(self, name, write, size=QUEUE_SIZE, policy=BLOCK):
+        """ Adds built-in sink
+
+        Args:
+            name (string): Sink's name
+            write: Function (host, record, previous), can be a coroutine function
+            size (int): Sink's queue size
+            policy (string): One of POLICIES
+        Returns:
+            Sink's stage
+        """
+        stage = Stage(name, writer(write), size, policy)
+        self._add(stage)
+        return stage
+
+    def set_sinks(self, config=None):
+        """ Replaces custom sinks from config, previous ones are stopped and closed
+
+        Args:
+            config (list): Sinks' configs, see load_sink
+        Raises:
+            ValueError: If any of sinks is invalid (previous sinks are kept then)
+        """
+        custom = [load_sink(sink) for sink in config or ()]
+        for stage, sink in self._custom:
+            self._sinks.remove(stage)
+            stage.stop()
+            if hasattr(sink, 'close'):
+                sink.close()
+        self._custom = custom
+        for stage, _ in custom:
+            self._add(stage)
+
+    def _add(self, stage):
+        self._sinks.append(stage)
+        if self._running:
+            stage.start()
+
+    def get_sinks(self):
+        """ Gets sinks' stages """
+        return list(self._sinks)
+
+    def start(self):
+        """ Starts stages' tasks, must be called on running loop """
+        self._running = True
+        for stage in [self._enrich, self._fan_out] + self._sinks:
+            stage.start()
+
+    def stop(self):
+        """ Stops stages' tasks, queued items are discarded """
+        self._running = False
+        for stage in [self._enrich, self._fan_out] + self._sinks:
+            stage.stop()
+
+    def get_stats(self):
+        """ Gets stages' counters
+
+        Returns:
+            Dict of stage's name -> see Stage.get_stats, sinks are under `sinks`
+        """
+        return {
+            'enrich': self._enrich.get_stats(),
+            'fan_out': self._fan_out.get_stats(),
+            'sinks': dict((stage.name, stage.get_stats()) for stage in self._sinks),
+        }
@@ -0,0 +1,188 @@
+# -*- coding:utf-8 -*-
+""" Background polling of cluster's hosts
+
+Every `interval` seconds all hosts are polled concurrently (see Host.poll) and
+listeners are notified with each host's record and its state before the poll.
+
+Hosts are polled in lanes - one per DC, with DC's concurrency (see Cluster.set_lanes).
+Lanes are independent, a lane still busy with the previous poll (ex. WAN-degraded DC)
+is skipped, the others are polled on time.
+
+Every record carries host's state right after its poll (`state`, see host_state) and
+poll's unix time (`time`), so listeners running later (ex. queued in pipeline) see the
+poll's state, not the one of the following polls.
+
+Example:
+
+    poller = Poller(webmonitor.get_cluster, interval=10)
+    poller.add_listener(lambda host, record, previous: print(host, record['ok']))
+    poller.start()
+
+"""
+import asyncio
+import logging
+import time
+from tornado.ioloop import IOLoop, PeriodicCallback
+
+
+def host_state(host):
+    """ Gets host's state tracked between polls
+
+    Args:
+        host (Host): Host
+    Returns:
+        Dict of health, mode, zxid and zookeeper (version)
+    """
+    return {
+        'health': host.health,
+        'mode': host.info.get('mode'),
+        'zxid': host.info.get('zxid'),
+        'zookeeper': host.info.get('zookeeper'),
+    }
+
+
+def record_state(host, record):
+    """ Gets host's state right after the poll of record
+
+    Args:
+        host (Host): Host
+        record (dict): Poll's record
+    Returns:
+        Record's `state` (see Poller.poll_host), host's current state if record has none
+        (records not made by Poller)
+    """
+    state = record.get('state')
+    return host_state(host) if state is None else state
+
+
+class Poller(object):
+    """ Periodically polls all hosts of the cluster """
+
+    INTERVAL = 10
+    COMMANDS = ('srvr',)
+
+    def __init__(self, get_cluster, interval=INTERVAL, commands=COMMANDS, owns=None):
+        """ Create poller
+
+        Args:
+            get_cluster: Function returning current cluster (it may change on config reload)
+            interval (int, float): Seconds between polls
+            commands (list): Commands to poll, see Host.poll
+            owns: Function (cluster's name, host's name) -> bool, only owned hosts are polled,
+                None - all hosts (see sharding.Shard.owns)
+        """
+        self.get_cluster = get_cluster
+        self.interval = interval
+        self.commands = commands
+        self.owns = owns
+        self.polls = 0
+        self._listeners = []
+        self._periodic = None
+        self._running = set()
+
+    def add_listener(self, listener):
+        """ Adds listener called after every host's poll
+
+        Args:
+            listener: Function (host, record, previous) - previous is host_state before the poll
+        """
+        self._listeners.append(listener)
+
+    def is_busy(self, dc):
+        """ Checks if DC's lane is still running (ex. its previous poll, see run_lane) """
+        return dc in self._running
+
+    def start(self):
+        """ Starts polling """
+        self.stop()
+        self._periodic = PeriodicCallback(self._tick, self.interval * 1000)
+        self._periodic.start()
+
+    def stop(self):
+        """ Stops polling """
+        if self._periodic:
+            self._periodic.stop()
+            self._periodic = None
+
+    def _tick(self):
+        # not awaited, so a slow lane doesn't postpone the next tick
+        IOLoop.current().spawn_callback(self.poll)
+
+    async def poll(self):
+        """ Polls all hosts, lanes concurrently
+
+        Lanes still running since the previous poll are skipped.
+
+        Returns:
+            List of records
+        """
+        cluster = self.get_cluster()
+        if cluster is None:
+            return []
+        lanes = []
+        for dc, hosts in cluster.get_hosts_by_dc().items():
+            hosts = [host for host in hosts if self.owns is None or self.owns(str(cluster), str(host))]
+            if not hosts:
+                continue
+            if dc in self._running:
+                logging.warning('Previous poll of %s/%s is still running, skipped', cluster, dc)
+                continue
+            lanes.append(self.poll_lane(dc, hosts, cluster.get_lane(dc).get('concurrency')))
+        records = await asyncio.gather(*lanes)
+        cluster.update_leader()
+        self.polls += 1
+        return [record for lane in records for record in lane]
+
+    async def poll_lane(self, dc, hosts, concurrency=None):
+        """ Polls DC's hosts
+
+        Args:
+            dc (string): DC's name
+            hosts (list): DC's hosts
+            concurrency (int): Max hosts polled at once, None - all
+        Returns:
+            List of records
+        """
+        return await self.run_lane(dc, hosts, self.poll_host, concurrency)
+
+    async def run_lane(self, dc, hosts, func, concurrency=None):
+        """ Runs func of DC's hosts in DC's lane, lane is busy until all are done
+
+        Args:
+            dc (string): DC's name
+            hosts (list): DC's hosts
+            func: Coroutine function (host)
+            concurrency (int): Max hosts at once, None - all
+        Returns:
+            List of func's results, in order of hosts
+        """
+        self._running.add(dc)
+        try:
+            if not concurrency:
+                return await asyncio.gather(*[func(host) for host in hosts])
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def run(host):
+                async with semaphore:
+                    return await func(host)
+
+            return await asyncio.gather(*[run(host) for host in hosts])
+        finally:
+            self._running.discard(dc)
+
+    async def poll_host(self, host):
+        """ Polls host and notifies listeners
+
+        Returns:
+            Poll's record with host's `state` after the poll and poll's unix `time`
+        """
+        previous = host_state(host)
+        record = await host.poll_async(self.commands)
+        record['state'] = host_state(host)
+        record['time'] = time.time()
+        for listener in self._listeners:
+            try:
+                listener(host, record, previous)
+            except Exception as exception:
+                logging.warning('Poll listener %s failed: %s', listener, exception)
+        return record
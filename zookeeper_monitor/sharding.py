@@ -0,0 +1,96 @@
+# -*- coding:utf-8 -*-
+""" Sharding of hosts across monitor instances
+
+Every instance gets the same static list of peers (base URLs, including itself)
+and owns a consistent-hash slice of all (cluster, host) pairs - it polls only those.
+Adding or removing a peer moves only ~1/N of the hosts.
+
+Example:
+
+    shard = Shard('http://10.0.0.1:8080', ['http://10.0.0.1:8080', 'http://10.0.0.2:8080'])
+    shard.owns('prod', '10.1.15.1:2181')
+    shard.owner('prod', '10.1.15.1:2181')  # peer's URL
+
+"""
+import hashlib
+from bisect import bisect
+
+
+def _hash(key):
+    return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16)
+
+
+class HashRing(object):
+    """ Consistent hash ring with virtual nodes """
+
+    REPLICAS = 128
+
+    def __init__(self, nodes, replicas=REPLICAS):
+        """ Create ring
+
+        Args:
+            nodes (list): Names of nodes
+            replicas (int): Number of virtual nodes per node
+        """
+        self.nodes = sorted(set(nodes))
+        points = sorted(
+            (_hash('{}#{}'.format(node, replica)), node) for node in self.nodes for replica in range(replicas)
+        )
+        self._keys = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def get(self, key):
+        """ Gets node owning the key
+
+        Args:
+            key (string): Key
+        Returns:
+            Node's name, None if ring is empty
+        """
+        if not self._keys:
+            return None
+        return self._nodes[bisect(self._keys, _hash(key)) % len(self._keys)]
+
+
+class Shard(object):
+    """ Slice of hosts owned by this instance """
+
+    def __init__(self, name, peers, replicas=HashRing.REPLICAS):
+        """ Create shard
+
+        Args:
+            name (string): This instance's URL, has to be one of peers
+            peers (list): URLs of all instances ex. http://10.0.0.1:8080
+            replicas (int): Number of virtual nodes per peer
+        Raises:
+            ValueError: If name is not in peers
+        """
+        self.name = name.rstrip('/')
+        self.peers = sorted(set(peer.rstrip('/') for peer in peers))
+        if self.name not in self.peers:
+            raise ValueError('Instance {} is not in peers {}'.format(self.name, self.peers))
+        self.ring = HashRing(self.peers, replicas)
+
+    @staticmethod
+    def key(cluster, host):
+        """ Ring's key of host """
+        return '{}/{}'.format(cluster, host)
+
+    def owner(self, cluster, host):
+        """ Gets URL of instance owning host
+
+        Args:
+            cluster (string): Cluster's name
+            host (string): Host's name ex. 10.1.15.1:2181
+        Returns:
+            Peer's URL
+        """
+        return self.ring.get(self.key(cluster, host))
+
+    def owns(self, cluster, host):
+        """ Checks if host is owned by this instance """
+        return self.owner(cluster, host) == self.name
+
+    def remotes(self):
+        """ Gets other instances' URLs """
+        return [peer for peer in self.peers if peer != self.name]
@@ -0,0 +1,138 @@
+# -*- coding:utf-8 -*-
+""" Last known state persisted between restarts
+
+Snapshot holds hosts' state (health, info, timings) and recorded events.
+It is a compact binary file - header (magic, format version) followed by zlib compressed
+marshal of the state - written to a temporary file and atomically renamed over the previous one,
+so a crash never leaves a partial snapshot.
+
+Snapshot is trusted input (written by the monitor itself), it must not be loaded from untrusted sources.
+
+Example:
+
+    snapshot.dump('/var/lib/zk-monitor/snapshot', snapshot.capture(cluster, events))
+    restored = snapshot.restore(snapshot.load('/var/lib/zk-monitor/snapshot'), cluster, events)
+
+"""
+import marshal
+import os
+import struct
+import time
+import zlib
+
+MAGIC = b'ZKMS'
+VERSION = 1
+HEADER = struct.Struct('!4sH')
+HOST_STATE = ('health', 'info', 'timings')
+
+
+class SnapshotError(ValueError):
+    """ Snapshot is corrupted or of unsupported version """
+
+
+def capture(cluster, events=None):
+    """ Gets state to persist
+
+    Args:
+        cluster (Cluster): Cluster
+        events (EventLog): Event log, None - events are not persisted
+    Returns:
+        Dict of time, cluster's name, hosts' state and events
+    """
+    return {
+        'time': time.time(),
+        'cluster': str(cluster),
+        'hosts': dict(
+            (str(host), dict((key, getattr(host, key)) for key in HOST_STATE)) for host in cluster.get_hosts()
+        ),
+        'events': list(events.events) if events is not None else [],
+        'leaders': dict(events._leaders) if events is not None else {},
+    }
+
+
+def restore(state, cluster, events=None):
+    """ Applies persisted state
+
+    Only hosts still in the cluster are restored, snapshot of other cluster is ignored.
+    Events are restored into empty event log only.
+
+    Args:
+        state (dict): Captured state, see capture
+        cluster (Cluster): Cluster
+        events (EventLog): Event log
+    Returns:
+        List of restored hosts
+    """
+    if state.get('cluster') != str(cluster):
+        return []
+    restored = []
+    for host in cluster.get_hosts():
+        host_state = state['hosts'].get(str(host))
+        if host_state is None:
+            continue
+        for key in HOST_STATE:
+            setattr(host, key, host_state[key])
+        restored.append(host)
+    cluster.update_leader()
+    if events is not None and not events.events:
+        events.events.extend(state.get('events', ()))
+        events._leaders.update(state.get('leaders', {}))
+    return restored
+
+
+def dumps(state):
+    """ Serializes state
+
+    Raises:
+        ValueError: If state contains not serializable value
+    """
+    return HEADER.pack(MAGIC, VERSION) + zlib.compress(marshal.dumps(state))
+
+
+def loads(data):
+    """ Deserializes state
+
+    Raises:
+        SnapshotError: If data is corrupted or of other format version
+    """
+    if len(data) < HEADER.size:
+        raise SnapshotError('Snapshot too short')
+    magic, version = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SnapshotError('Not a snapshot')
+    if version != VERSION:
+        raise SnapshotError('Unsupported snapshot version: {}'.format(version))
+    try:
+        return marshal.loads(zlib.decompress(data[HEADER.size:]))
+    except (zlib.error, EOFError, ValueError, TypeError) as exception:
+        raise SnapshotError('Corrupted snapshot: {}'.format(exception))
+
+
+def dump(path, state):
+    """ Writes state atomically - to a temporary file renamed over path
+
+    Returns:
+        Size of snapshot in bytes
+    Raises:
+        ValueError: If state contains not serializable value
+        OSError: If file cannot be written
+    """
+    data = dumps(state)
+    tmp = '{}.tmp'.format(path)
+    with open(tmp, 'wb') as sink:
+        sink.write(data)
+        sink.flush()
+        os.fsync(sink.fileno())
+    os.replace(tmp, path)
+    return len(data)
+
+
+def load(path):
+    """ Reads state
+
+    Raises:
+        SnapshotError: If snapshot is corrupted or of other format version
+        OSError: If file cannot be read
+    """
+    with open(path, 'rb') as source:
+        return loads(source.read())
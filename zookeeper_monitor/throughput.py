@@ -0,0 +1,234 @@
+# -*- coding:utf-8 -*-
+""" Write throughput estimated from zxid
+
+Zxid grows with every write transaction, so zxid delta per second of the leader is
+cluster's write throughput. Rates are exponentially weighted moving averages weighted
+by time (a sample's weight depends on time since the previous one, not on polling
+interval), updated in O(1) per poll from the last sample only - no history is kept.
+
+Leader election starts new epoch (high 32 bits of zxid) with counter reset to 0,
+writes in the new epoch are counted from 0 (writes of the old epoch after the last
+sample are unknown). Samples older than the last one (lagging host reported as leader,
+out of order polls) are ignored.
+
+Followers get their own apply rate, lag behind leader's last zxid (in transactions
+and in seconds of writes) and lag's rate - positive when falling behind.
+
+Example:
+
+    throughput = ThroughputEstimator(tau=60)
+    poller.add_listener(throughput.on_poll)
+    throughput.get('prod')  # {'rate': 1520.3, 'epoch': 5, ...}
+
+"""
+import math
+import time
+from .zk import Host
+from .poller import host_state, record_state
+
+TAU = 60
+""" Default time constant (seconds) of moving averages """
+
+
+class Ewma(object):
+    """ Time-weighted exponentially moving average """
+
+    __slots__ = ('tau', 'value')
+
+    def __init__(self, tau=TAU):
+        self.tau = tau
+        self.value = None
+
+    def update(self, sample, elapsed):
+        """ Adds sample observed over `elapsed` seconds
+
+        Returns:
+            Current average
+        """
+        if self.value is None:
+            self.value = float(sample)
+        else:
+            self.value += (1 - math.exp(-elapsed / float(self.tau))) * (sample - self.value)
+        return self.value
+
+
+class ZxidRate(object):
+    """ Transactions per second of zxid samples
+
+    Attributes:
+        epoch (int): Last sample's epoch
+        counter (int): Last sample's counter
+        time (float): Last sample's time
+        rollovers (int): Number of observed epoch changes
+    """
+
+    __slots__ = ('rate', 'epoch', 'counter', 'time', 'rollovers')
+
+    def __init__(self, tau=TAU):
+        self.rate = Ewma(tau)
+        self.epoch = None
+        self.counter = None
+        self.time = None
+        self.rollovers = 0
+
+    @property
+    def zxid(self):
+        return None if self.epoch is None else self.epoch << 32 | self.counter
+
+    def update(self, zxid, now):
+        """ Adds zxid sample
+
+        Args:
+            zxid (int): Zxid
+            now (float): Sample's time
+        Returns:
+            True if sample was accepted, False if it is older than the last one
+        """
+        epoch, counter = zxid >> 32, zxid & 0xffffffff
+        if self.time is not None:
+            elapsed = now - self.time
+            if elapsed <= 0 or epoch < self.epoch or (epoch == self.epoch and counter < self.counter):
+                return False
+            if epoch > self.epoch:
+                self.rollovers += 1
+                delta = counter
+            else:
+                delta = counter - self.counter
+            self.rate.update(delta / elapsed, elapsed)
+        self.epoch, self.counter, self.time = epoch, counter, now
+        return True
+
+    def get(self):
+        """ Gets rate in transactions per second, None until two samples are seen """
+        return self.rate.value
+
+
+class HostRate(object):
+    """ Host's apply rate and lag behind leader """
+
+    __slots__ = ('zxid', 'lag', 'lag_rate', 'lag_time')
+
+    def __init__(self, tau=TAU):
+        self.zxid = ZxidRate(tau)
+        self.lag = None
+        self.lag_rate = Ewma(tau)
+        self.lag_time = None
+
+    def update_lag(self, lag, now):
+        """ Sets lag (transactions behind leader), None if unknown """
+        if lag is not None and self.lag is not None and self.lag_time is not None and now > self.lag_time:
+            self.lag_rate.update((lag - self.lag) / (now - self.lag_time), now - self.lag_time)
+        self.lag = lag
+        self.lag_time = now if lag is not None else None
+
+
+class ClusterRate(object):
+    """ Cluster's write rate (leader's zxid) and its hosts' rates """
+
+    __slots__ = ('zxid', 'leader', 'hosts')
+
+    def __init__(self, tau=TAU):
+        self.zxid = ZxidRate(tau)
+        self.leader = None
+        self.hosts = {}
+
+
+class ThroughputEstimator(object):
+    """ Per cluster write throughput and per host sync lag """
+
+    def __init__(self, tau=TAU):
+        """ Create estimator
+
+        Args:
+            tau (int, float): Time constant of moving averages in seconds, the higher the smoother
+        """
+        self.tau = tau
+        self._clusters = {}
+
+    def on_poll(self, host, record, previous):  # pylint: disable=W0613
+        """ Poller's listener - updates rates and stores host's ones in record's `rates`
+
+        Sample is record's state (see poller.record_state) at poll's time.
+        """
+        if record.get('info'):
+            record['rates'] = self.update(host, record.get('time'), record_state(host, record))
+        return record.get('rates')
+
+    def update(self, host, now=None, state=None):
+        """ Adds host's zxid sample
+
+        Only healthy hosts with known zxid are sampled.
+
+        Args:
+            host (Host): Host
+            now (float): Sample's time, default now
+            state (dict): Host's health, mode and zxid (see poller.host_state), default
+                host's current state (fresh info after srvr or stat)
+        Returns:
+            Dict of host's rates, see get_host
+        """
+        state = host_state(host) if state is None else state
+        zxid = state['zxid']
+        name = str(host)
+        cluster = self._clusters.get(str(host.cluster))
+        if cluster is None:
+            cluster = self._clusters[str(host.cluster)] = ClusterRate(self.tau)
+        if state['health'] != Host.HOST_HEALTHY or not isinstance(zxid, int):
+            return self.get_host(str(host.cluster), name)
+        now = time.time() if now is None else now
+        rate = cluster.hosts.get(name)
+        if rate is None:
+            rate = cluster.hosts[name] = HostRate(self.tau)
+        rate.zxid.update(zxid, now)
+        if state['mode'] == Host.LEADER:
+            if cluster.zxid.update(zxid, now):
+                cluster.leader = name
+            rate.update_lag(0, now)
+        elif cluster.zxid.epoch is not None and zxid >> 32 == cluster.zxid.epoch:
+            rate.update_lag(max(cluster.zxid.counter - (zxid & 0xffffffff), 0), now)
+        else:
+            rate.update_lag(None, now)
+        return self.get_host(str(host.cluster), name)
+
+    def get(self, cluster):
+        """ Gets cluster's write throughput
+
+        Returns:
+            Dict of rate (transactions per second, None if not known yet), leader, zxid, epoch
+            and rollovers (number of observed epoch changes)
+        """
+        state = self._clusters.get(str(cluster))
+        if state is None:
+            return {'rate': None, 'leader': None, 'zxid': None, 'epoch': None, 'rollovers': 0}
+        return {
+            'rate': state.zxid.get(),
+            'leader': state.leader,
+            'zxid': state.zxid.zxid,
+            'epoch': state.zxid.epoch,
+            'rollovers': state.zxid.rollovers,
+        }
+
+    def get_host(self, cluster, host):
+        """ Gets host's rates, unknown ones are skipped
+
+        Returns:
+            Dict of:
+                - zxid_rate - transactions applied per second
+                - write_rate - cluster's write rate
+                - zxid_lag - transactions behind leader's last zxid
+                - zxid_lag_rate - lag's change per second, positive when falling behind
+                - zxid_lag_time - lag in seconds of cluster's writes
+        """
+        state = self._clusters.get(str(cluster))
+        rate = state.hosts.get(str(host)) if state is not None else None
+        if rate is None:
+            return {}
+        write_rate = state.zxid.get()
+        rates = {
+            'zxid_rate': rate.zxid.get(),
+            'write_rate': write_rate,
+            'zxid_lag': rate.lag,
+            'zxid_lag_rate': rate.lag_rate.value if rate.lag is not None else None,
+            'zxid_lag_time': rate.lag / write_rate if rate.lag is not None and write_rate else None,
+        }
+        return dict((key, value) for key, value in rates.items() if value is not None)
@@ -6,10 +6,22 @@ import argparse
 import logging
 import os
 import signal
+import time
 import tornado.web
-from tornado.ioloop import IOLoop
+from tornado.ioloop import IOLoop, PeriodicCallback
 from .handlers import HtmlHostHandler, HtmlClusterHandler, JsonClusterHandler, JsonHostHandler
+from .handlers import JsonAlertsHandler, JsonClientsHandler, JsonEventsHandler, JsonSessionsHandler
+from .handlers import JsonConsistencyHandler, JsonPipelineHandler
+from . import snapshot
+from .alerts import AlertEngine, build_sink
+from .events import EventLog
+from .exporters import build_exporter
+from .pipeline import Pipeline
+from .throughput import ThroughputEstimator
+from .poller import Poller
+from .sharding import Shard
 from .zk import Cluster
+from .zk.limits import limiter
 from .version import __app__, __version__
 
 
@@ -36,15 +48,46 @@ class App(object):
                             help='Port to listen on. Default 8080.')
         parser.add_argument('--config', '-c', action='store', dest='config',
                             help='Config file contaning clusters to view. If not provided, localhost will be used.')
+        parser.add_argument('-w', '--watch', action='store', dest='watch', default=0, type=float,
+                            help='Reload config file when it changes, checked every WATCH seconds. '
+                                 'Default 0 - disabled, SIGHUP reloads it anyway.')
+        parser.add_argument('--max-connections', action='store', dest='max_connections', default=256, type=int,
+                            help='Max number of simultaneous connections to zookeepers. Default 256, 0 - unlimited.')
+        parser.add_argument('--poll-interval', action='store', dest='poll_interval', default=10, type=float,
+                            help='Poll hosts in background every POLL_INTERVAL seconds. Default 10, 0 - disabled.')
+        parser.add_argument('--events-size', action='store', dest='events_size', default=10000, type=int,
+                            help='Number of state-change events kept in memory. Default 10000.')
+        parser.add_argument('--events-file', action='store', dest='events_file',
+                            help='File state-change events are appended to (JSON lines).')
+        parser.add_argument('--peers', action='store', dest='peers',
+                            help='Comma separated URLs of all monitor instances (including this one), '
+                                 'hosts are sharded across them.')
+        parser.add_argument('--url', action='store', dest='url',
+                            help='URL of this instance in peers. Default http://IP:PORT')
+        parser.add_argument('--snapshot', action='store', dest='snapshot',
+                            help='File last known state is saved to and loaded from on start (warm start).')
+        parser.add_argument('--snapshot-interval', action='store', dest='snapshot_interval', default=60, type=float,
+                            help='Save snapshot every SNAPSHOT_INTERVAL seconds. Default 60.')
         parser.add_argument('-v', '--version', action='version', version='{} {}'.format(__app__, __version__))
         self.args = parser.parse_args()
+        limiter.set_max_connections(self.args.max_connections or None)
+        self.webmonitor.set_events(self.args.events_size, self.args.events_file)
+        if self.args.peers:
+            url = self.args.url or 'http://{}:{}'.format(self.args.ip, self.args.port)
+            self.webmonitor.set_peers(url, self.args.peers.split(','))
 
         if self.args.config:
             logging.info('Using config file: %s', self.args.config)
             self.webmonitor.load_config_from_file(self.args.config)
+            if self.args.watch:
+                self.webmonitor.watch_config(self.args.watch)
         else:
             logging.info('Connecting to localhost:2181')
             self.webmonitor.set_cluster({'name': 'default', 'hosts': [{'addr': 'localhost', 'port': 2181}]})
+        if self.args.snapshot:
+            self.webmonitor.set_snapshot(self.args.snapshot, self.args.snapshot_interval)
+        if self.args.poll_interval:
+            self.webmonitor.start_polling(self.args.poll_interval)
 
     def start_server(self):
         """ Starts Tornado server """
@@ -54,11 +97,23 @@ class App(object):
             signal.SIGINT,
             lambda sig, frame: self.ioloop.instance().add_callback_from_signal(self.on_shutdown)
         )
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(
+                signal.SIGHUP,
+                lambda sig, frame: self.ioloop.instance().add_callback_from_signal(self.on_reload)
+            )
         self.ioloop.instance().start()
 
+    def on_reload(self):
+        """ SIGHUP handler - reloads config file """
+        if self.args.config:
+            logging.info('Reloading config file: %s', self.args.config)
+            self.webmonitor.reload_config()
+
     def on_shutdown(self):
         """ SIGINT handler - proper way to stop """
         print('Shutting down')
+        self.webmonitor.save_snapshot()
         self.ioloop.instance().stop()
 
 
@@ -73,6 +128,12 @@ class WebMonitor(tornado.web.Application):
         handlers = [
             (r'/(favicon.png)', tornado.web.StaticFileHandler, {'path': self._get_path('static')}),
             (r'/cluster\.json', JsonClusterHandler),
+            (r'/events\.json', JsonEventsHandler),
+            (r'/alerts\.json', JsonAlertsHandler),
+            (r'/pipeline\.json', JsonPipelineHandler),
+            (r'/cluster/clients/(?P<param>[^\/]+)\.json', JsonClientsHandler),
+            (r'/cluster/sessions\.json', JsonSessionsHandler),
+            (r'/cluster/consistency\.json', JsonConsistencyHandler),
             (r'/cluster/host/(?P<param>[^\/]+)\.json', JsonHostHandler),
             (r'/cluster/host/(?P<param>[^\/]+)', HtmlHostHandler),
             (r'/cluster', HtmlClusterHandler),
@@ -80,6 +141,25 @@ class WebMonitor(tornado.web.Application):
         ]
 
         self._cluster = None
+        self._config_file = None
+        self._config_format = None
+        self._config_mtime = None
+        self._config_watcher = None
+        self.events = EventLog()
+        self.alerts = AlertEngine()
+        self.exporters = []
+        self.throughput = ThroughputEstimator()
+        self.stale = set()
+        self._snapshot = None
+        self._snapshot_writer = None
+        self.shard = None
+        self.pipeline = Pipeline()
+        self.pipeline.enrichers.append(self.throughput.on_poll)
+        self.pipeline.add_sink('events', self.events_on_poll)
+        self.pipeline.add_sink('alerts', self.alerts_on_poll)
+        self.pipeline.add_sink('exporters', self.export)
+        self.poller = Poller(self.get_cluster)
+        self.poller.add_listener(self.on_poll)
         tornado.web.Application.__init__(
             self, handlers, debug=True,
             static_path=self._get_path('static'),
@@ -97,8 +177,55 @@ class WebMonitor(tornado.web.Application):
             config_file: Config's filename to be loaded
             f: Force config format ex. yaml, json
         """
+        self._config_mtime = self._get_config_mtime(config_file)
         data = anyconfig.load(config_file, force_format)
+        self.set_alerts(data.get('alerts'))
+        self.set_exporters(data.get('exporters'))
+        self.set_pipeline(data.get('pipeline'))
         self.set_cluster(data)
+        self._config_file = config_file
+        self._config_format = force_format
+
+    def reload_config(self):
+        """ Reloads previously loaded config file
+
+        Invalid config is logged and ignored, so the monitor keeps the current cluster.
+
+        Returns:
+            True if config has been reloaded, otherwise False
+        """
+        if not self._config_file:
+            return False
+        try:
+            self.load_config_from_file(self._config_file, self._config_format)
+        except Exception as exception:
+            logging.warning('Unable to reload config %s: %s', self._config_file, exception)
+            return False
+        return True
+
+    def watch_config(self, interval):
+        """ Reloads config file whenever its modification time changes
+
+        Args:
+            interval (int, float): How often (in seconds) the file is checked
+        """
+        if self._config_watcher:
+            self._config_watcher.stop()
+        self._config_watcher = PeriodicCallback(self._check_config, interval * 1000)
+        self._config_watcher.start()
+
+    def _check_config(self):
+        """ Reloads config file if it has been modified since last load """
+        mtime = self._get_config_mtime(self._config_file)
+        if mtime is not None and mtime != self._config_mtime:
+            self.reload_config()
+
+    @staticmethod
+    def _get_config_mtime(config_file):
+        try:
+            return os.stat(config_file).st_mtime
+        except (OSError, TypeError):
+            return None
 
     def set_cluster(self, data):
         """ Sets cluster and its hosts
@@ -116,11 +243,245 @@ class WebMonitor(tornado.web.Application):
                        {"addr": "10.1.12.3", "port": 2181, "dc":"eu-west"}
                     ]
                 }
+
+            If the cluster with the same name is already set, only the difference
+            in hosts is applied - unchanged hosts keep their state and are not re-polled.
+
+            Commands sent to the cluster can be rate limited with `rate` (per second)
+            and `burst`.
+
+            Each DC is polled in its own lane, `dcs` sets lane's hosts timeout and
+            max concurrently polled hosts, ex. {"us-east": {"timeout": 10, "concurrency": 4}}
+
+            Commands are sent over TLS (secure client port) when `tls` is set,
+            ex. {"ca": "/etc/zookeeper/ca.pem", "cert": "client.pem", "key": "client.key"}
+
+            With `backend` {"type": "admin", "port": 8080} srvr, stat, mntr, cons and ruok
+            are sent to AdminServer (Zookeeper 3.5+) over pooled keep-alive connections.
+
+            Instead of `hosts`, `seeds` can be given - hosts are then discovered from
+            seeds' `conf` (Zookeeper 3.5+) every `discovery_interval` seconds.
+        """
+        seeds = data.get('seeds')
+        if self._cluster is not None and self._cluster.name == data['name']:
+            cluster = self._cluster
+            if not seeds:
+                cluster.stop_discovery()
+                cluster.set_seeds([])
+                added, removed = cluster.sync_hosts(data['hosts'])
+                for host in added:
+                    logging.info('Host added: %s', host)
+                for host in removed:
+                    logging.info('Host removed: %s', host)
+        else:
+            if self._cluster is not None:
+                self._cluster.stop_discovery()
+                self.alerts.prune(self._cluster.name)
+            cluster = Cluster(data['name'])
+            for host in data.get('hosts') or seeds:
+                cluster.add_host(**host)
+            cluster.add_removal_listener(self.on_hosts_removed)
+            self._cluster = cluster
+        cluster.set_lanes(data.get('dcs'))
+        cluster.set_tls(data.get('tls'))
+        cluster.set_backend(data.get('backend'))
+        limiter.set_rate(cluster.name, data.get('rate'), data.get('burst'))
+        if seeds:
+            cluster.set_seeds(seeds)
+            cluster.start_discovery(data.get('discovery_interval'))
+            IOLoop.current().add_callback(cluster.discover)
+
+    def set_events(self, size=EventLog.SIZE, path=None):
+        """ Replaces event log
+
+        Args:
+            size (int): Max number of events kept in memory
+            path (string): File events are appended to, None - disabled
+        """
+        self.events = EventLog(size, path)
+
+    def set_alerts(self, config=None):
+        """ Sets alert rules and sinks
+
+        Rules are evaluated on every background poll, when any of them uses mntr's metric (zk_*)
+        mntr is polled as well.
+
+        Args:
+            config (dict): Alerts' config
+
+              Example:
+
+                {
+                    "rules": [
+                        {"name": "latency", "expr": "zk_avg_latency > 50 for 2m", "clear": "zk_avg_latency < 40"},
+                        "health != OK for 30s"
+                    ],
+                    "sinks": [{"type": "webhook", "url": "http://alertmanager/hook"}]
+                }
+        Raises:
+            RuleSyntaxError: If any of rules is invalid
+            ValueError: If sink is unknown
+        """
+        config = config or {}
+        rules = AlertEngine.compile(config.get('rules'))
+        sinks = [build_sink(sink) for sink in config.get('sinks') or ()]
+        self.alerts.set_rules(rules)
+        self.alerts.sinks = sinks
+        self._set_poll_commands()
+
+    def set_exporters(self, config=None):
+        """ Sets exporters pushing metrics of every background poll, previous ones are closed
+
+        With any exporter mntr is polled as well.
+
+        Args:
+            config (list): Exporters' config
+
+              Example:
+
+                [
+                    {"type": "statsd", "host": "127.0.0.1", "port": 8125, "prefix": "zookeeper"},
+                    {"type": "graphite", "host": "graphite.local", "port": 2003}
+                ]
+        Raises:
+            ValueError: If exporter is unknown
+        """
+        exporters = [build_exporter(exporter) for exporter in config or ()]
+        for exporter in self.exporters:
+            exporter.close()
+        self.exporters = exporters
+        self._set_poll_commands()
+
+    def set_pipeline(self, config=None):
+        """ Sets custom sinks of poll results' pipeline, previous ones are closed
+
+        Args:
+            config (dict): Pipeline's config with `sinks` list
+
+              Example:
+
+                {"sinks": [
+                    {"type": "jsonl", "path": "/var/log/zk-polls.log", "policy": "drop_oldest", "queue": 100},
+                    {"type": "mypackage.sinks:Archive", "policy": "block"}
+                ]}
+        Raises:
+            ValueError: If sink or its policy is unknown
+        """
+        self.pipeline.set_sinks((config or {}).get('sinks'))
+
+    def _set_poll_commands(self):
+        commands = tuple(Poller.COMMANDS)
+        if self.exporters or any(rule.trigger.metric.startswith('zk_') for rule in self.alerts.rules):
+            commands += ('mntr',)
+        self.poller.commands = commands
+
+    def set_peers(self, url, peers):
+        """ Shards hosts across monitor instances
+
+        This instance polls only hosts it owns, data of others is fetched from peers.
+
+        Args:
+            url (string): This instance's URL
+            peers (list): URLs of all instances, empty - sharding disabled
+        Raises:
+            ValueError: If url is not in peers
         """
-        cluster = Cluster(data['name'])
-        for host in data['hosts']:
-            cluster.add_host(**host)
-        self._cluster = cluster
+        self.shard = Shard(url, peers) if peers else None
+        self.poller.owns = self.shard.owns if self.shard else None
+
+    def owns(self, host):
+        """ Checks if host is polled by this instance
+
+        Args:
+            host (Host): Host
+        Returns:
+            True if not sharded or host is in this instance's slice
+        """
+        return self.shard is None or self.shard.owns(str(host.cluster), str(host))
+
+    def start_polling(self, interval=Poller.INTERVAL):
+        """ Starts polling hosts in background
+
+        Args:
+            interval (int, float): Seconds between polls
+        """
+        self.poller.interval = interval
+        self.poller.start()
+
+    def set_snapshot(self, path, interval=60):
+        """ Loads last known state from snapshot (if it exists) and saves it periodically
+
+        Restored hosts are served immediately, marked stale until they are polled,
+        the first poll starts right away.
+
+        Args:
+            path (string): Snapshot's file
+            interval (int, float): Seconds between saves, 0 - only on shutdown
+        """
+        self._snapshot = path
+        if self._snapshot_writer:
+            self._snapshot_writer.stop()
+            self._snapshot_writer = None
+        if os.path.exists(path) and self.load_snapshot(path):
+            IOLoop.current().add_callback(self.poller.poll)
+        if interval:
+            self._snapshot_writer = PeriodicCallback(self.save_snapshot, interval * 1000)
+            self._snapshot_writer.start()
+
+    def load_snapshot(self, path):
+        """ Restores hosts' state and events from snapshot
+
+        Returns:
+            List of restored hosts, empty if snapshot is invalid or of other cluster
+        """
+        if self._cluster is None:
+            return []
+        start = time.time()
+        try:
+            state = snapshot.load(path)
+        except (OSError, ValueError) as exception:
+            logging.warning('Unable to load snapshot %s: %s', path, exception)
+            return []
+        restored = snapshot.restore(state, self._cluster, self.events)
+        self.stale.update(str(host) for host in restored)
+        logging.info('Snapshot %s (taken %.0fs ago) restored %s hosts in %.1fms',
+                     path, time.time() - state.get('time', 0), len(restored), (time.time() - start) * 1000)
+        return restored
+
+    def save_snapshot(self):
+        """ Saves hosts' state and events to snapshot (if set) """
+        if not self._snapshot or self._cluster is None:
+            return
+        try:
+            snapshot.dump(self._snapshot, snapshot.capture(self._cluster, self.events))
+        except (OSError, ValueError) as exception:
+            logging.warning('Unable to save snapshot %s: %s', self._snapshot, exception)
+
+    def on_poll(self, host, record, previous):
+        """ Poller's listener - host is not stale anymore, record goes to pipeline
+
+        Pipeline estimates write throughput, then records host's state changes, evaluates
+        alerts and exports metrics (throughput's rates included) and feeds custom sinks.
+        """
+        self.stale.discard(str(host))
+        self.pipeline.on_poll(host, record, previous)
+
+    def on_hosts_removed(self, cluster, removed):  # pylint: disable=W0613
+        """ Cluster's removal listener - drops alerts' state of removed hosts (reload, discovery) """
+        self.alerts.prune(cluster.name, [str(host) for host in cluster.get_hosts()])
+
+    def events_on_poll(self, host, record, previous):
+        """ Pipeline's sink - records host's state changes (event log can be replaced, see set_events) """
+        self.events.on_poll(host, record, previous)
+
+    def alerts_on_poll(self, host, record, previous):
+        """ Pipeline's sink - evaluates alerts """
+        self.alerts.on_poll(host, record, previous)
+
+    def export(self, host, record, previous):
+        """ Pipeline's sink - pushes metrics to exporters """
+        for exporter in self.exporters:
+            exporter.on_poll(host, record, previous)
 
     def get_cluster(self):
         """ Gets cluster """
@@ -1,11 +1,15 @@
 # -*- coding:utf-8 -*-
 """
 Module provides zookeeper abstraction
+
+It depends only on asyncio and tornado's core (gen, ioloop), so the package is cheap
+to import in short-lived scripts.
 """
 from .host import Host
 from .cluster import Cluster
 from .exceptions import HostBaseError, HostConnectionTimeout, HostSetTimeoutTypeError
-from .exceptions import HostSetTimeoutValueError, HostInvalidInfo, ZkBaseError
+from .exceptions import HostSetTimeoutValueError, HostInvalidInfo, HostUnknownCommandError, ZkBaseError
+from .exceptions import HostResponseTooLarge, HostQueueTimeout
 from .exceptions import ClusterHostAddError, ClusterHostDuplicateError, ClusterHostCreateError
 
 
@@ -18,6 +22,9 @@ __all__ = [
     'HostSetTimeoutTypeError',
     'HostSetTimeoutValueError',
     'HostInvalidInfo',
+    'HostUnknownCommandError',
+    'HostResponseTooLarge',
+    'HostQueueTimeout',
     'ClusterHostAddError',
     'ClusterHostDuplicateError',
     'ClusterHostCreateError'
@@ -0,0 +1,331 @@
+# -*- coding:utf-8 -*-
+""" AdminServer backend (Zookeeper 3.5+) - commands as JSON over HTTP
+
+AdminServer (`admin.serverPort`, default 8080) serves commands at `/commands/<name>`,
+it doesn't need 4lw whitelist and its connections can be kept alive. Backend holds
+a pool of keep-alive HTTP/1.1 connections per server, so polls reuse connections instead
+of opening one per command. Responses are mapped to the same parsed structures as
+their 4lw counterparts (srvr, stat, mntr, cons, ruok).
+
+Example:
+
+    backend = AdminBackend(port=8080)
+    host.set_backend(backend)
+    result = await host.mntr_async()
+
+"""
+import asyncio
+import json
+from .exceptions import HostInvalidInfo, HostResponseTooLarge
+from . import schema, sessions, transport
+
+COMMANDS = {
+    'srvr': 'server_stats',
+    'stat': 'stats',
+    'mntr': 'monitor',
+    'cons': 'connections',
+    'ruok': 'ruok',
+}
+""" 4lw -> AdminServer's command, other 4lw are sent to client port """
+
+RESPONSE_KEYS = frozenset(('command', 'error'))
+
+
+class HTTPPool(object):
+    """ Keep-alive HTTP/1.1 GET client with idle connections pooled per (addr, port)
+
+    Connection is returned to the pool only after a complete response, so a cancelled
+    (timed out) request never leaves a half-read connection behind. Request on a pooled
+    connection the server has meanwhile closed is retried once on a new connection.
+
+    Attributes:
+        connects (int): Number of opened connections
+        requests (int): Number of sent requests
+    """
+
+    def __init__(self, max_idle=4):
+        """
+        Args:
+            max_idle (int): Max idle connections kept per server
+        """
+        self.max_idle = max_idle
+        self.connects = 0
+        self.requests = 0
+        self._idle = {}
+
+    async def get(self, addr, port, path, max_bytes=None):
+        """ Sends GET request
+
+        Args:
+            addr (string): Server's address
+            port (int): Server's port
+            path (string): Request's path
+            max_bytes (int): Max size of response body, None means unlimited
+        Returns:
+            Tuple of status (int) and body (transport.Response)
+        Raises:
+            HostResponseTooLarge: If body exceeds max_bytes
+            ConnectionError, asyncio.IncompleteReadError: If connection is lost
+        """
+        key = (addr, int(port))
+        idle = self._idle.get(key)
+        while idle:
+            reader, writer = idle.pop()
+            if reader.at_eof() or writer.is_closing():
+                writer.close()
+                continue
+            try:
+                return await self._request(key, reader, writer, path, max_bytes)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                pass  # closed by server while idle, retry on new connection
+        reader, writer = await asyncio.open_connection(addr, int(port))
+        self.connects += 1
+        return await self._request(key, reader, writer, path, max_bytes)
+
+    async def _request(self, key, reader, writer, path, max_bytes):
+        try:
+            self.requests += 1
+            writer.write('GET {} HTTP/1.1\r\nHost: {}:{}\r\nAccept: application/json\r\n\r\n'.format(
+                path, key[0], key[1]).encode('ascii'))
+            await writer.drain()
+            line = await reader.readline()
+            if not line:
+                raise ConnectionResetError('Connection closed by server')
+            version, status = line.decode('latin-1').split(None, 2)[:2]
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+            if 'chunked' in headers.get('transfer-encoding', '').lower():
+                body = await self._read_chunked(reader, max_bytes)
+            elif 'content-length' in headers:
+                size = int(headers['content-length'])
+                if max_bytes is not None and size > max_bytes:
+                    raise HostResponseTooLarge('Response exceeds {} bytes'.format(max_bytes))
+                body = transport.Response(await reader.readexactly(size))
+            else:
+                keep_alive = False
+                body = transport.Response(await reader.read(-1 if max_bytes is None else max_bytes + 1))
+                if max_bytes is not None and len(body) > max_bytes:
+                    raise HostResponseTooLarge('Response exceeds {} bytes'.format(max_bytes))
+            body.nbytes = len(body)
+        except BaseException:
+            writer.close()
+            raise
+        idle = self._idle.setdefault(key, [])
+        if keep_alive and len(idle) < self.max_idle:
+            idle.append((reader, writer))
+        else:
+            writer.close()
+        return int(status), body
+
+    async def _read_chunked(self, reader, max_bytes):
+        body = transport.Response()
+        while True:
+            size = int((await reader.readline()).split(b';', 1)[0].strip() or b'0', 16)
+            if size == 0:
+                while (await reader.readline()).strip():
+                    pass  # trailers
+                return body
+            if max_bytes is not None and len(body) + size > max_bytes:
+                raise HostResponseTooLarge('Response exceeds {} bytes'.format(max_bytes))
+            body += await reader.readexactly(size)
+            await reader.readexactly(2)
+
+    def close(self):
+        """ Closes idle connections """
+        for idle in self._idle.values():
+            for _, writer in idle:
+                writer.close()
+        self._idle = {}
+
+    def get_stats(self):
+        """ Gets pool's counters
+
+        Returns:
+            Dict of connects, requests and idle connections
+        """
+        return {
+            'connects': self.connects,
+            'requests': self.requests,
+            'idle': sum(len(idle) for idle in self._idle.values()),
+        }
+
+
+class AdminBackend(object):
+    """ Sends commands to AdminServer, shared by cluster's hosts
+
+    Attributes:
+        port (int): AdminServer's port
+        path (string): Commands' URL prefix
+        pool (HTTPPool): Keep-alive connections
+    """
+
+    def __init__(self, port=8080, path='/commands', max_idle=4):
+        """
+        Args:
+            port (int): AdminServer's port (admin.serverPort)
+            path (string): Commands' URL prefix (admin.commandURL)
+            max_idle (int): Max idle connections kept per host
+        """
+        self.port = int(port)
+        self.path = path.rstrip('/')
+        self.pool = HTTPPool(max_idle)
+
+    def supports(self, cmd):
+        """ Checks whether 4lw command is served by AdminServer """
+        return cmd in COMMANDS
+
+    async def request(self, addr, cmd, max_bytes=None):
+        """ Fetches command's response
+
+        Args:
+            addr (string): Host's address
+            cmd (string): Four-letter command, see COMMANDS
+            max_bytes (int): Max size of response, None means unlimited
+        Returns:
+            Tuple of decoded JSON (dict) and raw response (transport.Response)
+        Raises:
+            HostInvalidInfo: If AdminServer responded with error
+        """
+        status, body = await self.pool.get(addr, self.port, '{}/{}'.format(self.path, COMMANDS[cmd]), max_bytes)
+        try:
+            data = json.loads(body.decode('utf-8'))
+        except ValueError:
+            raise HostInvalidInfo('AdminServer {} responded {}: {!r}'.format(cmd, status, bytes(body[:100])))
+        if status != 200 or not isinstance(data, dict) or data.get('error'):
+            error = data.get('error') if isinstance(data, dict) else None
+            raise HostInvalidInfo('AdminServer {} responded {}: {}'.format(cmd, status, error or data))
+        return data, body
+
+    def close(self):
+        self.pool.close()
+
+    def get_stats(self):
+        return self.pool.get_stats()
+
+
+def parse_srvr(data):
+    """ Maps `server_stats` (or `stats`) response to srvr's fields
+
+    Returns:
+        Dict, the same as parsed srvr (mode is not uppercased yet)
+    """
+    stats = data['server_stats']
+    pairs = [
+        ('zookeeper', data['version']),
+        ('latency', '{}/{}/{}'.format(stats['min_latency'], stats['avg_latency'], stats['max_latency'])),
+        ('received', str(stats['packets_received'])),
+        ('sent', str(stats['packets_sent'])),
+        ('connections', str(stats['num_alive_client_connections'])),
+        ('outstanding', str(stats['outstanding_requests'])),
+        ('zxid', hex(stats['last_processed_zxid'])),
+        ('mode', stats['server_state']),
+    ]
+    if 'node_count' in data:
+        pairs.append(('node', str(data['node_count'])))
+    return schema.parse_srvr(pairs)
+
+
+def split_address(address):
+    """ Splits `remote_socket_address` ex. /127.0.0.1:5000 or [::1]:5000 into host and port """
+    addr, _, port = address.lstrip('/').rpartition(':')
+    return addr.strip('[]'), port
+
+
+def parse_stat(data):
+    """ Maps `stats` response to stat's head and clients
+
+    Returns:
+        Dict of head and clients, the same as parsed stat
+    """
+    clients = []
+    for connection in data.get('connections', []) + data.get('secure_connections', []):
+        addr, port = split_address(connection['remote_socket_address'])
+        clients.append({
+            'host': addr,
+            'port': port,
+            'n': str(connection.get('interest_ops', 0)),
+            'queued': str(connection.get('outstanding_requests', 0)),
+            'recved': str(connection.get('packets_received', 0)),
+            'sent': str(connection.get('packets_sent', 0)),
+        })
+    return {'head': 'Zookeeper version: {}'.format(data['version']), 'clients': clients}
+
+
+def parse_mntr(data):
+    """ Maps `monitor` response to mntr's fields (keys get zk_ prefix), nested values are skipped
+
+    Returns:
+        Dict, the same as parsed mntr
+    """
+    pairs = []
+    for key, value in data.items():
+        if key in RESPONSE_KEYS or isinstance(value, (dict, list)) or value is None:
+            continue
+        if isinstance(value, bool):
+            value = 'true' if value else 'false'
+        pairs.append(('zk_{}'.format(key), str(value)))
+    return schema.parse_mntr(pairs)
+
+
+def parse_cons(data):
+    """ Maps `connections` response to columnar table of cons
+
+    Returns:
+        sessions.ConsTable
+    """
+    table = sessions.ConsTable()
+    for connection in data.get('connections', []) + data.get('secure_connections', []):
+        addr, port = split_address(connection['remote_socket_address'])
+        session_id = connection.get('session_id')
+        table.append({
+            'host': addr,
+            'port': port,
+            'n': connection.get('interest_ops'),
+            'queued': connection.get('outstanding_requests'),
+            'recved': connection.get('packets_received'),
+            'sent': connection.get('packets_sent'),
+            'sid': '0x{}'.format(session_id) if session_id and not session_id.startswith('0x') else session_id,
+            'lop': connection.get('last_operation'),
+            'est': connection.get('established'),
+            'to': connection.get('session_timeout'),
+            'lcxid': connection.get('last_cxid'),
+            'lzxid': connection.get('last_zxid'),
+            'lresp': connection.get('last_response_time'),
+            'llat': connection.get('last_latency'),
+            'minlat': connection.get('min_latency'),
+            'avglat': connection.get('avg_latency'),
+            'maxlat': connection.get('max_latency'),
+        })
+    return table
+
+
+BACKENDS = {
+    'admin': AdminBackend,
+}
+
+
+def build_backend(config):
+    """ Builds backend from config
+
+    Args:
+        config (dict): None or type `4lw` - commands over client port, type `admin` - kwargs of AdminBackend
+    Returns:
+        Backend, None for 4lw
+    Raises:
+        ValueError: If type is unknown
+    """
+    if not config:
+        return None
+    config = dict(config)
+    kind = config.pop('type', 'admin')
+    if kind == '4lw':
+        return None
+    if kind not in BACKENDS:
+        raise ValueError('Unknown backend: {}'.format(kind))
+    return BACKENDS[kind](**config)
@@ -0,0 +1,246 @@
+# -*- coding:utf-8 -*-
+""" Cross-host analytics of clients connected to the cluster.
+
+All functions work on parsed `stat` results of many hosts, given as a dict
+host's name -> result of Host.stat(). Hosts which failed (False) are skipped.
+Clients are not copied, only referenced.
+
+Example:
+
+    stats = {str(host): (yield host.stat()) for host in cluster.get_hosts()}
+    top_clients(stats, by='queued', limit=10)
+    group_clients(stats, prefix=24)
+
+"""
+import heapq
+import math
+import socket
+import struct
+
+CLIENT_COUNTERS = ('queued', 'recved', 'sent')
+
+
+def iter_clients(stats):
+    """ Iterates over clients of all hosts
+
+    Args:
+        stats (dict): Host's name -> parsed stat
+    Yields:
+        Tuple of host's name and client dict
+    """
+    for server, stat in stats.items():
+        if not stat:
+            continue
+        for client in stat.get('clients', []):
+            yield server, client
+
+
+def subnet(ip, prefix=32):
+    """ Gets IPv4 network of given address
+
+    Args:
+        ip (string): IPv4 address
+        prefix (int): Network prefix length 0 - 32
+    Returns:
+        Network as string ex. 10.1.2.0/24, or just ip when prefix is 32
+    """
+    if prefix >= 32:
+        return ip
+    mask = (0xffffffff << (32 - prefix)) & 0xffffffff
+    network = struct.unpack('!I', socket.inet_aton(ip))[0] & mask
+    return '{}/{}'.format(socket.inet_ntoa(struct.pack('!I', network)), prefix)
+
+
+def address_key(addr):
+    """ Sort key of address - IPs by their numeric value (IPv4 before IPv6), other names after them """
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            packed = socket.inet_pton(family, addr)
+        except (OSError, ValueError):
+            continue
+        return (len(packed), packed, '')
+    return (17, b'', addr)
+
+
+def top_clients(stats, by='queued', limit=10):
+    """ Selects top clients across the cluster, heap based - O(n log limit)
+
+    Args:
+        stats (dict): Host's name -> parsed stat
+        by (string): One of queued, recved, sent
+        limit (int): Number of clients to return
+    Returns:
+        List of dicts (client's data with `server` key) sorted descending
+    """
+    if by not in CLIENT_COUNTERS:
+        raise ValueError('Unable to sort clients by: {}'.format(by))
+    top = heapq.nlargest(limit, iter_clients(stats), key=lambda item: int(item[1][by]))
+    return [dict(client, server=server) for server, client in top]
+
+
+def group_clients(stats, prefix=32):
+    """ Groups clients by IP or subnet across the cluster
+
+    Args:
+        stats (dict): Host's name -> parsed stat
+        prefix (int): Network prefix length, 32 groups by IP
+    Returns:
+        List of groups (network, connections, servers, queued, recved, sent)
+        sorted by connections descending
+    """
+    groups = {}
+    for server, client in iter_clients(stats):
+        network = subnet(client['host'], prefix)
+        group = groups.get(network)
+        if group is None:
+            group = groups[network] = {'network': network, 'connections': 0, 'servers': set()}
+            for counter in CLIENT_COUNTERS:
+                group[counter] = 0
+        group['connections'] += 1
+        group['servers'].add(server)
+        for counter in CLIENT_COUNTERS:
+            group[counter] += int(client[counter])
+    result = sorted(groups.values(), key=lambda group: (-group['connections'], group['network']))
+    for group in result:
+        group['servers'] = sorted(group['servers'])
+    return result
+
+
+def multi_server_clients(stats):
+    """ Finds client IPs connected to more than one server
+
+    Args:
+        stats (dict): Host's name -> parsed stat
+    Returns:
+        List of dicts (host, servers) sorted by number of servers descending
+    """
+    servers = {}
+    for server, client in iter_clients(stats):
+        servers.setdefault(client['host'], set()).add(server)
+    result = [
+        {'host': host, 'servers': sorted(items)} for host, items in servers.items() if len(items) > 1
+    ]
+    return sorted(result, key=lambda item: (-len(item['servers']), item['host']))
+
+
+def connection_imbalance(stats):
+    """ Computes per server connections imbalance
+
+    Args:
+        stats (dict): Host's name -> parsed stat
+    Returns:
+        Dict with mean, stddev, max_ratio (max/mean) and servers list
+        (server, connections, deviation from mean)
+    """
+    counts = dict((server, len(stat.get('clients', []))) for server, stat in stats.items() if stat)
+    mean = float(sum(counts.values())) / len(counts) if counts else 0.0
+    variance = sum((count - mean) ** 2 for count in counts.values()) / len(counts) if counts else 0.0
+    servers = [
+        {'server': server, 'connections': count, 'deviation': count - mean}
+        for server, count in sorted(counts.items())
+    ]
+    return {
+        'mean': mean,
+        'stddev': math.sqrt(variance),
+        'max_ratio': max(counts.values()) / mean if mean else 0.0,
+        'servers': servers
+    }
+
+
+def paginate(items, offset=0, limit=None):
+    """ Slices list of items
+
+    Args:
+        items (list): Items to paginate
+        offset (int): Number of items to skip
+        limit (int): Max number of items, None means all
+    Returns:
+        Dict with items, total, offset and limit
+    """
+    end = None if limit is None else offset + limit
+    return {'items': items[offset:end], 'total': len(items), 'offset': offset, 'limit': limit}
+
+
+CLIENT_FIELDS = ('host', 'port', 'n') + CLIENT_COUNTERS
+
+
+def client_filter(prefix):
+    """ Creates client's IP filter
+
+    Args:
+        prefix (string): CIDR network (ex. 10.1.0.0/16) or IP's string prefix (ex. 10.1.)
+    Returns:
+        Function client -> bool
+    Raises:
+        ValueError: If CIDR network is invalid
+    """
+    if '/' not in prefix:
+        return lambda client: client['host'].startswith(prefix)
+    network, _, length = prefix.partition('/')
+    try:
+        length = int(length)
+        network = subnet(network, length)
+    except (ValueError, OSError):
+        raise ValueError('Invalid network: {}'.format(prefix))
+
+    def matches(client):
+        try:
+            return subnet(client['host'], length) == network
+        except OSError:
+            return False
+    return matches
+
+
+def query_clients(clients, prefix=None, sort=None, order='desc', fields=None, cursor=0, limit=None):
+    """ Filters, sorts, paginates and projects host's clients
+
+    Clients are iterated, not copied - only the returned page is built;
+    sorted page is selected with a heap - O(n log (cursor + limit)).
+
+    Args:
+        clients (list): Clients of parsed stat
+        prefix (string): Client's IP filter, see client_filter
+        sort (string): One of CLIENT_FIELDS, None keeps servers order
+        order (string): asc or desc
+        fields (list): Client's fields to return, None - all
+        cursor (int): Number of matching clients to skip
+        limit (int): Max number of clients, None - all
+    Returns:
+        Dict with clients (page), total (matching clients) and next (cursor of the next page or None)
+    Raises:
+        ValueError: If sort, order, fields or prefix is invalid
+    """
+    if sort is not None and sort not in CLIENT_FIELDS:
+        raise ValueError('Unable to sort clients by: {}'.format(sort))
+    if order not in ('asc', 'desc'):
+        raise ValueError('Invalid order: {}'.format(order))
+    if fields is not None and any(field not in CLIENT_FIELDS for field in fields):
+        raise ValueError('Unknown client field in: {}'.format(','.join(fields)))
+    matches = client_filter(prefix) if prefix else None
+    end = None if limit is None else cursor + limit
+    if sort is None:
+        page = []
+        total = 0
+        for client in clients if matches is None else filter(matches, clients):
+            if total >= cursor and (end is None or total < end):
+                page.append(client)
+            total += 1
+    else:
+        matching = clients if matches is None else [client for client in clients if matches(client)]
+        total = len(matching)
+        if sort == 'host':
+            key = lambda client: address_key(client['host'])  # noqa
+        else:
+            key = lambda client: int(client[sort])  # noqa
+        if end is None:
+            ordered = sorted(matching, key=key, reverse=order == 'desc')
+        else:
+            ordered = (heapq.nlargest if order == 'desc' else heapq.nsmallest)(end, matching, key=key)
+        page = ordered[cursor:end]
+    if fields is not None:
+        page = [dict((field, client[field]) for field in fields) for client in page]
+    return {
+        'clients': page,
+        'total': total,
+        'next': cursor + len(page) if end is not None and cursor + len(page) < total else None,
+    }
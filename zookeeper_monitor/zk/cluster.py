@@ -14,14 +14,112 @@ Example:
     # or
     yield cluster.get_host('localhost:5555').srvr()
 
+    # or let the cluster discover its members (Zookeeper 3.5+)
+    cluster = Cluster('Some_name')
+    cluster.set_seeds([{'addr': '1.1.12.12'}])
+    yield cluster.discover()
+    cluster.start_discovery()
+
+    # hosts of remote DC get longer timeout and at most 4 concurrent polls
+    cluster.set_lanes({'us-east': {'timeout': 10, 'concurrency': 4}})
+    cluster.get_dc_stats()
+
+    # secure client port, one SSLContext shared by all hosts
+    cluster.set_tls({'ca': '/etc/zookeeper/ca.pem', 'cert': 'client.pem', 'key': 'client.key'})
+
+    # srvr, stat, mntr, cons and ruok through AdminServer, over pooled keep-alive connections
+    cluster.set_backend({'type': 'admin', 'port': 8080})
+
+    # srvr of all hosts at once, zxids compared only if answered within 50ms
+    snapshot = await cluster.consistent_snapshot_async(max_skew=0.05)
+    snapshot['divergence']
+
+    # ruok of all hosts multiplexed by one selector, health updated in bulk
+    health = await cluster.probe_async()
 
 """
-from .host import Host
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from tornado import gen
+from tornado.ioloop import IOLoop, PeriodicCallback
+from .host import Host, coroutine_shim
+from . import admin, probe, transport
 from .exceptions import ClusterHostAddError, ClusterHostDuplicateError, ClusterHostCreateError
+from .exceptions import HostInvalidInfo
+
+
+def dc_stats(hosts):
+    """ Aggregates hosts' state
+
+    Args:
+        hosts (list): Hosts' info dicts (see Host.get_info)
+    Returns:
+        Dict with number of hosts, number of hosts per health, sum of connections,
+        mean of hosts' average latency and max latency
+    """
+    health = {}
+    connections = 0
+    latencies = []
+    latency_max = None
+    for host in hosts:
+        health[host['health']] = health.get(host['health'], 0) + 1
+        info = host.get('info') or {}
+        if isinstance(info.get('connections'), int):
+            connections += info['connections']
+        if isinstance(info.get('latency_avg'), (int, float)):
+            latencies.append(info['latency_avg'])
+        if isinstance(info.get('latency_max'), (int, float)):
+            latency_max = max(latency_max, info['latency_max']) if latency_max is not None else info['latency_max']
+    return {
+        'hosts': len(hosts),
+        'health': health,
+        'connections': connections,
+        'latency_avg': sum(latencies) / len(latencies) if latencies else None,
+        'latency_max': latency_max,
+    }
+
+
+def divergence(infos):
+    """ Compares hosts' srvr taken at (about) the same time
+
+    Args:
+        infos (dict): Host's name -> parsed srvr (see Host._parse_srvr)
+    Returns:
+        Dict of:
+            - diverged (bool) - hosts disagree (multiple or no leader, split modes or epochs)
+            - leaders (list) - names of hosts in leader mode
+            - modes (dict) - mode -> names of hosts
+            - epochs (list) - distinct zxid epochs
+            - zxid_min, zxid_max (int) - the lowest and the highest zxid
+            - zxid_spread (int) - transactions between them, None if epochs differ
+    """
+    modes = {}
+    zxids = []
+    for name, info in sorted(infos.items()):
+        modes.setdefault(str(info.get('mode', Host.UNKNOWN)).upper(), []).append(name)
+        if isinstance(info.get('zxid'), int):
+            zxids.append(info['zxid'])
+    leaders = modes.get(Host.LEADER, [])
+    epochs = sorted(set(zxid >> 32 for zxid in zxids))
+    split = set(modes) - set((Host.LEADER, Host.FOLLOWER, 'OBSERVER'))
+    return {
+        'diverged': bool(infos) and (len(leaders) != 1 or bool(split) or len(epochs) > 1),
+        'leaders': leaders,
+        'modes': modes,
+        'epochs': epochs,
+        'zxid_min': min(zxids) if zxids else None,
+        'zxid_max': max(zxids) if zxids else None,
+        'zxid_spread': max(zxids) - min(zxids) if zxids and len(epochs) == 1 else None,
+    }
 
 
 class Cluster(object):
 
+    DISCOVERY_INTERVAL = 300
+    SNAPSHOT_MAX_SKEW = 0.05
+
     def __init__(self, name):
         """ Create cluster
 
@@ -32,6 +130,28 @@ class Cluster(object):
         self.name = name
         self._hosts = []
         self._dc = []
+        self._seeds = []
+        self._leader = None
+        self._discovery = None
+        self._lanes = {}
+        self._tls = None
+        self._backend = None
+        self._removal_listeners = []
+
+    def add_removal_listener(self, listener):
+        """ Adds listener called when hosts are removed (remove_host, sync_hosts, discovery)
+
+        Args:
+            listener: Function (cluster, removed) - removed is a list of Host objects
+        """
+        self._removal_listeners.append(listener)
+
+    def _notify_removed(self, removed):
+        for listener in self._removal_listeners:
+            try:
+                listener(self, removed)
+            except Exception as exception:
+                logging.warning('Removal listener %s failed: %s', listener, exception)
 
     def add_host(self, host=None, **kwargs):
         """ Adds zookeeper's server to cluster
@@ -59,11 +179,165 @@ class Cluster(object):
                 raise ClusterHostDuplicateError('Unable to add duplicated host: {}'.format(host))
             host.cluster = self.name
             self._hosts.append(host)
+            self._apply_lane(host)
+            self._apply_tls(host)
+            self._apply_backend(host)
             if host.dc:
                 self.add_dc(host.dc)
         else:
             raise ClusterHostAddError('Unable to add host: {} {}:'.format(host, kwargs))
 
+    def remove_host(self, name):
+        """ Removes zookeeper's server from cluster
+
+        Args:
+            name: Host's name (addr:port) or Host object
+        Returns:
+            Removed Host object or None if it has not been found
+        """
+        host = self.get_host(str(name))
+        if host is None:
+            return None
+        self._hosts.remove(host)
+        if host.dc and not any(item.dc == host.dc for item in self._hosts):
+            self._dc.remove(host.dc)
+        self._notify_removed([host])
+        return host
+
+    def sync_hosts(self, hosts):
+        """ Synchronizes cluster's hosts with given configuration
+
+        Hosts that exist in both the cluster and the configuration are kept
+        (same objects, so their state survives), only the difference is added
+        or removed. Hosts are ordered as in the configuration.
+
+        Args:
+            hosts (list): List of host's kwargs - see Host's constructor
+        Returns:
+            Tuple of:
+                - added (list) - Host objects added to the cluster
+                - removed (list) - Host objects removed from the cluster
+        Raises:
+            ClusterHostCreateError: If cannot create host with given params
+            ClusterHostDuplicateError: If the configuration lists the same host twice
+        """
+        current = dict((str(host), host) for host in self._hosts)
+        seen = set()
+        ordered = []
+        added = []
+        for kwargs in hosts:
+            try:
+                host = Host(**kwargs)
+            except Exception as exception:
+                raise ClusterHostCreateError(
+                    'Unable to create host: {} - {}'.format(kwargs, exception))
+            if str(host) in seen:
+                raise ClusterHostDuplicateError('Unable to add duplicated host: {}'.format(host))
+            seen.add(str(host))
+            existing = current.pop(str(host), None)
+            if existing is None:
+                host.cluster = self.name
+                added.append(host)
+            else:
+                existing.dc = host.dc
+                host = existing
+            self._apply_lane(host)
+            self._apply_tls(host)
+            self._apply_backend(host)
+            ordered.append(host)
+        removed = list(current.values())
+        self._hosts = ordered
+        self._dc = []
+        for host in self._hosts:
+            if host.dc:
+                self.add_dc(host.dc)
+        if removed:
+            self._notify_removed(removed)
+        return added, removed
+
+    def set_seeds(self, seeds):
+        """ Sets bootstrap hosts used to discover ensemble members
+
+        Args:
+            seeds (list): List of host's kwargs - see Host's constructor
+        """
+        self._seeds = [Host(**kwargs) for kwargs in seeds]
+        for seed in self._seeds:
+            self._apply_tls(seed)
+            self._apply_backend(seed)
+
+    def get_seeds(self):
+        """ Gets bootstrap hosts
+
+        Returns:
+            List of host's object
+        """
+        return self._seeds
+
+    @gen.coroutine
+    def discover(self):
+        """ Discovers ensemble members from `conf` of the first responding seed
+
+        Hosts are synchronized with `server.N=` lines, existing hosts keep their state.
+        Seed's dc is applied to the host it points to.
+
+        Returns:
+            Tuple of added and removed Host objects, both empty if none of seeds answered.
+        """
+        for seed in self._seeds:
+            host = self.get_host(str(seed)) or seed
+            conf = yield host.conf()
+            servers = host._parse_servers(conf) if conf else []
+            if not servers:
+                continue
+            members = []
+            for server in servers:
+                name = '{}:{}'.format(server['addr'], server['port'])
+                existing = self.get_host(name)
+                known = [item for item in self._seeds if str(item) == name]
+                dc = existing.dc if existing else (known[0].dc if known else None)
+                members.append({'addr': server['addr'], 'port': server['port'], 'dc': dc})
+            added, removed = self.sync_hosts(members)
+            if added or removed:
+                logging.info('Cluster %s discovered, added: %s, removed: %s',
+                             self, [str(item) for item in added], [str(item) for item in removed])
+            raise gen.Return((added, removed))
+        logging.warning('Cluster %s: none of seeds returned ensemble members', self)
+        raise gen.Return(([], []))
+
+    def start_discovery(self, interval=None):
+        """ Starts periodic discovery
+
+        Args:
+            interval (int, float): Seconds between discoveries, default DISCOVERY_INTERVAL
+        """
+        self.stop_discovery()
+        self._discovery = PeriodicCallback(self.discover, (interval or self.DISCOVERY_INTERVAL) * 1000)
+        self._discovery.start()
+
+    def stop_discovery(self):
+        """ Stops periodic discovery """
+        if self._discovery:
+            self._discovery.stop()
+            self._discovery = None
+
+    def update_leader(self):
+        """ Checks current leader in hosts' info
+
+        Whenever observed leader changes and discovery is enabled, membership is rediscovered.
+
+        Returns:
+            Leader's name or None
+        """
+        leaders = [str(host) for host in self._hosts if host.info.get('mode') == Host.LEADER]
+        leader = leaders[0] if leaders else None
+        if leader and leader != self._leader:
+            if self._leader and self._seeds:
+                logging.info('Cluster %s leader changed %s -> %s', self, self._leader, leader)
+                IOLoop.current().add_callback(self.discover)
+            self._leader = leader
+        return leader
+
     def host_is_duplicated(self, host):
         """ Checks if host exists in the cluster
 
@@ -92,6 +366,211 @@ class Cluster(object):
             return True
         return False
 
+    def set_lanes(self, lanes):
+        """ Sets polling lanes - per DC settings, so a slow DC doesn't hold up the others
+
+        Args:
+            lanes (dict): DC's name -> dict of:
+                - timeout (int, float) - commands timeout of DC's hosts, hosts of DC without
+                  lane's timeout get the default one (Host.TIMEOUT)
+                - concurrency (int) - max hosts of DC polled at once (see poller)
+        """
+        self._lanes = dict(lanes or {})
+        for host in self._hosts:
+            self._apply_lane(host)
+
+    def get_lane(self, dc):
+        """ Gets DC's lane settings
+
+        Returns:
+            Dict (timeout, concurrency), empty if DC has no lane
+        """
+        return self._lanes.get(dc) or {}
+
+    def _apply_lane(self, host):
+        timeout = self.get_lane(host.dc).get('timeout')
+        host.set_timeout(Host.TIMEOUT if timeout is None else timeout)
+
+    def set_tls(self, config):
+        """ Sets TLS of hosts' commands, SSLContext is built once and shared by all hosts
+
+        Args:
+            config (dict): None - plain connections, otherwise kwargs of transport.create_context:
+                - ca (string) - CA bundle file, default system's CAs
+                - cert (string) - client's certificate file
+                - key (string) - client's private key file
+                - check_hostname (bool) - match server's certificate with host's addr, default true
+                - verify (bool) - verify server's certificate, default true
+        Raises:
+            OSError, ssl.SSLError: If certificates cannot be loaded
+        """
+        self._tls = transport.create_context(**config) if config else None
+        for host in self._hosts + self._seeds:
+            self._apply_tls(host)
+
+    def _apply_tls(self, host):
+        host.set_tls(self._tls)
+
+    def set_backend(self, config):
+        """ Sets backend of hosts' commands, built once and shared by all hosts (with its connection pool)
+
+        Previous backend's idle connections are closed.
+
+        Args:
+            config (dict): None or type `4lw` - commands over client port, type `admin` - AdminServer:
+                - port (int) - AdminServer's port, default 8080
+                - path (string) - commands' URL prefix, default /commands
+                - max_idle (int) - max idle keep-alive connections per host, default 4
+        Raises:
+            ValueError: If type is unknown
+        """
+        backend = admin.build_backend(config)
+        if self._backend is not None:
+            self._backend.close()
+        self._backend = backend
+        for host in self._hosts + self._seeds:
+            self._apply_backend(host)
+
+    def _apply_backend(self, host):
+        host.set_backend(self._backend)
+
+    async def consistent_snapshot_async(self, max_skew=SNAPSHOT_MAX_SKEW, timeout=None):
+        """ Takes srvr of all hosts at (about) the same moment
+
+        Hosts are resolved and connected first, then `srvr` is sent to every host in the same
+        loop tick, so only the command itself is on the wire. Every host's state is captured
+        between its send and the first byte of its response - the skew window is the time
+        from the first send to the last first byte. Hosts' zxids are compared (see divergence)
+        only if the window is within `max_skew`.
+
+        Commands go over client port (4lw, TLS if set) regardless of backend and bypass
+        the rate limiter. Hosts' info and health are updated.
+
+        Args:
+            max_skew (float): Max window (seconds) comparison is meaningful in
+            timeout (int, float): Deadline of connecting and reading, default the highest hosts' timeout
+        Returns:
+            Dict of:
+                - time (float) - unix time of sending
+                - window (float) - skew window in seconds, None if no host answered
+                - fire_spread (float) - seconds between the first and the last send
+                - consistent (bool) - window is within max_skew
+                - hosts (dict) - name -> ok, sent, received (seconds since the first send),
+                  rtt, zxid, mode or error
+                - divergence (dict) - see divergence, None unless consistent
+        """
+        loop = asyncio.get_running_loop()
+        hosts = list(self._hosts)
+        if timeout is None:
+            timeout = max([host.timeout for host in hosts] or [0])
+        deadline = loop.time() + timeout
+        result = {'time': None, 'window': None, 'fire_spread': None, 'consistent': False, 'hosts': {},
+                  'divergence': None}
+        if not hosts:
+            return result
+
+        # resolving, connecting and TLS handshakes are done before, not in between the sends
+        connects = [asyncio.ensure_future(transport.connect(host.addr, host.port, host._tls)) for host in hosts]
+        await asyncio.wait(connects, timeout=timeout)
+        fired = []
+        result['time'] = time.time()
+        for host, task in zip(hosts, connects):
+            if not task.done():
+                task.cancel()
+                result['hosts'][str(host)] = {'ok': False, 'error': Host.HOST_TIMEOUT}
+                host.health = Host.HOST_TIMEOUT
+            elif task.exception() is not None:
+                result['hosts'][str(host)] = {'ok': False, 'error': str(task.exception()) or Host.HOST_ERROR}
+                host.health = Host.HOST_ERROR
+            else:
+                connection = task.result()
+                fired.append((host, connection, loop.time(), connection.send_nowait(b'srvr\n')))
+
+        async def read(host, connection, leftover):
+            try:
+                if leftover:
+                    await loop.sock_sendall(connection.sock, leftover)
+                max_bytes, overflow = host.get_max_bytes('srvr')
+                return await transport.receive(connection, 'srvr', max_bytes, overflow)
+            finally:
+                connection.close()
+
+        reads = [asyncio.ensure_future(read(host, connection, leftover)) for host, connection, _, leftover in fired]
+        if reads:
+            await asyncio.wait(reads, timeout=max(deadline - loop.time(), 0))
+        first = min(sent for _, _, sent, _ in fired) if fired else None
+        infos = {}
+        received = []
+        for (host, _, sent, _), task in zip(fired, reads):
+            state = result['hosts'][str(host)] = {'ok': False, 'sent': sent - first}
+            if not task.done():
+                task.cancel()
+                state['error'] = Host.HOST_TIMEOUT
+                host.health = Host.HOST_TIMEOUT
+                continue
+            try:
+                response = task.result()
+                if response.received is None:
+                    raise HostInvalidInfo('Empty response')
+                info = host._parse_srvr(host._lines(response))
+            except Exception as exception:
+                state['error'] = str(exception) or Host.HOST_ERROR
+                host.health = Host.HOST_ERROR
+                continue
+            infos[str(host)] = info
+            received.append(response.received)
+            state.update(received=response.received - first, rtt=response.received - sent,
+                         zxid=info.get('zxid'), mode=str(info.get('mode', Host.UNKNOWN)).upper())
+            try:
+                host._update_info(dict(info))
+                state['ok'] = True
+            except HostInvalidInfo as exception:
+                state['error'] = str(exception)
+        if fired:
+            result['fire_spread'] = max(sent for _, _, sent, _ in fired) - first
+        if received:
+            result['window'] = max(received) - first
+            result['consistent'] = result['window'] <= max_skew
+        if result['consistent']:
+            result['divergence'] = divergence(infos)
+        return result
+
+    async def probe_async(self, timeout=None, max_open=None):
+        """ Probes liveness of all hosts with ruok at once, see probe.Prober
+
+        Args:
+            timeout (int, float): Probe's deadline, default the highest hosts' timeout
+            max_open (int): Max number of sockets open at once, default probe.MAX_OPEN
+        Returns:
+            Dict of host's name -> probe's result (OK, ERROR or TIMEOUT), hosts' liveness
+            and health are updated (see probe.update_host)
+        """
+        if timeout is None:
+            timeout = max([host.timeout for host in self._hosts] or [0])
+        prober = probe.Prober(timeout, max_open or probe.MAX_OPEN)
+        return await prober.probe_async(list(self._hosts))
+
+    def get_hosts_by_dc(self):
+        """ Groups hosts by DC
+
+        Returns:
+            OrderedDict DC's name -> list of hosts, hosts without DC are under None (last)
+        """
+        groups = OrderedDict((dc, []) for dc in self._dc)
+        for host in self._hosts:
+            groups.setdefault(host.dc, []).append(host)
+        return groups
+
+    def get_dc_stats(self):
+        """ Aggregates hosts' state per DC, see dc_stats
+
+        Returns:
+            OrderedDict DC's name -> aggregates
+        """
+        return OrderedDict(
+            (dc, dc_stats([host.__dict__ for host in hosts])) for dc, hosts in self.get_hosts_by_dc().items()
+        )
+
     def get_hosts(self):
         """ Gets all hosts
 
@@ -118,3 +597,7 @@ class Cluster(object):
 
     def __str__(self):
         return self.name
+
+    # tornado's gen.coroutine API - thin shims over native coroutines
+    consistent_snapshot = coroutine_shim(consistent_snapshot_async)
+    probe = coroutine_shim(probe_async)
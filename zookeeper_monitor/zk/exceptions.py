@@ -60,3 +60,18 @@ class HostSetTimeoutTypeError(TypeError, HostBaseError):
 class HostSetTimeoutValueError(ValueError, HostBaseError):
     """ Trying to set timeout that below 0 """
     pass
+
+
+class HostUnknownCommandError(ValueError, HostBaseError):
+    """ Trying to poll command that Host doesn't implement """
+    pass
+
+
+class HostResponseTooLarge(HostBaseError):
+    """ Response exceeds command's max_bytes limit and overflow policy is abort """
+    pass
+
+
+class HostQueueTimeout(HostBaseError):
+    """ Command waited for limiter's slot longer than its queue timeout """
+    pass
@@ -5,77 +5,99 @@ Example:
 
     host = Host('localhost', 5555)
     result = yield host.stat()
+    # or natively, on any asyncio loop (uvloop as well)
+    result = await host.stat_async()
+    # srvr, stat, mntr, cons and ruok through AdminServer (Zookeeper 3.5+)
+    host.set_backend(admin.AdminBackend(port=8080))
 
 """
+import asyncio
+import contextlib
+import contextvars
 import functools
 import re
-import socket
-import time
 import logging
 from tornado import gen
-from tornado.ioloop import IOLoop
-from tornado.iostream import IOStream
-from tornado.netutil import Resolver
-from tornado.concurrent import Future, chain_future
 from .exceptions import HostConnectionTimeout, HostSetTimeoutTypeError
-from .exceptions import HostSetTimeoutValueError, HostInvalidInfo
+from .exceptions import HostSetTimeoutValueError, HostInvalidInfo, HostUnknownCommandError, HostQueueTimeout
+from .watches import WatchParser
+from . import admin, limits, schema, sessions, transport
 
-from distutils.version import LooseVersion
 
-def with_timeout(timeout, future, io_loop=None):
-    """Wraps a `.Future` in a timeout.
+_slot = contextvars.ContextVar('slot', default=None)
+""" Limiter's slot held by the running command, see Host.command_slot """
+
+
+def version_tuple(version):
+    """ Converts zookeeper's version string to comparable tuple
+
+    Args:
+        version (string): Version ex. 3.4.6-1569965, built on 02/20/2014
+    Returns:
+        Tuple of ints ex. (3, 4, 6)
     """
-    result = Future()
-    chain_future(future, result)
-    if io_loop is None:
-        io_loop = IOLoop.current()
-    timeout_handle = io_loop.add_timeout(
-        timeout,
-        lambda: result.set_exception(HostConnectionTimeout("Timeout")))
-    if isinstance(future, Future):
-        # We know this future will resolve on the IOLoop, so we don't
-        # need the extra thread-safety of IOLoop.add_future (and we also
-        # don't care about StackContext here.
-        future.add_done_callback(
-            lambda future: io_loop.remove_timeout(timeout_handle))
-    else:
-        # concurrent.futures.Futures may resolve on any thread, so we
-        # need to route them back to the IOLoop.
-        io_loop.add_future(
-            future, lambda future: io_loop.remove_timeout(timeout_handle))
-    return result
+    match = re.match(r'^\s*([\d.]+)', version)
+    if not match:
+        return ()
+    return tuple(int(part) for part in match.group(1).split('.') if part)
+
+
+class Text(str):
+    """ Plain text response
+
+    Attributes:
+        truncated (bool): True if response exceeded command's max_bytes (see Host.get_max_bytes)
+    """
+    truncated = False
 
 
 def command_executor(func):
     """ Command executor
 
-    Prepare wrapper.
+    Prepare wrapper of native coroutine command.
     """
-    @gen.coroutine
     @functools.wraps(func)
-    def wrapper(self, *args, **kwds):
+    async def wrapper(self, *args, **kwds):
         """ Wrapper
 
-        Wraps exception handling, returns ret, updates host's health state
+        Wraps exception handling, returns ret, updates host's health state.
+        Command's timeout starts when it gets limiter's slot, waiting for the slot
+        is bounded by QUEUE_TIMEOUT and doesn't change host's health.
 
         """
         try:
-            future = func(self, *args, **kwds)
-            ret = yield with_timeout(time.time() + self.timeout, future)
-            raise gen.Return(ret)
-        except gen.Return:
-            raise
-        except HostConnectionTimeout as exception:
-            logging.warning('ExceptionTimeout: %s', exception)
+            async with self.command_slot():
+                return await asyncio.wait_for(func(self, *args, **kwds), self.timeout)
+        except HostQueueTimeout as exception:
+            logging.warning('ExceptionQueueTimeout: %s %s', self, exception)
+        except (asyncio.TimeoutError, HostConnectionTimeout) as exception:
+            logging.warning('ExceptionTimeout: %s', str(exception) or 'Timeout')
             self.health = Host.HOST_TIMEOUT
         except Exception as exception:
             logging.warning('Exception: %s', exception)
             self.health = Host.HOST_ERROR
-        raise gen.Return(False)
+        return False
 
     return wrapper
 
 
+def coroutine_shim(func):
+    """ Exposes native coroutine method as tornado's gen.coroutine
+
+    Calls method by name, so it respects overridden (or mocked) `*_async` methods.
+    """
+    name = func.__name__
+
+    @gen.coroutine
+    def wrapper(self, *args, **kwds):
+        ret = yield getattr(self, name)(*args, **kwds)
+        raise gen.Return(ret)
+
+    wrapper.__name__ = name[:-len('_async')]
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+
 class Host(object):
     """ Zookeeper's server """
 
@@ -89,7 +111,23 @@ class Host(object):
     LEADER = 'LEADER'
     UNKNOWN = 'UNKNOWN'
 
+    POLL_COMMANDS = ('srvr', 'stat', 'mntr')
+
+    TIMEOUT = 2
+    """ Default commands timeout, see set_timeout """
+
+    QUEUE_TIMEOUT = 10
+    """ Max seconds command waits for limiter's slot (see zk.limits) """
+    QUEUE_TIMEOUT_ERROR = 'QUEUE_TIMEOUT'
+
+    MAX_BYTES = 1 << 20
+    COMMAND_MAX_BYTES = {'stat': 16 << 20, 'cons': 16 << 20, 'dump': 16 << 20, 'reqs': 16 << 20}
+    OVERFLOW = transport.TRUNCATE
+
     RE_STAT_LINE = re.compile(r'/([\.0-9]{7,}):(\d+)\[(\d+)\]\(queued=(\d+),recved=(\d+),sent=(\d+)\)')
+    RE_WCHS = re.compile(r'(\d+) connections watching (\d+) paths\s+Total watches:\s*(\d+)')
+    RE_CONF_SERVER = re.compile(r'^server\.(\d+)$')
+    RE_CONF_ADDR = re.compile(r'^(\[[^\]]+\]|[^:]+):(\d+)(?::(\d+))?(?::(\w+))?$')
 
     def __init__(self, addr, port=2181, cluster=None, dc=None):
         """ Create cluster's host
@@ -106,11 +144,17 @@ class Host(object):
         self.dc = dc
         self.cluster = str(cluster) if cluster else None
         self.health = Host.HOST_UNCHECKED
+        # result of the last ruok probe (see probe.Prober), None - not probed
+        self.alive = None
         self.info = {}
         self.info['zxid'] = None
         self.info['connections'] = None
         self.info['mode'] = Host.UNKNOWN
-        self.set_timeout(2)
+        self.timings = {}
+        self.max_bytes = {}
+        self._tls = None
+        self._backend = None
+        self.set_timeout(Host.TIMEOUT)
 
     def set_timeout(self, timeout):
         """ Sets commands timeout
@@ -134,23 +178,109 @@ class Host(object):
         """ Better representaion """
         return 'Host Object ({}) {}'.format(str(self), self.__dict__)
 
+    def set_tls(self, context, server_hostname=None):
+        """ Sets TLS of commands (secure client port)
+
+        Host keeps its last TLS session, so next commands resume it instead of a full handshake
+        (kept also when the same context is set again).
+
+        Args:
+            context (SSLContext): Client's context (see transport.create_context), shared by hosts,
+                None - plain connections
+            server_hostname (string): Name server's certificate is matched with, default host's addr
+        """
+        if context is None:
+            self._tls = None
+        elif self._tls is None or self._tls.context is not context or \
+                (server_hostname or self.addr) != self._tls.server_hostname:
+            self._tls = transport.TLS(context, server_hostname or self.addr)
+
+    def set_backend(self, backend):
+        """ Sets backend of commands
+
+        Commands supported by backend (see admin.COMMANDS) are sent through it and mapped
+        to the same parsed structures, the others are still sent to client port.
+
+        Args:
+            backend (admin.AdminBackend): Backend, shared by hosts, None - 4lw over client port
+        """
+        self._backend = backend
+
+    def set_max_bytes(self, cmd, max_bytes, overflow=None):
+        """ Sets limit of command's response size
+
+        Args:
+            cmd (string): Four-letter command
+            max_bytes (int): Max response size, None means unlimited
+            overflow (string): truncate or abort, default OVERFLOW
+        """
+        self.max_bytes[cmd] = (max_bytes, overflow or self.OVERFLOW)
+
+    def get_max_bytes(self, cmd):
+        """ Gets limit of command's response size
+
+        Returns:
+            Tuple of max_bytes and overflow policy
+        """
+        if cmd in self.max_bytes:
+            return self.max_bytes[cmd]
+        return self.COMMAND_MAX_BYTES.get(cmd, self.MAX_BYTES), self.OVERFLOW
+
+    def _lines(self, data):
+        """ Decodes response into lines, partial last line of truncated response is dropped """
+        truncated = getattr(data, 'truncated', False)
+        lines = data.decode('utf-8', 'replace' if truncated else 'strict').split('\n')
+        return lines[:-1] if truncated else lines
+
+    def _text(self, data):
+        """ Decodes plain text response, truncated one without its partial last line (see _lines) """
+        text = Text('\n'.join(self._lines(data)))
+        text.truncated = getattr(data, 'truncated', False)
+        return text
+
+    def _mark_truncated(self, result, data):
+        """ Marks parsed result of truncated response """
+        if getattr(data, 'truncated', False):
+            result['truncated'] = True
+        return result
+
     def _parse_info(self, lines, update_host_info=True):
         """ Parses response with host's basic info
         Args:
             update_host_info: If true updates host info (zxid, conns, ...) from stat
         Returns:
-            Normalized, parsed data dict
+            Normalized, parsed data dict, values are typed (see schema.SRVR)
         """
         result = {}
         try:
-            for line in lines:
-                tmp = line.split(':', 1)
-                if not tmp[0] or not tmp[1]:
-                    continue
-                key = tmp[0].strip().split(' ')[0].strip().lower()
-                val = tmp[1].strip()
-                result[key] = val
+            result = self._parse_srvr(lines)
+        except Exception as exception:
+            self.health = Host.HOST_ERROR
+            logging.warning('Exception: %s', exception)
+            raise HostInvalidInfo('Parse - dump info: {}'.format(result))
+        return self._update_info(result, update_host_info)
+
+    def _parse_srvr(self, lines):
+        """ Parses srvr/stat lines into typed fields (see schema.SRVR), without validation """
+        pairs = []
+        for line in lines:
+            tmp = line.split(':', 1)
+            if not tmp[0] or not tmp[1]:
+                continue
+            key = tmp[0].strip().split(' ')[0].strip().lower()
+            pairs.append((key, tmp[1].strip()))
+        return schema.parse_srvr(pairs)
 
+    def _update_info(self, result, update_host_info=True):
+        """ Validates parsed info, sets health and optionally updates host's info
+
+        Args:
+            result (dict): Parsed srvr fields
+            update_host_info: If true updates host info (zxid, conns, ...)
+        Returns:
+            Result with uppercased mode
+        """
+        try:
             result['mode'] = result['mode'].upper()
         except Exception as exception:
             self.health = Host.HOST_ERROR
@@ -225,8 +355,7 @@ class Host(object):
         return data, not_parsed, errors
 
     @command_executor
-    @gen.coroutine
-    def srvr(self, update_host_info=True):
+    async def srvr_async(self, update_host_info=True):
         """ Reset statistics returned by stat command.
 
         Executes and fetchs host's srvr. Applies data to object.
@@ -236,15 +365,17 @@ class Host(object):
         Returns:
             False when fails, parsed info dict
         """
-        data = yield self.execute('srvr')
+        if self._uses_backend('srvr'):
+            data = await self.execute_backend_async('srvr')
+            return self._update_info(admin.parse_srvr(data), update_host_info)
+        data = await self.execute_async('srvr')
         string = data.decode('utf-8')
         lines = string.split('\n')
         res = self._parse_info(lines, update_host_info)
-        raise gen.Return(res)
+        return res
 
     @command_executor
-    @gen.coroutine
-    def stat(self, update_host_info=True):
+    async def stat_async(self, update_host_info=True):
         """ Lists statistics about performance and connected clients
 
         Invokes `stat` command against host
@@ -254,149 +385,450 @@ class Host(object):
         Returns:
             False when fails, parsed info dict
         """
-        data = yield self.execute('stat')
-        lines = data.decode('utf-8').split('\n')
-        parsed, not_parsed, errors = self._parse_stat(lines)
+        if self._uses_backend('stat'):
+            data = await self.execute_backend_async('stat')
+            info = self._update_info(admin.parse_srvr(data), update_host_info)
+            info.update(admin.parse_stat(data))
+            return info
+        data = await self.execute_async('stat')
+        parsed, not_parsed, errors = self._parse_stat(self._lines(data))
         logging.debug(errors)
         info = self._parse_info(not_parsed, update_host_info)
         info.update(parsed)
-        raise gen.Return(info)
+        return self._mark_truncated(info, data)
 
     @command_executor
-    @gen.coroutine
-    def mntr(self, update_host_info=True):
+    async def cons_async(self):
+        """ Lists full connection/session details for all clients connected to this server
+
+        Invokes `cons` command against host, connections are parsed into columnar table.
+
+        Returns:
+            False when fails, sessions.ConsTable (`truncated` is set if response was truncated)
+        """
+        if self._uses_backend('cons'):
+            return admin.parse_cons(await self.execute_backend_async('cons'))
+        data = await self.execute_async('cons')
+        table, errors = sessions.parse(self._lines(data))
+        logging.debug(errors)
+        table.truncated = getattr(data, 'truncated', False)
+        return table
+
+    @command_executor
+    async def mntr_async(self, update_host_info=True):
         """ Lists statistics for monitoring the health of a cluster
 
-            The `mntr` 4lw was added in Zookeeper version 3.4.0
+            The `mntr` 4lw was added in Zookeeper version 3.4.0, version is taken
+            from host's info, if it is not known yet srvr is invoked first.
+            AdminServer backend (3.5+) skips the version check.
         """
+        if self._uses_backend('mntr'):
+            return admin.parse_mntr(await self.execute_backend_async('mntr'))
         result = {}
-        srvr = yield self.srvr()
-        m = re.match(r'^(?P<ver>[\d.-]+)', srvr['zookeeper'])
-        if m and LooseVersion(m.group('ver')) >= LooseVersion('3.4.0'):
-            data = yield self.execute('mntr')
-            lines = data.decode('utf-8').split('\n')
-            for line in lines:
-                if line:
-                    # only parse non-emtpy lines
-                    line = line.strip().split('\t')
-                    result[line[0]] = line[1]
+        version = self.info.get('zookeeper')
+        if not version:
+            srvr = await self.srvr_async()
+            if not srvr:
+                raise HostInvalidInfo('Unable to get version')
+            version = srvr['zookeeper']
+        m = re.match(r'^(?P<ver>[\d.-]+)', version)
+        if m and version_tuple(m.group('ver')) >= (3, 4, 0):
+            data = await self.execute_async('mntr')
+            self._mark_truncated(result, data)
+            # only parse non-emtpy lines
+            pairs = (line.strip().split('\t', 1) for line in self._lines(data) if line)
+            result.update(schema.parse_mntr(pair for pair in pairs if len(pair) == 2))
         else:
-            result['version_unsupprted'] = m.group('ver')
+            result['version_unsupprted'] = m.group('ver') if m else version
 
-        raise gen.Return(result)
+        return result
 
     @command_executor
-    @gen.coroutine
-    def srst(self):
+    async def srst_async(self):
         """ Reset statistics returned by stat command
         """
-        data = yield self.execute('srst')
-        raise gen.Return(data.decode('utf-8'))
+        data = await self.execute_async('srst')
+        return self._text(data)
 
     @command_executor
-    @gen.coroutine
-    def kill(self):
+    async def kill_async(self):
         """ Shuts down the server. This must be issued from the machine the ZooKeeper server is running on.
         """
-        data = yield self.execute('kill')
-        raise gen.Return(data.decode('utf-8'))
+        data = await self.execute_async('kill')
+        return self._text(data)
 
     @command_executor
-    @gen.coroutine
-    def ruok(self):
+    async def ruok_async(self):
         """ Tests if server is running in a non-error state.
 
         The server will respond with imok if it is running. Otherwise it will not respond at all.
         """
-        data = yield self.execute('ruok')
-        raise gen.Return(data.decode('utf-8'))
+        if self._uses_backend('ruok'):
+            await self.execute_backend_async('ruok')
+            return 'imok'
+        data = await self.execute_async('ruok')
+        return self._text(data)
 
     @command_executor
-    @gen.coroutine
-    def envi(self):
+    async def envi_async(self):
         """ Print details about serving environment
         """
-        data = yield self.execute('envi')
-        parsed = {}
-        for line in data.decode('utf-8').split('\n'):
+        data = await self.execute_async('envi')
+        parsed = self._mark_truncated({}, data)
+        for line in self._lines(data):
             if len(line) < 6:
                 continue
             arr = line.split('=', 1)  # NOQA
             parsed[arr[0].strip()]= arr[1].strip()
-        raise gen.Return(parsed)
+        return parsed
 
     @command_executor
-    @gen.coroutine
-    def dump(self):
+    async def conf_async(self):
+        """ Print details about serving configuration
+
+        Since Zookeeper 3.5 it contains also ensemble members (`server.N=` lines).
+        """
+        data = await self.execute_async('conf')
+        parsed = self._mark_truncated({}, data)
+        for line in self._lines(data):
+            arr = line.split('=', 1)
+            if len(arr) < 2 or not arr[0].strip():
+                continue
+            parsed[arr[0].strip()] = arr[1].strip()
+        return parsed
+
+    def _parse_servers(self, conf):
+        """ Parses ensemble members out of `conf` result
+
+        Understands both static `server.N=host:2888:3888[:role]` and dynamic
+        `server.N=host:2888:3888[:role];[client_addr:]client_port` formats.
+        If client port is not given, port of this host is used.
+
+        Args:
+            conf (dict): Parsed result of conf command
+        Returns:
+            List of dicts (id, addr, port, role) sorted by server id
+        """
+        servers = []
+        for key, val in conf.items():
+            match = self.RE_CONF_SERVER.match(key)
+            if not match:
+                continue
+            server, _, client = val.partition(';')
+            server_match = self.RE_CONF_ADDR.match(server.strip())
+            if not server_match:
+                logging.warning('Unable to parse conf server: %s=%s', key, val)
+                continue
+            addr = server_match.group(1).strip('[]')
+            port = self.port
+            if client.strip():
+                client_addr, _, client_port = client.strip().rpartition(':')
+                client_addr = client_addr.strip('[]')
+                if client_addr and client_addr not in ('0.0.0.0', '::', '0:0:0:0:0:0:0:0'):
+                    addr = client_addr
+                try:
+                    port = int(client_port)
+                except ValueError:
+                    logging.warning('Unable to parse conf client port: %s=%s', key, val)
+                    continue
+            servers.append({
+                'id': int(match.group(1)),
+                'addr': addr.lower(),
+                'port': port,
+                'role': (server_match.group(4) or 'participant').lower()
+            })
+        return sorted(servers, key=lambda server: server['id'])
+
+    @command_executor
+    async def wchs_async(self):
+        """ Lists brief information on watches for the server
+
+        Returns:
+            Dict of connections, paths and watches counts
+        """
+        data = await self.execute_async('wchs')
+        match = self.RE_WCHS.search(data.decode('utf-8'))
+        if not match:
+            raise HostInvalidInfo('Parse - dump wchs: {}'.format(data))
+        return {
+            'connections': int(match.group(1)),
+            'paths': int(match.group(2)),
+            'watches': int(match.group(3))
+        }
+
+    @command_executor
+    async def wchc_async(self, top=10, index=False):
+        """ Lists watches by session
+
+        Output is parsed while being read, so only aggregates and `top` sessions
+        with the most watches are kept - see WatchParser.
+
+        Args:
+            top (int): Number of sessions with the most watches to return
+            index (bool): If true returns also full session -> paths index
+        Returns:
+            Dict - see WatchParser.close
+        """
+        parser = WatchParser(top, index)
+        await self.execute_stream_async('wchc', parser.feed)
+        return parser.close()
+
+    @command_executor
+    async def wchp_async(self, top=10, index=False):
+        """ Lists watches by path
+
+        Output is parsed while being read, so only aggregates and `top` paths
+        with the most watches are kept - see WatchParser.
+
+        Args:
+            top (int): Number of paths with the most watches to return
+            index (bool): If true returns also full path -> sessions index
+        Returns:
+            Dict - see WatchParser.close
+        """
+        parser = WatchParser(top, index)
+        await self.execute_stream_async('wchp', parser.feed)
+        return parser.close()
+
+    @command_executor
+    async def dump_async(self):
         """ Lists the outstanding sessions and ephemeral nodes. This only works on the leader.
 
         Todo:
             Output need to be parsed.
         """
-        data = yield self.execute('dump')
-        raise gen.Return(data.decode('utf-8'))
+        data = await self.execute_async('dump')
+        return self._text(data)
 
     @command_executor
-    @gen.coroutine
-    def reqs(self):
+    async def reqs_async(self):
         """ List outstanding requests
 
         Todo:
             Output need to be parsed.
         """
-        data = yield self.execute('reqs')
-        raise gen.Return(data.decode('utf-8'))
+        data = await self.execute_async('reqs')
+        return self._text(data)
+
+    async def poll_async(self, commands=POLL_COMMANDS, timeout=None):
+        """ Runs several commands concurrently under one shared deadline
+
+        Every command has its own connection, so a slow one never delays the others.
+        Commands that are not finished before the deadline are cancelled. The deadline
+        counts from the moment a command gets limiter's slot, commands which didn't get
+        one within QUEUE_TIMEOUT fail with `queue timeout` error, not counted in health.
+
+        Args:
+            commands (list): Commands names ex. ['srvr', 'stat', 'mntr']
+            timeout (int, float): Deadline in seconds of every command, default host's timeout
+        Returns:
+            Dict of:
+                - host (string) - host's name
+                - ok (bool) - True if all commands succeeded
+                - elapsed (float) - seconds
+                - info (dict) - merged srvr/stat info
+                - stat (dict) - head and clients of stat, if polled
+                - <command> - parsed result of every other succeeded command
+                - commands (dict) - command -> ok, elapsed and error (message, TIMEOUT or QUEUE_TIMEOUT)
+        Raises:
+            HostUnknownCommandError: If Host doesn't implement some of commands
+        """
+        funcs = []
+        for cmd in commands:
+            method = getattr(type(self), '{}_async'.format(cmd), None)
+            if method is None or not hasattr(method, '__wrapped__'):
+                raise HostUnknownCommandError('Unable to poll command: {}'.format(cmd))
+            funcs.append(method.__wrapped__)
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        timeout = self.timeout if timeout is None else timeout
+        elapsed = {}
+
+        async def run(cmd, func):
+            try:
+                async with self.command_slot():
+                    return await asyncio.wait_for(func(self), timeout)
+            finally:
+                elapsed[cmd] = loop.time() - start
+
+        tasks = dict((cmd, asyncio.ensure_future(run(cmd, func))) for cmd, func in zip(commands, funcs))
+        await asyncio.wait(list(tasks.values()))
+
+        status = {}
+        record = {'host': str(self), 'info': {}, 'commands': status}
+        for cmd, task in tasks.items():
+            if isinstance(task.exception(), asyncio.TimeoutError):
+                status[cmd] = {'ok': False, 'error': Host.HOST_TIMEOUT, 'elapsed': elapsed[cmd]}
+                continue
+            if isinstance(task.exception(), HostQueueTimeout):
+                status[cmd] = {'ok': False, 'error': Host.QUEUE_TIMEOUT_ERROR, 'elapsed': elapsed[cmd]}
+                continue
+            status[cmd] = {'ok': task.exception() is None, 'elapsed': elapsed[cmd]}
+            if cmd in self.timings:
+                status[cmd]['wait'] = self.timings[cmd]['wait']
+            if task.exception() is not None:
+                logging.warning('Exception: %s %s', cmd, task.exception())
+                status[cmd]['error'] = str(task.exception()) or Host.HOST_ERROR
+                continue
+            result = task.result()
+            if cmd in ('srvr', 'stat'):
+                info = dict(result)
+                if cmd == 'stat':
+                    record['stat'] = {'head': info.pop('head'), 'clients': info.pop('clients')}
+                record['info'].update(info)
+            else:
+                record[cmd] = result
+
+        succeeded = [cmd for cmd in commands if status[cmd]['ok']]
+        # commands which never got limiter's slot say nothing about host
+        failed = [cmd for cmd in commands if status[cmd].get('error') != Host.QUEUE_TIMEOUT_ERROR]
+        if failed and not succeeded:
+            timeouts = [cmd for cmd in failed if status[cmd]['error'] == Host.HOST_TIMEOUT]
+            self.health = Host.HOST_TIMEOUT if len(timeouts) == len(failed) else Host.HOST_ERROR
+        record['ok'] = len(succeeded) == len(commands)
+        record['elapsed'] = loop.time() - start
+        return record
 
     @gen.coroutine
     def get_info(self):
         """ Get host info dict
 
         Returns:
-            Host's attributtes as dictionary.
+            Host's public attributtes as dictionary (with handshakes' stats under `tls` if TLS is set).
         """
-        raise gen.Return(self.__dict__)
+        info = dict((key, val) for key, val in self.__dict__.items() if not key.startswith('_'))
+        if self._tls is not None:
+            info['tls'] = self._tls.get_stats()
+        raise gen.Return(info)
 
-    @gen.coroutine
-    def execute(self, cmd):
+    async def execute_async(self, cmd):
         """ Executes `cmd` on host and returns results
 
-        Creates socket and tries to execute command against zookeeper. Socket
-        is limited by quasi-Tornado's timeout. It doesn't check validity of response.
+        Creates socket and tries to execute command against zookeeper.
+        It doesn't check validity of response, nor limits time - see command_executor.
 
-        Note:
-            Timeout should be implemented using tornado.concurrent.chain_future:
-            https://github.com/tornadoweb/tornado/blob/master/tornado/concurrent.py#L316
-
-            such a wrapper exists in Tornado 4.0+ - with_timeout
-            https://github.com/tornadoweb/tornado/blob/master/tornado/gen.py#L507
+        Command waits for a slot of global limiter (see zk.limits) first, time spent
+        in queue, command's latency, bytes read and TLS handshake's time (and whether
+        the session was resumed) are stored in `timings`.
+        Response size is limited - see get_max_bytes. Connection is TLS if set - see set_tls.
 
         Args:
             cmd: Four-letter string containing command to execute
         Returns:
             Raw response - bytes.
         Raises:
-            HostConnectionTimeout: If sum times of connection, request, respons exceeds timeout
             Socket Errors: like ECONNNECTIONREFUSED,...
         """
+        max_bytes, overflow = self.get_max_bytes(cmd.strip())
+        async with self.command_slot() as slot:
+            start = asyncio.get_running_loop().time()
+            response = None
+            try:
+                response = await transport.request(self.addr, self.port, cmd, max_bytes, overflow, self._tls)
+                if response.truncated:
+                    logging.warning('Response of %s truncated to %s bytes (%s read)', cmd, max_bytes, response.nbytes)
+                return response
+            finally:
+                self._update_timings(cmd, slot.wait, start, response)
+
+    @contextlib.asynccontextmanager
+    async def command_slot(self):
+        """ Holds limiter's slot of a command (see zk.limits)
+
+        Slot is taken once per command, before command's timeout starts (see command_executor),
+        execute methods called within reuse it. Waiting is bounded by QUEUE_TIMEOUT.
+
+        Yields:
+            Slot (with `wait` - seconds spent in queue)
+        Raises:
+            HostQueueTimeout: If there was no free slot within QUEUE_TIMEOUT
+        """
+        slot = _slot.get()
+        if slot is not None:
+            yield slot
+            return
+        async with limits.limiter.slot(self.cluster, self.QUEUE_TIMEOUT) as slot:
+            token = _slot.set(slot)
+            try:
+                yield slot
+            finally:
+                _slot.reset(token)
+
+    def _uses_backend(self, cmd):
+        return self._backend is not None and self._backend.supports(cmd)
+
+    async def execute_backend_async(self, cmd):
+        """ Executes `cmd` through backend (see set_backend) and returns decoded response
+
+        Like execute_async it waits for limiter's slot, stores `timings` and limits response size
+        (exceeding AdminServer's response is always aborted, partial JSON can't be parsed).
+
+        Args:
+            cmd: Four-letter command supported by backend
+        Returns:
+            Decoded JSON response - dict
+        Raises:
+            HostInvalidInfo: If server responded with error
+            HostResponseTooLarge: If response exceeds max_bytes
+        """
+        max_bytes = self.get_max_bytes(cmd)[0]
+        async with self.command_slot() as slot:
+            start = asyncio.get_running_loop().time()
+            response = None
+            try:
+                data, response = await self._backend.request(self.addr, cmd, max_bytes)
+                return data
+            finally:
+                self._update_timings(cmd, slot.wait, start, response)
 
-        ioloop = IOLoop.current()
-        address_family, addr = yield self._resolve(ioloop)
-        stream = IOStream(socket.socket(address_family), io_loop=ioloop)
-        stream.connect(addr)
-        cmd = '{}\n'.format(cmd.strip())
-        yield gen.Task(stream.write, cmd.encode('utf-8'))
-        data = yield gen.Task(stream.read_until_close)
-        raise gen.Return(data)
+    async def execute_stream_async(self, cmd, callback, chunk_size=transport.CHUNK_SIZE):
+        """ Executes `cmd` on host and passes response in chunks to callback
 
-    @gen.coroutine
-    def _resolve(self, ioloop):
-        """ Resolve host addr (domain)
+        The same as execute_async, but response is never buffered as a whole.
 
         Args:
-            ioloop (IOLoop): io_loop to use
+            cmd: Four-letter string containing command to execute
+            callback: Function called with every chunk (bytes) of response
+            chunk_size: Max size of a chunk
         Returns:
-            Tuple of address family and ip address
+            Number of bytes read
         """
-        resolver = Resolver(io_loop=ioloop)
-        addrinfo = yield resolver.resolve(self.addr, int(self.port), socket.AF_UNSPEC)
-        raise gen.Return(addrinfo[0])
+        async with self.command_slot() as slot:
+            start = asyncio.get_running_loop().time()
+            size = None
+            try:
+                size = await transport.stream(self.addr, self.port, cmd, callback, chunk_size, self._tls)
+                return size
+            finally:
+                self._update_timings(cmd, slot.wait, start, size=size)
+
+    def _update_timings(self, cmd, wait, start, response=None, size=None):
+        """ Stores last queue wait, latency, size of command's response and TLS handshake's time """
+        self.timings[cmd.strip()] = {
+            'wait': wait,
+            'latency': asyncio.get_running_loop().time() - start,
+            'bytes': response.nbytes if response is not None else size,
+            'truncated': response.truncated if response is not None else False,
+            'handshake': response.handshake if response is not None else None,
+            'resumed': response.resumed if response is not None else False,
+        }
+
+    # tornado's gen.coroutine API - thin shims over native coroutines
+    srvr = coroutine_shim(srvr_async)
+    stat = coroutine_shim(stat_async)
+    cons = coroutine_shim(cons_async)
+    mntr = coroutine_shim(mntr_async)
+    srst = coroutine_shim(srst_async)
+    kill = coroutine_shim(kill_async)
+    ruok = coroutine_shim(ruok_async)
+    envi = coroutine_shim(envi_async)
+    conf = coroutine_shim(conf_async)
+    wchs = coroutine_shim(wchs_async)
+    wchc = coroutine_shim(wchc_async)
+    wchp = coroutine_shim(wchp_async)
+    dump = coroutine_shim(dump_async)
+    reqs = coroutine_shim(reqs_async)
+    poll = coroutine_shim(poll_async)
+    execute = coroutine_shim(execute_async)
+    execute_stream = coroutine_shim(execute_stream_async)
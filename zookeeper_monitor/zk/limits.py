@@ -0,0 +1,213 @@
+# -*- coding:utf-8 -*-
+""" Outbound connections limits.
+
+Every command (Host.execute_async) takes a slot from the global limiter first:
+    - at most `max_connections` commands are in flight at once,
+    - each cluster can be rate limited with a token bucket,
+    - waiting commands are served round-robin across clusters, so a big
+      (or flooded) cluster can't starve the others,
+    - waiting can be bounded - HostQueueTimeout is raised then.
+
+Example:
+
+    limiter.set_max_connections(64)
+    limiter.set_rate('some-cluster', rate=20, burst=40)
+
+    async with limiter.slot('some-cluster', timeout=10) as slot:
+        print(slot.wait)  # seconds spent in queue
+
+"""
+import asyncio
+from collections import OrderedDict, deque
+from .exceptions import HostQueueTimeout
+
+
+class TokenBucket(object):
+    """ Token bucket rate limiter """
+
+    def __init__(self, rate, burst=None):
+        """ Create bucket
+
+        Args:
+            rate (int, float): Tokens per second
+            burst (int): Bucket size, default max(rate, 1)
+        """
+        self.rate = float(rate)
+        self.burst = float(burst or max(rate, 1))
+        self.tokens = self.burst
+        self.updated = None
+
+    def _refill(self, now):
+        if self.updated is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now):
+        """ Seconds until a token is available, 0 if it is available now """
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now):
+        """ Takes a token, returns False if there was none """
+        if self.delay(now) > 0:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class Slot(object):
+    """ Async context manager holding limiter's slot """
+
+    def __init__(self, limiter, cluster, timeout=None):
+        self.limiter = limiter
+        self.cluster = cluster
+        self.timeout = timeout
+        self.wait = None
+
+    async def __aenter__(self):
+        self.wait = await self.limiter.acquire(self.cluster, self.timeout)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.limiter.release()
+
+
+class ConnectionLimiter(object):
+    """ Global concurrency limit with per cluster rate limits and fair queueing """
+
+    MAX_CONNECTIONS = 256
+
+    def __init__(self, max_connections=MAX_CONNECTIONS):
+        """ Create limiter
+
+        Args:
+            max_connections (int): Max commands in flight, None means unlimited
+        """
+        self.max_connections = max_connections
+        self.active = 0
+        self._queues = OrderedDict()
+        self._buckets = {}
+        self._timer = None
+
+    def set_max_connections(self, max_connections):
+        """ Sets max commands in flight, None means unlimited """
+        self.max_connections = max_connections
+        self._dispatch()
+
+    def set_rate(self, cluster, rate, burst=None):
+        """ Sets cluster's rate limit
+
+        Args:
+            cluster (string): Cluster's name
+            rate (int, float): Commands per second, None removes limit
+            burst (int): Max commands at once, default rate
+        """
+        if rate:
+            self._buckets[cluster] = TokenBucket(rate, burst)
+        else:
+            self._buckets.pop(cluster, None)
+        self._dispatch()
+
+    def queued(self):
+        """ Number of commands waiting for a slot """
+        return sum(len(queue) for queue in self._queues.values())
+
+    def slot(self, cluster=None, timeout=None):
+        """ Gets slot context manager
+
+        Args:
+            cluster (string): Cluster's name
+            timeout (int, float): Max seconds in queue, None - unbounded
+        Returns:
+            Slot - async context manager
+        """
+        return Slot(self, cluster, timeout)
+
+    async def acquire(self, cluster=None, timeout=None):
+        """ Waits for a slot
+
+        Every acquire has to be followed by release.
+
+        Args:
+            cluster (string): Cluster's name
+            timeout (int, float): Max seconds in queue, None - unbounded
+        Returns:
+            Seconds spent in queue
+        Raises:
+            HostQueueTimeout: If there was no free slot within timeout
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        if not self._queues and self._has_capacity():
+            bucket = self._buckets.get(cluster)
+            if bucket is None or bucket.consume(start):
+                self.active += 1
+                return 0.0
+        waiter = loop.create_future()
+        self._queues.setdefault(cluster, deque()).append(waiter)
+        self._dispatch()
+        try:
+            await asyncio.wait([waiter], timeout=timeout)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+        if not waiter.done():
+            waiter.cancel()
+            raise HostQueueTimeout('No free slot of {} within {}s'.format(cluster, timeout))
+        return loop.time() - start
+
+    def release(self):
+        """ Frees a slot """
+        self.active -= 1
+        self._dispatch()
+
+    def _has_capacity(self):
+        return not self.max_connections or self.active < self.max_connections
+
+    def _dispatch(self):
+        """ Hands free slots to waiting commands, round-robin across clusters """
+        if not self._queues:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        wait = None
+        while self._has_capacity():
+            served = False
+            for cluster in list(self._queues):
+                queue = self._queues[cluster]
+                while queue and queue[0].done():
+                    queue.popleft()
+                if not queue:
+                    del self._queues[cluster]
+                    continue
+                bucket = self._buckets.get(cluster)
+                delay = bucket.delay(now) if bucket else 0
+                if delay > 0:
+                    wait = delay if wait is None else min(wait, delay)
+                    continue
+                if bucket:
+                    bucket.consume(now)
+                self.active += 1
+                queue.popleft().set_result(None)
+                if queue:
+                    self._queues.move_to_end(cluster)
+                else:
+                    del self._queues[cluster]
+                served = True
+                break
+            if not served:
+                break
+        if wait is not None and self._timer is None:
+            self._timer = loop.call_later(wait, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+
+limiter = ConnectionLimiter()
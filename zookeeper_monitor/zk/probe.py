@@ -0,0 +1,392 @@
+# -*- coding:utf-8 -*-
+""" Mass ruok probe - liveness of thousands of servers at a low CPU cost per probe
+
+ruok/imok exchange is tiny, so a per-command coroutine (limiter's slot, wait_for's
+timeout, loop.sock_* futures) costs more than the probe itself. Prober drives raw
+non-blocking sockets instead:
+
+    - sockets of all probes are registered in one selector (epoll, kqueue), whose
+      descriptor is watched by the loop - a single callback handles all ready sockets
+    - deadlines are kept in one hashed timer wheel, checked once per tick
+    - at most `max_open` sockets are open at once, the rest wait for a free one
+    - hosts' liveness (Host.alive) is updated in bulk, when all probes are done
+
+Failed probe sets host's health (TIMEOUT, ERROR), imok moves only UNCHECKED and TIMEOUT
+hosts to OK - ERROR may come from srvr's validation (ruok can't tell), the next poll clears it.
+
+Hosts with TLS or backend (see Host.set_tls, Host.set_backend) are probed with
+Host.ruok_async concurrently. Probes bypass the rate limiter (zk.limits).
+
+Example:
+
+    prober = Prober(timeout=2)
+    health = await prober.probe_async(cluster.get_hosts())  # {'zk1:2181': 'OK', ...}
+
+"""
+import asyncio
+import errno
+import selectors
+import socket
+import time
+from .host import Host
+from . import transport
+
+TICK = 0.05
+""" Timer wheel's resolution in seconds """
+SLOTS = 512
+MAX_OPEN = 512
+
+RUOK = b'ruok\n'
+IMOK = b'imok'
+# health imok may change to OK
+RECOVERABLE = (Host.HOST_UNCHECKED, Host.HOST_TIMEOUT)
+
+CONNECTING = 1
+READING = 2
+
+
+class TimerWheel(object):
+    """ Hashed timer wheel - O(1) scheduling and cancelling, expiry checked per tick
+
+    Deadlines are hashed into `slots` buckets by tick, a deadline further than one revolution
+    stays in its bucket until the revolution it is due in.
+    """
+
+    def __init__(self, tick=TICK, slots=SLOTS, now=0.0):
+        """
+        Args:
+            tick (float): Resolution in seconds
+            slots (int): Number of buckets
+            now (float): Current time, on the clock deadlines are given in
+        """
+        self.tick = float(tick)
+        self._slots = [{} for _ in range(slots)]
+        self._keys = {}
+        self._current = int(now / self.tick)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def schedule(self, key, deadline):
+        """ Schedules (or reschedules) key's deadline """
+        self.cancel(key)
+        slot = max(int(deadline / self.tick), self._current) % len(self._slots)
+        self._slots[slot][key] = deadline
+        self._keys[key] = slot
+
+    def cancel(self, key):
+        slot = self._keys.pop(key, None)
+        if slot is not None:
+            del self._slots[slot][key]
+
+    def advance(self, now):
+        """ Moves the wheel to `now`
+
+        Returns:
+            List of expired keys (deadline <= now), they are removed from the wheel
+        """
+        expired = []
+        end = int(now / self.tick)
+        for tick in range(self._current, min(end, self._current + len(self._slots) - 1) + 1):
+            bucket = self._slots[tick % len(self._slots)]
+            for key, deadline in list(bucket.items()):
+                if deadline <= now:
+                    del bucket[key]
+                    del self._keys[key]
+                    expired.append(key)
+        self._current = max(end, self._current)
+        return expired
+
+
+class Probe(object):
+    """ State of a single host's probe """
+
+    __slots__ = ('host', 'sockaddr', 'family', 'sock', 'state', 'data', 'start', 'health', 'latency')
+
+    def __init__(self, host, family=None, sockaddr=None):
+        self.host = host
+        self.family = family
+        self.sockaddr = sockaddr
+        self.sock = None
+        self.state = None
+        self.data = b''
+        self.start = None
+        self.health = None
+        self.latency = None
+
+
+def ip_sockaddr(addr, port):
+    """ Gets address family and socket address of IP literal
+
+    Returns:
+        Tuple of family and sockaddr, None if addr is not an IP
+    """
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, addr)
+        except (OSError, ValueError):
+            continue
+        return family, (addr, int(port))
+    return None
+
+
+class Batch(object):
+    """ Probes of one Prober.probe_async call, multiplexed by one selector """
+
+    def __init__(self, loop, probes, timeout, max_open, tick):
+        self.loop = loop
+        self.timeout = timeout
+        self.max_open = max_open
+        self.tick = tick
+        self.queue = list(reversed(probes))
+        self.pending = len(probes)
+        self.open = 0
+        self.selector = selectors.DefaultSelector()
+        self.wheel = TimerWheel(tick, SLOTS, loop.time())
+        self.done = loop.create_future()
+        self._reader = None
+        self._timer = None
+        self._admitting = False
+
+    async def run(self):
+        try:
+            if not self.pending:
+                return
+            try:
+                self.loop.add_reader(self.selector.fileno(), self.on_ready)
+                self._reader = self.selector.fileno()
+            except (AttributeError, NotImplementedError):
+                # selector without descriptor (select) or loop without add_reader - polled per tick
+                pass
+            self._timer = self.loop.call_later(self.tick, self.on_tick)
+            self.admit()
+            await self.done
+        finally:
+            self.close()
+
+    def admit(self):
+        # probes failing at once (ex. unreachable network) finish inside connect - the loop
+        # admits the next one, no recursion through finish
+        if self._admitting:
+            return
+        self._admitting = True
+        try:
+            while self.queue and self.open < self.max_open:
+                self.connect(self.queue.pop())
+        finally:
+            self._admitting = False
+
+    def connect(self, probe):
+        """ Starts probe's connect
+
+        Returns:
+            True if socket is registered, False if probe failed at once
+        """
+        probe.start = self.loop.time()
+        try:
+            probe.sock = socket.socket(probe.family, socket.SOCK_STREAM)
+            probe.sock.setblocking(False)
+            err = probe.sock.connect_ex(probe.sockaddr)
+        except OSError as exception:
+            err = exception.errno
+        if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN):
+            self.finish(probe, Host.HOST_ERROR)
+            return False
+        self.open += 1
+        probe.state = CONNECTING
+        self.selector.register(probe.sock, selectors.EVENT_WRITE, probe)
+        self.wheel.schedule(probe, probe.start + self.timeout)
+        return True
+
+    def on_ready(self):
+        """ The single callback of all probes' sockets """
+        for key, _ in self.selector.select(0):
+            probe = key.data
+            if probe.state == CONNECTING:
+                self.on_connected(probe)
+            elif probe.state == READING:
+                self.on_readable(probe)
+
+    def on_connected(self, probe):
+        try:
+            if probe.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) or probe.sock.send(RUOK) != len(RUOK):
+                self.finish(probe, Host.HOST_ERROR)
+                return
+        except OSError:
+            self.finish(probe, Host.HOST_ERROR)
+            return
+        probe.state = READING
+        self.selector.modify(probe.sock, selectors.EVENT_READ, probe)
+
+    def on_readable(self, probe):
+        # server closes connection after imok, so FIN usually comes with data - read it in one go
+        while True:
+            try:
+                data = probe.sock.recv(16)
+            except BlockingIOError:
+                return
+            except OSError:
+                self.finish(probe, Host.HOST_ERROR)
+                return
+            if not data:
+                self.finish(probe, Host.HOST_HEALTHY if probe.data == IMOK else Host.HOST_ERROR)
+                return
+            probe.data += data
+            if len(probe.data) > len(IMOK):
+                self.finish(probe, Host.HOST_ERROR)
+                return
+
+    def on_tick(self):
+        if self._reader is None:
+            self.on_ready()
+        for probe in self.wheel.advance(self.loop.time()):
+            self.finish(probe, Host.HOST_TIMEOUT)
+        if self.pending:
+            self._timer = self.loop.call_later(self.tick, self.on_tick)
+
+    def finish(self, probe, health):
+        probe.health = health
+        probe.latency = self.loop.time() - probe.start
+        if probe.sock is not None:
+            if probe.state is not None:
+                self.selector.unregister(probe.sock)
+                self.wheel.cancel(probe)
+                self.open -= 1
+            probe.sock.close()
+            probe.sock = None
+        probe.state = None
+        self.pending -= 1
+        if not self.pending:
+            if not self.done.done():
+                self.done.set_result(None)
+        else:
+            self.admit()
+
+    def close(self):
+        """ Stops callbacks, sockets of unfinished (cancelled) probes are closed """
+        if self._reader is not None:
+            self.loop.remove_reader(self._reader)
+            self._reader = None
+        if self._timer is not None:
+            self._timer.cancel()
+        for key in list(self.selector.get_map().values()):
+            key.fileobj.close()
+        self.selector.close()
+
+
+def update_host(host, health):
+    """ Sets host's liveness and health after probe
+
+    Args:
+        host (Host): Probed host
+        health (string): Probe's result - OK, ERROR or TIMEOUT
+    """
+    host.alive = health == Host.HOST_HEALTHY
+    if not host.alive or host.health in RECOVERABLE:
+        host.health = health
+
+
+class Prober(object):
+    """ Bulk ruok probe of many hosts
+
+    Attributes:
+        timeout (float): Probe's deadline in seconds, counted from its connect
+        max_open (int): Max number of sockets open at once
+        tick (float): Timer wheel's resolution
+    """
+
+    def __init__(self, timeout=2, max_open=MAX_OPEN, tick=TICK):
+        self.timeout = timeout
+        self.max_open = max_open
+        self.tick = tick
+        self.stats = {'rounds': 0, 'probes': 0, Host.HOST_HEALTHY: 0, Host.HOST_ERROR: 0, Host.HOST_TIMEOUT: 0,
+                      'elapsed': 0.0, 'cpu': 0.0}
+
+    async def probe_async(self, hosts, update_host_info=True):
+        """ Probes hosts with ruok
+
+        Args:
+            hosts (list): Hosts
+            update_host_info (bool): Set hosts' liveness and health (in bulk, when all probes are done,
+                see update_host)
+                and store `ruok` latency in their timings (failed Host.ruok_async of TLS or
+                backend's hosts sets health anyway)
+        Returns:
+            Dict of host's name -> health (OK, ERROR or TIMEOUT)
+        """
+        loop = asyncio.get_running_loop()
+        start, cpu = time.perf_counter(), time.process_time()
+        probes = []
+        delegated = []
+        resolving = []
+        for host in hosts:
+            if host._tls is not None or host._uses_backend('ruok'):
+                delegated.append(host)
+                continue
+            sockaddr = ip_sockaddr(host.addr, host.port)
+            if sockaddr is None:
+                resolving.append(host)
+            else:
+                probes.append(Probe(host, *sockaddr))
+        if resolving:
+            probes.extend(await self._resolve(resolving))
+
+        batch = Batch(loop, [probe for probe in probes if probe.health is None], self.timeout, self.max_open,
+                      self.tick)
+        tasks = [asyncio.ensure_future(host.ruok_async()) for host in delegated]
+        await batch.run()
+        results = await asyncio.gather(*tasks)
+
+        health = {}
+        for probe in probes:
+            health[str(probe.host)] = probe.health
+        for host, result in zip(delegated, results):
+            health[str(host)] = Host.HOST_HEALTHY if result == IMOK.decode('utf-8') else host.health
+        if update_host_info:
+            for probe in probes:
+                update_host(probe.host, probe.health)
+                probe.host.timings['ruok'] = {'wait': 0, 'latency': probe.latency, 'bytes': len(probe.data),
+                                              'truncated': False, 'handshake': None, 'resumed': False}
+            for host in delegated:
+                update_host(host, health[str(host)])
+
+        self.stats['rounds'] += 1
+        self.stats['probes'] += len(health)
+        for value in health.values():
+            self.stats[value] = self.stats.get(value, 0) + 1
+        self.stats['elapsed'] += time.perf_counter() - start
+        self.stats['cpu'] += time.process_time() - cpu
+        return health
+
+    async def _resolve(self, hosts):
+        """ Resolves domains concurrently within timeout, failed ones are finished as ERROR/TIMEOUT """
+        loop = asyncio.get_running_loop()
+        tasks = [asyncio.ensure_future(transport.resolve(host.addr, host.port)) for host in hosts]
+        start = loop.time()
+        await asyncio.wait(tasks, timeout=self.timeout)
+        probes = []
+        for host, task in zip(hosts, tasks):
+            probe = Probe(host)
+            if not task.done():
+                task.cancel()
+                probe.health = Host.HOST_TIMEOUT
+            elif task.exception() is not None:
+                probe.health = Host.HOST_ERROR
+            else:
+                probe.family, probe.sockaddr = task.result()
+            if probe.health is not None:
+                probe.latency = loop.time() - start
+            probes.append(probe)
+        return probes
+
+    def get_stats(self):
+        """ Gets probes' stats
+
+        Returns:
+            Dict of rounds, probes, number of OK, ERROR and TIMEOUT results, rate (probes
+            per second of probing) and cpu_per_probe (seconds of process' CPU time)
+        """
+        stats = dict(self.stats)
+        stats['rate'] = stats['probes'] / stats['elapsed'] if stats['elapsed'] else None
+        stats['cpu_per_probe'] = stats['cpu'] / stats['probes'] if stats['probes'] else None
+        return stats
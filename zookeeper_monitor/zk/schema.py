@@ -0,0 +1,120 @@
+# -*- coding:utf-8 -*-
+""" Typed fields of srvr/stat and mntr responses.
+
+Values of known fields are converted once at parse time, composite ones are
+expanded into separate fields:
+
+    - zxid: 0x100000003 -> zxid 4294967299, zxid_epoch 1, zxid_counter 3
+    - latency: 0/1.5/12 -> latency_min 0, latency_avg 1.5, latency_max 12
+
+Unknown fields are passed through as strings. Keys are interned, so keys of
+every poll share the same string objects.
+
+Example:
+
+    parse([('zxid', '0x100000003'), ('mode', 'follower')], SRVR)
+
+"""
+import logging
+import sys
+
+
+def number(value):
+    """ Converts to int, or to float if it has decimal point (newer servers report avg latency as float) """
+    return float(value) if '.' in value else int(value)
+
+
+def zxid(value):
+    """ Expands zxid (hex) into zxid, zxid_epoch and zxid_counter """
+    value = int(value, 16)
+    return (('zxid', value), ('zxid_epoch', value >> 32), ('zxid_counter', value & 0xffffffff))
+
+
+def latency(value):
+    """ Expands min/avg/max latency into latency_min, latency_avg and latency_max """
+    low, avg, high = value.split('/')
+    return (('latency_min', number(low)), ('latency_avg', number(avg)), ('latency_max', number(high)))
+
+
+SRVR = {
+    'latency': latency,
+    'zxid': zxid,
+    'received': int,
+    'sent': int,
+    'connections': int,
+    'outstanding': int,
+    'node': int,
+}
+""" srvr/stat fields, keys are lowercased first words ex. `Node count` -> node """
+
+SRVR_COMPOSITE = frozenset(('latency', 'zxid'))
+
+MNTR = dict((key, number) for key in (
+    'zk_avg_latency',
+    'zk_max_latency',
+    'zk_min_latency',
+    'zk_packets_received',
+    'zk_packets_sent',
+    'zk_num_alive_connections',
+    'zk_outstanding_requests',
+    'zk_znode_count',
+    'zk_watch_count',
+    'zk_ephemerals_count',
+    'zk_approximate_data_size',
+    'zk_open_file_descriptor_count',
+    'zk_max_file_descriptor_count',
+    'zk_followers',
+    'zk_synced_followers',
+    'zk_pending_syncs',
+    'zk_last_proposal_size',
+    'zk_max_proposal_size',
+    'zk_min_proposal_size',
+    'zk_fsync_threshold_exceed_count',
+    'zk_uptime',
+    'zk_global_sessions',
+    'zk_local_sessions',
+    'zk_max_client_response_size',
+    'zk_min_client_response_size',
+    'zk_last_client_response_size',
+))
+""" mntr fields """
+
+
+def parse(pairs, schema, composite=frozenset()):
+    """ Converts (key, value) pairs into dict of typed values
+
+    Value which doesn't match its field's type is kept as string.
+
+    Args:
+        pairs: Iterable of (key, value) strings
+        schema (dict): Key -> converter
+        composite (set): Keys whose converters return pairs of expanded fields
+    Returns:
+        Dict
+    """
+    result = {}
+    for key, value in pairs:
+        key = sys.intern(key)
+        convert = schema.get(key)
+        if convert is None:
+            result[key] = value
+            continue
+        try:
+            if key in composite:
+                result.update(convert(value))
+            else:
+                result[key] = convert(value)
+        except ValueError:
+            logging.debug('Unable to convert %s: %s', key, value)
+            result[key] = value
+    return result
+
+
+def parse_srvr(pairs):
+    """ Parses srvr/stat fields, see parse """
+    return parse(pairs, SRVR, SRVR_COMPOSITE)
+
+
+def parse_mntr(pairs):
+    """ Parses mntr fields, see parse """
+    return parse(pairs, MNTR)
@@ -0,0 +1,205 @@
+# -*- coding:utf-8 -*-
+""" Connections and sessions listed by `cons`.
+
+Every `cons` line is a client (the same as in `stat`) with session's details:
+
+    /10.0.0.1:53512[1](queued=0,recved=9,sent=9,sid=0x100d,lop=PING,est=1600000000000,to=30000,
+        lcxid=0x3,lzxid=0x21,lresp=1600000005000,llat=0,minlat=0,avglat=0,maxlat=2)
+
+Connections are kept in a columnar table - numeric fields in typed arrays (MISSING if
+the connection has no session yet), so cluster-wide percentiles and top-K are computed
+in bulk over columns instead of dicts.
+
+All analytics work on dict host's name -> result of Host.cons(), hosts which
+failed (False) are skipped - as in zk.clients.
+
+Example:
+
+    tables = yield dict((str(host), host.cons()) for host in cluster.get_hosts())
+    percentiles(tables, 'avglat')
+    top_sessions(tables, by='maxlat', limit=10)
+
+"""
+import heapq
+import itertools
+import math
+import re
+from array import array
+from bisect import bisect_left
+
+MISSING = -1
+
+COLUMNS = (
+    'host', 'port', 'n', 'queued', 'recved', 'sent', 'sid', 'lop', 'est', 'to',
+    'lcxid', 'lzxid', 'lresp', 'llat', 'minlat', 'avglat', 'maxlat'
+)
+TEXT_COLUMNS = frozenset(('host', 'sid', 'lop', 'lcxid', 'lzxid'))
+FLOAT_COLUMNS = frozenset(('avglat',))
+RANKED_COLUMNS = ('queued', 'recved', 'sent', 'llat', 'minlat', 'avglat', 'maxlat')
+""" Columns percentiles and top sessions can be computed by """
+
+RE_CONS_LINE = re.compile(r'^/(.+):(\d+)\[(\d+)\]\((.*)\)$')
+
+
+class ConsTable(object):
+    """ Columnar table of connections """
+
+    def __init__(self):
+        self.columns = dict(
+            (name, [] if name in TEXT_COLUMNS else array('d' if name in FLOAT_COLUMNS else 'q'))
+            for name in COLUMNS
+        )
+        self.truncated = False
+
+    def __len__(self):
+        return len(self.columns['host'])
+
+    def append(self, values):
+        """ Appends connection
+
+        Args:
+            values (dict): Column -> string value, missing columns are MISSING (None for text ones)
+        Raises:
+            ValueError: If numeric value is invalid, table is left unchanged
+        """
+        row = []
+        for name in COLUMNS:
+            value = values.get(name)
+            if name in TEXT_COLUMNS:
+                row.append(value)
+            elif value is None:
+                row.append(MISSING)
+            else:
+                row.append(float(value) if name in FLOAT_COLUMNS else int(value))
+        for name, value in zip(COLUMNS, row):
+            self.columns[name].append(value)
+
+    def column(self, name):
+        """ Gets column - array for numeric, list for text ones """
+        return self.columns[name]
+
+    def row(self, index):
+        """ Gets connection as dict, missing values are None """
+        row = {}
+        for name in COLUMNS:
+            value = self.columns[name][index]
+            row[name] = None if value == MISSING and name not in TEXT_COLUMNS else value
+        return row
+
+    def rows(self):
+        """ Gets all connections as dicts """
+        return [self.row(index) for index in range(len(self))]
+
+    def dump(self):
+        """ Gets table as json-serializable dict, see load """
+        return {
+            'columns': dict((name, list(values)) for name, values in self.columns.items()),
+            'truncated': self.truncated,
+        }
+
+    @classmethod
+    def load(cls, data):
+        """ Creates table from dump
+
+        Raises:
+            ValueError: If dump is invalid
+        """
+        table = cls()
+        try:
+            for name in COLUMNS:
+                if name in TEXT_COLUMNS:
+                    table.columns[name] = list(data['columns'][name])
+                else:
+                    table.columns[name].extend(data['columns'][name])
+        except (KeyError, TypeError) as exception:
+            raise ValueError('Invalid table: {}'.format(exception))
+        if len(set(len(values) for values in table.columns.values())) > 1:
+            raise ValueError('Invalid table: columns differ in length')
+        table.truncated = bool(data.get('truncated'))
+        return table
+
+
+def parse(lines):
+    """ Parses result of cons command
+
+    Args:
+        lines (list): List of lines to parse
+    Returns:
+        Tuple of:
+            - table (ConsTable) - parsed connections
+            - errors (list) - not parsed, non-empty lines
+    """
+    table = ConsTable()
+    errors = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        match = RE_CONS_LINE.match(line)
+        if match is None:
+            errors.append(line)
+            continue
+        values = dict(field.split('=', 1) for field in match.group(4).split(',') if '=' in field)
+        values['host'], values['port'], values['n'] = match.group(1), match.group(2), match.group(3)
+        try:
+            table.append(values)
+        except ValueError:
+            errors.append(line)
+    return table, errors
+
+
+def _check_column(column):
+    if column not in RANKED_COLUMNS:
+        raise ValueError('Unable to rank sessions by: {}'.format(column))
+
+
+def percentiles(tables, column, points=(50, 90, 99)):
+    """ Computes nearest-rank percentiles of column across the cluster
+
+    Connections without the value (MISSING) are skipped.
+
+    Args:
+        tables (dict): Host's name -> ConsTable
+        column (string): One of RANKED_COLUMNS
+        points (list): Percentiles to compute
+    Returns:
+        Dict with count, max and p<point> for every point (None if there are no values)
+    Raises:
+        ValueError: If column cannot be ranked
+    """
+    _check_column(column)
+    values = sorted(itertools.chain.from_iterable(table.column(column) for table in tables.values() if table))
+    values = values[bisect_left(values, 0):]
+    result = {'count': len(values), 'max': values[-1] if values else None}
+    for point in points:
+        rank = max(int(math.ceil(point / 100.0 * len(values))), 1)
+        result['p{}'.format(point)] = values[rank - 1] if values else None
+    return result
+
+
+def top_sessions(tables, by='maxlat', limit=10):
+    """ Selects connections with the highest value of column across the cluster
+
+    Top-K of every table is selected first, then merged - O(n log limit).
+
+    Args:
+        tables (dict): Host's name -> ConsTable
+        by (string): One of RANKED_COLUMNS
+        limit (int): Number of connections to return
+    Returns:
+        List of dicts (connection's data with `server` key) sorted descending
+    Raises:
+        ValueError: If column cannot be ranked
+    """
+    _check_column(by)
+    candidates = []
+    for server, table in tables.items():
+        if not table:
+            continue
+        column = table.column(by)
+        indexes = (index for index in range(len(table)) if column[index] != MISSING)
+        candidates.extend(
+            (column[index], server, index) for index in heapq.nlargest(limit, indexes, key=column.__getitem__)
+        )
+    top = heapq.nlargest(limit, candidates, key=lambda item: item[0])
+    return [dict(tables[server].row(index), server=server) for _, server, index in top]
@@ -0,0 +1,350 @@
+# -*- coding:utf-8 -*-
+""" Native asyncio transport of four letters commands.
+
+Built on non-blocking sockets and loop.sock_* methods only, so it runs on any
+asyncio compatible loop (default one, uvloop, tornado's AsyncIOMainLoop).
+
+TLS (secure client port) is driven by ssl.SSLObject over memory BIOs on the same
+socket methods. SSLContext is shared (ex. by all hosts of a cluster), TLS session of
+the last connection is reused by the next one to the same host, so repeated commands
+skip the full handshake.
+
+Example:
+
+    data = await request('localhost', 2181, 'srvr')
+
+    tls = TLS(create_context(ca='/etc/zookeeper/ca.pem'), 'zk1.local')
+    data = await request('zk1.local', 2281, 'srvr', tls=tls)
+    data.handshake, data.resumed
+
+"""
+import asyncio
+import socket
+import ssl
+import time
+from .exceptions import HostResponseTooLarge
+
+CHUNK_SIZE = 65536
+BUFFER_SIZE = 4096
+TRUNCATE = 'truncate'
+ABORT = 'abort'
+
+
+class Response(bytearray):
+    """ Raw response
+
+    Attributes:
+        truncated (bool): True if server sent more than max_bytes
+        nbytes (int): Number of bytes read from socket
+        received (float): Loop's time of response's first byte
+    """
+    truncated = False
+    nbytes = 0
+    handshake = None
+    resumed = False
+    received = None
+
+
+def create_context(ca=None, cert=None, key=None, check_hostname=True, verify=True):
+    """ Creates client's SSLContext
+
+    Args:
+        ca (string): CA bundle file, None - system's default CAs
+        cert (string): Client's certificate file (for servers requiring client auth)
+        key (string): Client's private key file, None - key is in cert file
+        check_hostname (bool): Match server's certificate with host's address
+        verify (bool): Verify server's certificate
+    Returns:
+        SSLContext
+    """
+    context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH, cafile=ca)
+    if cert:
+        context.load_cert_chain(cert, key)
+    if not check_hostname or not verify:
+        context.check_hostname = False
+    if not verify:
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+class TLS(object):
+    """ TLS of host's connections - shared context and host's last session
+
+    Attributes:
+        session (SSLSession): Session reused by the next connection
+        stats (dict): Number and total seconds of full and resumed handshakes
+    """
+
+    def __init__(self, context, server_hostname=None):
+        """ Create host's TLS
+
+        Args:
+            context (SSLContext): Client's context, see create_context
+            server_hostname (string): Name server's certificate is matched with
+        """
+        self.context = context
+        self.server_hostname = server_hostname
+        self.session = None
+        self.stats = {'full': 0, 'full_time': 0.0, 'resumed': 0, 'resumed_time': 0.0}
+
+    def record(self, elapsed, resumed):
+        """ Records handshake """
+        kind = 'resumed' if resumed else 'full'
+        self.stats[kind] += 1
+        self.stats[kind + '_time'] += elapsed
+
+    def get_stats(self):
+        """ Gets handshakes' stats
+
+        Returns:
+            Dict with number and average seconds of full and resumed handshakes
+        """
+        return {
+            'full': self.stats['full'],
+            'full_avg': self.stats['full_time'] / self.stats['full'] if self.stats['full'] else None,
+            'resumed': self.stats['resumed'],
+            'resumed_avg': self.stats['resumed_time'] / self.stats['resumed'] if self.stats['resumed'] else None,
+        }
+
+
+class Connection(object):
+    """ Plain connection - non-blocking socket driven by loop.sock_* methods """
+
+    handshake = None
+    resumed = False
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.loop = asyncio.get_running_loop()
+
+    async def sendall(self, data):
+        await self.loop.sock_sendall(self.sock, data)
+
+    def send_nowait(self, data):
+        """ Sends data without yielding to the loop, so many connections can send in the same tick
+
+        Returns:
+            Raw bytes not accepted by socket's buffer, to be sent with loop.sock_sendall
+        """
+        try:
+            sent = self.sock.send(data)
+        except BlockingIOError:
+            sent = 0
+        return data[sent:]
+
+    async def recv(self, size):
+        return await self.loop.sock_recv(self.sock, size)
+
+    async def recv_into(self, buf):
+        return await self.loop.sock_recv_into(self.sock, buf)
+
+    def close(self):
+        self.sock.close()
+
+
+class TLSConnection(Connection):
+    """ TLS connection - SSLObject over memory BIOs on top of plain connection
+
+    Server closing connection without close_notify is treated as end of response,
+    as ZooKeeper does for plain 4lw.
+    """
+
+    def __init__(self, sock, tls):
+        super(TLSConnection, self).__init__(sock)
+        self.tls = tls
+        self._incoming = ssl.MemoryBIO()
+        self._outgoing = ssl.MemoryBIO()
+        self._obj = tls.context.wrap_bio(
+            self._incoming, self._outgoing, server_hostname=tls.server_hostname, session=tls.session)
+
+    async def do_handshake(self):
+        """ Performs handshake, resuming host's last session if possible """
+        start = time.perf_counter()
+        await self._call(self._obj.do_handshake)
+        self.handshake = time.perf_counter() - start
+        self.resumed = self._obj.session_reused
+        self.tls.record(self.handshake, self.resumed)
+
+    async def _call(self, func, *args):
+        while True:
+            try:
+                result = func(*args)
+            except ssl.SSLWantReadError:
+                await self._flush()
+                data = await self.loop.sock_recv(self.sock, CHUNK_SIZE)
+                if data:
+                    self._incoming.write(data)
+                else:
+                    self._incoming.write_eof()
+            else:
+                await self._flush()
+                return result
+
+    async def _flush(self):
+        if self._outgoing.pending:
+            await self.loop.sock_sendall(self.sock, self._outgoing.read())
+
+    async def sendall(self, data):
+        await self._call(self._obj.write, data)
+
+    def send_nowait(self, data):
+        self._obj.write(data)
+        return super(TLSConnection, self).send_nowait(self._outgoing.read())
+
+    async def recv(self, size):
+        try:
+            return await self._call(self._obj.read, size)
+        except (ssl.SSLZeroReturnError, ssl.SSLEOFError):
+            return b''
+
+    async def recv_into(self, buf):
+        try:
+            return await self._call(self._obj.read, len(buf), buf)
+        except (ssl.SSLZeroReturnError, ssl.SSLEOFError):
+            return 0
+
+    def close(self):
+        # TLS 1.3 tickets come after handshake, so the session is taken when connection is done
+        if self._obj.session is not None:
+            self.tls.session = self._obj.session
+        super(TLSConnection, self).close()
+
+
+async def resolve(addr, port):
+    """ Resolves host addr (domain)
+
+    Args:
+        addr (string): IP or domain
+        port (int): Port
+    Returns:
+        Tuple of address family and socket address
+    """
+    # IP literals don't need getaddrinfo, which runs in executor's thread
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, addr)
+        except (OSError, ValueError):
+            continue
+        return family, (addr, int(port))
+    loop = asyncio.get_running_loop()
+    addrinfo = await loop.getaddrinfo(addr, int(port), type=socket.SOCK_STREAM)
+    family, _, _, _, sockaddr = addrinfo[0]
+    return family, sockaddr
+
+
+async def connect(addr, port, tls=None):
+    """ Opens non-blocking TCP connection
+
+    Args:
+        addr (string): IP or domain
+        port (int): Port
+        tls (TLS): Host's TLS, None - plain connection
+    Returns:
+        Connection (TLSConnection after handshake if tls is given)
+    """
+    loop = asyncio.get_running_loop()
+    family, sockaddr = await resolve(addr, port)
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setblocking(False)
+    try:
+        await loop.sock_connect(sock, sockaddr)
+        if tls is None:
+            return Connection(sock)
+        connection = TLSConnection(sock, tls)
+        await connection.do_handshake()
+        return connection
+    except BaseException:
+        sock.close()
+        raise
+
+
+async def stream(addr, port, cmd, callback, chunk_size=CHUNK_SIZE, tls=None):
+    """ Sends command and passes response in chunks to callback until server closes connection
+
+    Args:
+        addr (string): IP or domain
+        port (int): Port
+        cmd (string): Four-letter command
+        callback: Function called with every chunk (bytes) of response
+        chunk_size (int): Max size of a chunk
+        tls (TLS): Host's TLS, None - plain connection
+    Returns:
+        Number of bytes read
+    """
+    connection = await connect(addr, port, tls)
+    try:
+        await connection.sendall('{}\n'.format(cmd.strip()).encode('utf-8'))
+        size = 0
+        while True:
+            chunk = await connection.recv(chunk_size)
+            if not chunk:
+                return size
+            size += len(chunk)
+            callback(chunk)
+    finally:
+        connection.close()
+
+
+async def request(addr, port, cmd, max_bytes=None, overflow=TRUNCATE, tls=None):
+    """ Sends command and reads response
+
+    Response is read straight into one buffer which grows (doubles) up to max_bytes,
+    so memory used by a command is bounded and there is no chunks concatenation.
+
+    Args:
+        addr (string): IP or domain
+        port (int): Port
+        cmd (string): Four-letter command
+        max_bytes (int): Max size of response, None means unlimited
+        overflow (string): What to do with bigger response:
+            - truncate - stop reading and return first max_bytes marked as truncated
+            - abort - raise HostResponseTooLarge
+        tls (TLS): Host's TLS, None - plain connection
+    Returns:
+        Raw response - Response (bytearray), with handshake's time and resumed flag of TLS connection
+    Raises:
+        HostResponseTooLarge: If response is too large and overflow is abort
+    """
+    connection = await connect(addr, port, tls)
+    try:
+        await connection.sendall('{}\n'.format(cmd.strip()).encode('utf-8'))
+        return await receive(connection, cmd, max_bytes, overflow)
+    finally:
+        connection.close()
+
+
+async def receive(connection, cmd, max_bytes=None, overflow=TRUNCATE):
+    """ Reads command's response until server closes connection, see request
+
+    Returns:
+        Raw response - Response (bytearray)
+    Raises:
+        HostResponseTooLarge: If response is too large and overflow is abort
+    """
+    buf = Response(BUFFER_SIZE if max_bytes is None else min(BUFFER_SIZE, max_bytes))
+    buf.handshake, buf.resumed = connection.handshake, connection.resumed
+    size = 0
+    while True:
+        if size == len(buf):
+            if max_bytes is not None and size >= max_bytes:
+                more = await connection.recv(1)
+                if more:
+                    buf.nbytes = size + len(more)
+                    if overflow == ABORT:
+                        raise HostResponseTooLarge(
+                            'Response of {} exceeds {} bytes'.format(cmd.strip(), max_bytes))
+                    buf.truncated = True
+                break
+            grow = len(buf) if max_bytes is None else min(len(buf), max_bytes - size)
+            buf.extend(bytes(grow))
+        with memoryview(buf) as view, view[size:] as target:
+            read = await connection.recv_into(target)
+        if not read:
+            break
+        if not size:
+            buf.received = connection.loop.time()
+        size += read
+    del buf[size:]
+    buf.nbytes = buf.nbytes or size
+    return buf
+
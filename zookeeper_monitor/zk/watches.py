@@ -0,0 +1,113 @@
+# -*- coding:utf-8 -*-
+""" Incremental parsers of watch commands (wchc, wchp).
+
+Outputs of wchc and wchp can be hundreds of MB, so they are parsed chunk by chunk
+and by default only aggregates and top-K groups are kept in memory.
+
+Output is a list of groups - not indented key line followed by indented value lines:
+
+    wchc                    wchp
+    0x14d4b9d2a6e0000       /some/path
+        /some/path              0x14d4b9d2a6e0000
+        /another/path           0x24d4b9d2a6e0001
+
+Example:
+
+    parser = WatchParser(top=5)
+    for chunk in chunks:
+        parser.feed(chunk)
+    result = parser.close()
+
+"""
+import heapq
+
+
+class WatchParser(object):
+    """ Streaming parser of wchc/wchp output """
+
+    def __init__(self, top=10, index=False):
+        """ Create parser
+
+        Args:
+            top (int): Number of the biggest groups to keep
+            index (bool): If true keeps full key -> values index (unbounded memory)
+        """
+        self.top = top
+        self.index = {} if index else None
+        self.groups = 0
+        self.watches = 0
+        self.max = 0
+        self._heap = []
+        self._key = None
+        self._count = 0
+        self._values = None
+        self._tail = b''
+
+    def feed(self, chunk):
+        """ Parses next chunk of data
+
+        Args:
+            chunk (bytes): Part of command's output, may end in the middle of line
+        """
+        lines = (self._tail + chunk).split(b'\n')
+        self._tail = lines.pop()
+        for line in lines:
+            self._parse_line(line)
+
+    def close(self):
+        """ Parses remaining data and returns result
+
+        Returns:
+            Dict of:
+                - groups (int) - number of keys (sessions for wchc, paths for wchp)
+                - watches (int) - total number of watches
+                - max (int) - the biggest group size
+                - top (list) - the biggest groups as dicts (key, watches), descending
+                - index (dict) - key -> list of values, only if requested
+        """
+        if self._tail:
+            self._parse_line(self._tail)
+            self._tail = b''
+        self._close_group()
+        result = {
+            'groups': self.groups,
+            'watches': self.watches,
+            'max': self.max,
+            'top': [{'key': key, 'watches': count} for count, key in sorted(self._heap, reverse=True)],
+        }
+        if self.index is not None:
+            result['index'] = self.index
+        return result
+
+    def _parse_line(self, line):
+        line = line.rstrip(b'\r')
+        if not line.strip():
+            return
+        if line[:1] in (b'\t', b' '):
+            if self._key is None:
+                return
+            self._count += 1
+            if self._values is not None:
+                self._values.append(line.strip().decode('utf-8'))
+            return
+        self._close_group()
+        self._key = line.strip().decode('utf-8')
+        self._count = 0
+        self._values = [] if self.index is not None else None
+
+    def _close_group(self):
+        if self._key is None:
+            return
+        self.groups += 1
+        self.watches += self._count
+        self.max = max(self.max, self._count)
+        if self.top > 0:
+            item = (self._count, self._key)
+            if len(self._heap) < self.top:
+                heapq.heappush(self._heap, item)
+            elif item > self._heap[0]:
+                heapq.heapreplace(self._heap, item)
+        if self._values is not None:
+            self.index[self._key] = self._values
+        self._key = None
+        self._values = None